@@ -0,0 +1,149 @@
+"""
+Microbenchmark de huellas de archivos: hash legacy (bloques de 8 KB, un hilo) vs el
+subsistema de fingerprint (lecturas grandes, mmap, pool de hilos, identidad rápida).
+
+Uso:
+    # Archivos sintéticos (20 x 50 MB, como RAWs) en un directorio temporal
+    python benchmarks/bench_hashing.py --count 20 --size-mb 50
+    # Archivos reales (ej. el montaje NFS), vaciando la caché de páginas entre corridas
+    python benchmarks/bench_hashing.py --files /app/data/input --limit 50 --drop-cache
+"""
+import argparse
+import hashlib
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.core.fingerprint import Fingerprinter, hash_file, quick_identity
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("WildIndex.Bench.Hash")
+
+
+def hash_legacy(file_path: str, chunk_size: int = 8192) -> str:
+    """Réplica de CheckpointManager.calculate_hash anterior: bloques de 8 KB en un hilo."""
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def make_corpus(directory: Path, count: int, size_mb: int) -> List[str]:
+    logger.info(f"🧪 Generando {count} archivos de {size_mb} MB en {directory}...")
+    block = os.urandom(1024 * 1024)
+    paths = []
+    for i in range(count):
+        path = directory / f"synthetic_{i:04d}.arw"
+        with open(path, "wb") as f:
+            for j in range(size_mb):
+                # Variar cada archivo para que no compartan contenido
+                f.write(i.to_bytes(4, "little") + j.to_bytes(4, "little") + block[8:])
+        paths.append(str(path))
+    return paths
+
+
+def collect_files(directory: str, limit: int) -> List[str]:
+    found = []
+    for root, _, filenames in os.walk(directory):
+        for filename in sorted(filenames):
+            found.append(os.path.join(root, filename))
+            if len(found) >= limit:
+                return found
+    return found
+
+
+def drop_cache(paths: List[str]):
+    """Expulsa los archivos de la caché de páginas (local y cliente NFS) para medir E/S real."""
+    for path in paths:
+        with open(path, "rb") as f:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+def run(name: str, fn: Callable[[List[str]], object], paths: List[str], repeats: int, cold: bool) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        if cold:
+            drop_cache(paths)
+        start = time.perf_counter()
+        fn(paths)
+        best = min(best, time.perf_counter() - start)
+    logger.info(f"⏱️  {name}: {best:.2f}s")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de hashing de archivos (legacy vs fingerprint)")
+    parser.add_argument("--files", default=None, help="Directorio con archivos reales (si no, se generan)")
+    parser.add_argument("--limit", type=int, default=50, help="Máximo de archivos reales a usar")
+    parser.add_argument("--count", type=int, default=20, help="Archivos sintéticos a generar")
+    parser.add_argument("--size-mb", type=int, default=50, help="Tamaño de cada archivo sintético")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8], help="Hilos del pool a probar")
+    parser.add_argument("--repeats", type=int, default=3, help="Repeticiones por configuración (se usa la mejor)")
+    parser.add_argument("--drop-cache", action="store_true", help="Vaciar la caché de páginas antes de cada corrida")
+    args = parser.parse_args()
+
+    tmp_dir = None
+    if args.files:
+        paths = collect_files(args.files, args.limit)
+    else:
+        tmp_dir = tempfile.TemporaryDirectory(prefix="wildindex-bench-")
+        paths = make_corpus(Path(tmp_dir.name), args.count, args.size_mb)
+
+    if not paths:
+        logger.error("❌ No hay archivos para el benchmark")
+        sys.exit(1)
+
+    total_mb = sum(os.path.getsize(p) for p in paths) / (1024 * 1024)
+    logger.info(f"🧪 {len(paths)} archivos, {total_mb:.0f} MB (caché {'fría' if args.drop_cache else 'caliente'})")
+
+    # Verificación: todas las variantes producen el mismo hash
+    assert hash_legacy(paths[0]) == hash_file(paths[0]) == hash_file(paths[0], use_mmap=True)
+
+    rows = []
+    legacy = run("legacy 8 KB", lambda ps: [hash_legacy(p) for p in ps], paths, args.repeats, args.drop_cache)
+    rows.append(("legacy (8 KB, 1 hilo)", legacy))
+    rows.append(("readinto 4 MB, 1 hilo", run(
+        "readinto", lambda ps: [hash_file(p) for p in ps], paths, args.repeats, args.drop_cache
+    )))
+    rows.append(("mmap, 1 hilo", run(
+        "mmap", lambda ps: [hash_file(p, use_mmap=True) for p in ps], paths, args.repeats, args.drop_cache
+    )))
+    for workers in args.workers:
+        if workers <= 1:
+            continue
+        fingerprinter = Fingerprinter(workers=workers)
+        rows.append((f"readinto 4 MB, {workers} hilos", run(
+            f"pool {workers}", fingerprinter.hash_many, paths, args.repeats, args.drop_cache
+        )))
+        fingerprinter.close()
+    with ThreadPoolExecutor(max_workers=max(args.workers)) as pool:
+        rows.append((f"identidad rápida, {max(args.workers)} hilos", run(
+            "quick", lambda ps: list(pool.map(quick_identity, ps)), paths, args.repeats, args.drop_cache
+        )))
+
+    print("\n" + "=" * 68)
+    print(f"📊 Hashing — {len(paths)} archivos, {total_mb:.0f} MB")
+    print("=" * 68)
+    for name, elapsed in rows:
+        throughput = total_mb / elapsed if elapsed > 0 else float("inf")
+        speedup = legacy / elapsed if elapsed > 0 else float("inf")
+        print(f"{name:<36} {elapsed:8.2f}s  {throughput:8.1f} MB/s  x{speedup:.2f}")
+    print("=" * 68 + "\n")
+
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark de MegaDetector en CPU: inferencia por imagen (ruta legacy) vs detect_batch.
+
+Uso (dentro del contenedor, con PYTHONPATH=/app:/app/yolov5):
+    python benchmarks/bench_megadetector.py --images /app/data/input --limit 64 --batch-sizes 1 8 32
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import List, Dict, Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.core.detectors.megadetector import MegaDetector
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("WildIndex.Bench.MD")
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+
+
+def collect_images(images_dir: str, limit: int) -> List[str]:
+    """Recolecta hasta `limit` imágenes del directorio (recursivo)."""
+    found = []
+    for root, _, filenames in os.walk(images_dir):
+        for filename in sorted(filenames):
+            if Path(filename).suffix.lower() in IMAGE_EXTENSIONS:
+                found.append(os.path.join(root, filename))
+                if len(found) >= limit:
+                    return found
+    return found
+
+
+def detect_legacy(detector: MegaDetector, image_path: str) -> Dict[str, Any]:
+    """Réplica de la ruta anterior: una inferencia por ruta + DataFrame de pandas."""
+    results = detector.model(image_path)
+    df = results.pandas().xyxy[0]
+    if df.empty:
+        return {"md_category": "empty", "md_confidence": 0.0, "md_bbox": []}
+    best = df.iloc[0]
+    return {
+        "md_category": best['name'],
+        "md_confidence": float(best['confidence']),
+        "md_bbox": [float(best['xmin']), float(best['ymin']), float(best['xmax']), float(best['ymax'])]
+    }
+
+
+def bench_legacy(detector: MegaDetector, images: List[str]) -> float:
+    start = time.perf_counter()
+    for image_path in images:
+        detect_legacy(detector, image_path)
+    return time.perf_counter() - start
+
+
+def bench_batch(detector: MegaDetector, images: List[str], batch_size: int) -> float:
+    detector.batch_size = batch_size
+    start = time.perf_counter()
+    detector.detect_batch(images)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MegaDetector por imagen vs por lote (CPU)")
+    parser.add_argument("--images", required=True, help="Directorio con imágenes de prueba")
+    parser.add_argument("--model", default="models/md_v5a.0.0.pt", help="Ruta al modelo MegaDetector")
+    parser.add_argument("--limit", type=int, default=64, help="Número de imágenes a usar")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 16, 32])
+    parser.add_argument("--repeats", type=int, default=3, help="Repeticiones por configuración (se usa la mejor)")
+    parser.add_argument("--threads", type=int, default=None, help="torch.set_num_threads (por defecto: sin cambios)")
+    parser.add_argument("--backends", nargs="+", default=["torch"], choices=["torch", "onnx", "onnx-int8"],
+                        help="Backends a comparar con detect_batch (ONNX se exporta a --onnx-dir si falta)")
+    parser.add_argument("--onnx-dir", default="models/onnx")
+    args = parser.parse_args()
+
+    import torch
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    images = collect_images(args.images, args.limit)
+    if not images:
+        logger.error(f"❌ No se encontraron imágenes en {args.images}")
+        sys.exit(1)
+
+    detector = MegaDetector(args.model, device="cpu")
+    logger.info(f"🧪 {len(images)} imágenes, {torch.get_num_threads()} hilos de torch")
+
+    # Calentamiento (carga perezosa de kernels / caches)
+    detector.detect_batch(images[:2])
+
+    rows = []
+    legacy = min(bench_legacy(detector, images) for _ in range(args.repeats))
+    rows.append(("legacy (1 por imagen + pandas)", legacy))
+    for backend in args.backends:
+        if backend != "torch":
+            detector = MegaDetector(args.model, device="cpu", backend=backend,
+                                    onnx_dir=args.onnx_dir, num_threads=args.threads or 0)
+            detector.detect_batch(images[:2])
+        for batch_size in args.batch_sizes:
+            elapsed = min(bench_batch(detector, images, batch_size) for _ in range(args.repeats))
+            rows.append((f"{backend} detect_batch (batch={batch_size})", elapsed))
+
+    print("\n" + "=" * 64)
+    print(f"📊 MegaDetector CPU — {len(images)} imágenes")
+    print("=" * 64)
+    for name, elapsed in rows:
+        throughput = len(images) / elapsed if elapsed > 0 else float("inf")
+        speedup = legacy / elapsed if elapsed > 0 else float("inf")
+        print(f"{name:<40} {elapsed:8.2f}s  {throughput:7.2f} img/s  x{speedup:.2f}")
+    print("=" * 64 + "\n")
+
+
+if __name__ == "__main__":
+    main()
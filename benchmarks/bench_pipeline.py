@@ -0,0 +1,461 @@
+"""
+Benchmark end-to-end del pipeline: descubrimiento (scan + hash) y BatchProcessor
+completo (EXIF -> lectura -> inferencia -> copia/metadatos/miniaturas/DB) sobre un
+corpus sintético de cámara trampa (ver synthetic_corpus.py).
+
+Modelos:
+- stub: detector/clasificador deterministas (stub_models.py). Mide el pipeline sin el
+  coste del modelo, o con una latencia fija por imagen/recorte (--detect-ms/--classify-ms).
+- real: AIEngine (o InferenceWorkerPool con --inference-processes) con los modelos de
+  models/, configurado con las mismas variables de entorno que el orquestador.
+
+Reporta throughput total y por etapa, latencia p50/p95/p99 por archivo y por llamada de
+etapa, las operaciones internas (métricas de src/core/metrics.py) y el pico de RSS.
+Cada corrida usa DB, salida y caché de miniaturas nuevas; con --repeat N el resumen es
+la corrida de throughput mediano. El resultado se guarda en JSON (con commit y host)
+para comparar entre commits con compare_results.py.
+
+Uso:
+    # Solo el pipeline (sin coste de modelo), corpus de 600 archivos
+    python benchmarks/bench_pipeline.py --size medium --repeat 3
+    # Coste de modelo en CPU simulado (MegaDetector ~180 ms/imagen, BioCLIP ~40 ms/recorte)
+    python benchmarks/bench_pipeline.py --detect-ms 180 --classify-ms 40
+    # Modelos reales en CPU con 4 procesos de inferencia (dentro del contenedor)
+    python benchmarks/bench_pipeline.py --models real --inference-processes 4 --size small
+    # Línea de tiempo por archivo + cProfile de la última corrida (abrir en ui.perfetto.dev)
+    python benchmarks/bench_pipeline.py --size small --profile /tmp/wildindex-profile
+    # Comparar contra una corrida anterior
+    python benchmarks/compare_results.py benchmarks/results/base.json benchmarks/results/nuevo.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.stub_models import StubAIEngine, StubMetadataInjector
+from benchmarks.synthetic_corpus import PRESETS, corpus_config, load_or_generate, parse_resolution
+from src.core.batch_processor import BatchProcessor
+from src.core.checkpoint_manager import CheckpointManager
+from src.core.fingerprint import Fingerprinter
+from src.core.metadata_injector import MetadataInjector
+from src.core.metrics import REGISTRY
+from src.core.output_writer import OutputWriter
+from src.core.profiling import PROFILER
+from src.core.sequence_grouper import SequenceGrouper
+from src.core.thumbnails import ThumbnailCache
+from src.database.db_manager import DatabaseManager
+
+# El log por archivo del pipeline distorsiona la medición: solo avisos, salvo los del benchmark
+logging.basicConfig(
+    level=logging.WARNING,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logging.getLogger("WildIndex.Bench").setLevel(logging.INFO)
+logger = logging.getLogger("WildIndex.Bench.Pipeline")
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+RESULT_FORMAT = 1
+
+
+class RecordingBatchProcessor(BatchProcessor):
+    """BatchProcessor que además guarda la duración exacta de cada llamada de etapa y la latencia de cada archivo."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stage_samples: Dict[str, List[Tuple[float, int]]] = defaultdict(list)
+        self.file_latencies: List[float] = []
+        self._samples_lock = threading.Lock()
+
+    def _timed(self, stage_name: str, fn):
+        timed = BatchProcessor._timed(stage_name, fn)
+        first_stage = "exif" if self.exif_reader is not None else "read"
+
+        def recorded(item):
+            start = time.perf_counter()
+            tasks = item if isinstance(item, list) else [item]
+            if stage_name == first_stage:
+                for task in tasks:
+                    task.bench_start = start
+            try:
+                return timed(item)
+            finally:
+                end = time.perf_counter()
+                with self._samples_lock:
+                    self.stage_samples[stage_name].append((end - start, len(tasks)))
+                    if stage_name == "write":
+                        self.file_latencies.extend(end - task.bench_start for task in tasks)
+        return recorded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end del pipeline de WildIndex")
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "wildindex-bench-corpus"),
+                        help="Directorio del corpus sintético (se reutiliza si la configuración coincide)")
+    parser.add_argument("--size", choices=sorted(PRESETS), default="small")
+    parser.add_argument("--count", type=int, default=0, help="Número de archivos (anula --size)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--resolution", default="2048x1536")
+    parser.add_argument("--models", choices=["stub", "real"], default="stub")
+    parser.add_argument("--detect-ms", type=float, default=0.0, help="Stub: latencia simulada por imagen")
+    parser.add_argument("--classify-ms", type=float, default=0.0, help="Stub: latencia simulada por recorte")
+    parser.add_argument("--inference-processes", type=int, default=0, help="Real: procesos de inferencia (0 = en proceso)")
+    parser.add_argument("--threads-per-worker", type=int, default=0)
+    parser.add_argument("--reader-workers", type=int, default=2)
+    parser.add_argument("--writer-workers", type=int, default=4)
+    parser.add_argument("--inference-batch-size", type=int, default=8)
+    parser.add_argument("--queue-size", type=int, default=16)
+    parser.add_argument("--no-thumbnails", action="store_true")
+    parser.add_argument("--no-sequences", action="store_true")
+    parser.add_argument("--exif", choices=["auto", "on", "off"], default="auto",
+                        help="Lectura EXIF en bloque (auto = si ExifTool está instalado)")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--work-dir", default=None, help="Directorio de salida/DB (por defecto uno temporal)")
+    parser.add_argument("--output", default=None, help="JSON de resultados (por defecto benchmarks/results/...)")
+    parser.add_argument("--profile", default=None, metavar="DIR",
+                        help="Perfilar la última corrida (traza + cProfile) en DIR; sus tiempos no son comparables")
+    args = parser.parse_args()
+
+    count = args.count or PRESETS[args.size]
+    corpus_root = Path(args.corpus_dir)
+    corpus_root.mkdir(parents=True, exist_ok=True)
+    corpus = load_or_generate(corpus_root, corpus_config(count, seed=args.seed, resolution=parse_resolution(args.resolution)))
+    input_dir = corpus_root / "input"
+
+    has_exiftool = shutil.which("exiftool") is not None
+    use_exif = args.exif == "on" or (args.exif == "auto" and has_exiftool)
+    if not has_exiftool:
+        logger.warning("⚠️ ExifTool no está instalado: metadatos sin escribir (stub) y fecha de captura por mtime.")
+
+    setup_start = time.perf_counter()
+    engine, inference_workers = build_engine(args, corpus_root, corpus)
+    setup_seconds = time.perf_counter() - setup_start
+
+    work_root = Path(args.work_dir) if args.work_dir else Path(tempfile.mkdtemp(prefix="wildindex-bench-"))
+    runs = []
+    try:
+        for run_index in range(args.repeat):
+            run_dir = work_root / f"run{run_index}"
+            shutil.rmtree(run_dir, ignore_errors=True)
+            run_dir.mkdir(parents=True)
+            if args.profile and run_index == args.repeat - 1:
+                PROFILER.configure(args.profile, batches=1, cprofile=True)
+                PROFILER.request()
+            runs.append(run_once(args, engine, inference_workers, input_dir, run_dir, has_exiftool, use_exif))
+            log_run(run_index, runs[-1])
+    finally:
+        if hasattr(engine, "close"):
+            engine.close()
+        if not args.work_dir:
+            shutil.rmtree(work_root, ignore_errors=True)
+
+    # Workers del pool (ya terminados): su pico de RSS
+    children_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    summary = sorted(runs, key=lambda run: run["files_per_second"])[len(runs) // 2]
+    result = {
+        "format": RESULT_FORMAT,
+        "benchmark": "pipeline",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git": git_info(),
+        "host": host_info(),
+        "config": {
+            "models": args.models,
+            "detect_ms": args.detect_ms,
+            "classify_ms": args.classify_ms,
+            "inference_processes": args.inference_processes,
+            "threads_per_worker": args.threads_per_worker,
+            "reader_workers": args.reader_workers,
+            "inference_workers": inference_workers,
+            "writer_workers": args.writer_workers,
+            "inference_batch_size": args.inference_batch_size,
+            "queue_size": args.queue_size,
+            "thumbnails": not args.no_thumbnails,
+            "sequences": not args.no_sequences,
+            "exif": use_exif,
+            "exiftool": has_exiftool,
+            "corpus": dict(corpus["config"], files=len(corpus["files"]), bytes=sum(f["size"] for f in corpus["files"])),
+        },
+        "setup_seconds": round(setup_seconds, 3),
+        "peak_rss_children_mb": round(children_rss, 1),
+        "summary": summary,
+        "runs": runs,
+    }
+
+    output = Path(args.output) if args.output else default_output(args, result)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print_summary(result)
+    logger.info(f"💾 Resultados en {output}")
+
+
+def build_engine(args, corpus_root: Path, corpus: Dict[str, Any]):
+    """Retorna (motor de IA, hilos de inferencia del pipeline)."""
+    if args.models == "stub":
+        truth = {str(corpus_root / entry["path"]): entry for entry in corpus["files"]}
+        return StubAIEngine(truth, detect_ms=args.detect_ms, classify_ms=args.classify_ms), 1
+
+    # Mismos valores por defecto que el orquestador
+    ai_config = {
+        "use_gpu": True,
+        "video_sample_fps": float(os.getenv("VIDEO_SAMPLE_FPS", "1.0")),
+        "video_max_frames": int(os.getenv("VIDEO_MAX_FRAMES", "120")),
+        "video_early_exit_confidence": float(os.getenv("VIDEO_EARLY_EXIT_CONFIDENCE", "0.8")),
+        "species_list_path": os.getenv("SPECIES_LIST_PATH"),
+        "species_cache_dir": os.getenv("SPECIES_CACHE_DIR", "models/species_cache"),
+        "megadetector_backend": os.getenv("MD_BACKEND", "torch"),
+        "bioclip_backend": os.getenv("BIOCLIP_BACKEND", "torch"),
+        "onnx_dir": os.getenv("ONNX_DIR", "models/onnx"),
+        "onnx_threads": int(os.getenv("ONNX_THREADS", "0"))
+    }
+    logger.info("🧠 Cargando modelos reales...")
+    if args.inference_processes > 0:
+        from src.core.worker_pool import InferenceWorkerPool
+        pool = InferenceWorkerPool(
+            ai_config,
+            workers=args.inference_processes,
+            threads_per_worker=args.threads_per_worker
+        )
+        return pool, 2 * args.inference_processes
+
+    from src.core.ai_engine import AIEngine
+    return AIEngine(config=ai_config), 1
+
+
+def run_once(
+    args,
+    engine,
+    inference_workers: int,
+    input_dir: Path,
+    run_dir: Path,
+    has_exiftool: bool,
+    use_exif: bool
+) -> Dict[str, Any]:
+    db = DatabaseManager(str(run_dir / "wildindex.db"))
+    checkpoint = CheckpointManager(db, hash_workers=args.reader_workers, fingerprinter=Fingerprinter(workers=args.reader_workers))
+    metadata = MetadataInjector(sessions=args.writer_workers) if has_exiftool else StubMetadataInjector()
+    exif_reader = MetadataInjector() if use_exif else None
+    processor = RecordingBatchProcessor(
+        input_dir=str(input_dir),
+        output_dir=str(run_dir / "processed"),
+        db_manager=db,
+        checkpoint_manager=checkpoint,
+        ai_engine=engine,
+        metadata_injector=metadata,
+        reader_workers=args.reader_workers,
+        inference_workers=inference_workers,
+        inference_batch_size=args.inference_batch_size,
+        writer_workers=args.writer_workers,
+        queue_size=args.queue_size,
+        output_writer=OutputWriter(),
+        sequence_grouper=None if args.no_sequences else SequenceGrouper(),
+        thumbnail_cache=None if args.no_thumbnails else ThumbnailCache(str(run_dir / "thumbnails")),
+        exif_reader=exif_reader
+    )
+
+    reset_peak_rss()
+    REGISTRY.collect_deltas()
+    try:
+        start = time.perf_counter()
+        pending = processor.find_pending()
+        discovery_seconds = time.perf_counter() - start
+        processor.process_files(pending)
+        wall_seconds = time.perf_counter() - start
+    finally:
+        metadata.close()
+        if exif_reader is not None:
+            exif_reader.close()
+        checkpoint.fingerprinter.close()
+        db.close()
+    deltas = REGISTRY.collect_deltas()
+
+    counters = metric_counters(deltas)
+    files = len(pending)
+    total_bytes = sum(path.stat().st_size for path, _ in pending)
+    pipeline_seconds = wall_seconds - discovery_seconds
+    return {
+        "files": files,
+        "processed": int(counters.get(("wildindex_files_total", "processed"), 0)),
+        "errors": int(counters.get(("wildindex_files_total", "error"), 0)),
+        "reused": int(counters.get(("wildindex_files_total", "reused"), 0)),
+        "wall_seconds": round(wall_seconds, 3),
+        "discovery_seconds": round(discovery_seconds, 3),
+        "pipeline_seconds": round(pipeline_seconds, 3),
+        "files_per_second": round(files / wall_seconds, 3) if wall_seconds else 0.0,
+        "mb_per_second": round(total_bytes / (1024 * 1024) / wall_seconds, 3) if wall_seconds else 0.0,
+        "latency": percentiles(processor.file_latencies),
+        "stages": stage_stats(processor.stage_samples, pipeline_seconds),
+        "operations": operation_stats(deltas),
+        "bytes_read": {
+            source: int(value) for (name, source), value in counters.items() if name == "wildindex_bytes_read_total"
+        },
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    values = np.asarray(samples)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": int(values.size),
+        "mean": round(float(values.mean()), 6),
+        "p50": round(float(p50), 6),
+        "p95": round(float(p95), 6),
+        "p99": round(float(p99), 6),
+        "max": round(float(values.max()), 6),
+    }
+
+
+def stage_stats(samples: Dict[str, List[Tuple[float, int]]], pipeline_seconds: float) -> Dict[str, Any]:
+    """Por etapa: latencia por llamada (por lote en las etapas en lote), items y throughput."""
+    stats = {}
+    for stage_name, calls in samples.items():
+        busy = sum(seconds for seconds, _ in calls)
+        items = sum(count for _, count in calls)
+        stats[stage_name] = {
+            "calls": len(calls),
+            "items": items,
+            "busy_seconds": round(busy, 3),
+            # Capacidad de un hilo de la etapa / throughput observado en el pipeline
+            "items_per_busy_second": round(items / busy, 3) if busy else 0.0,
+            "items_per_second": round(items / pipeline_seconds, 3) if pipeline_seconds else 0.0,
+            "latency": percentiles([seconds for seconds, _ in calls]),
+        }
+    return stats
+
+
+def metric_counters(deltas: Dict[Tuple[str, Tuple[str, ...]], Any]) -> Dict[Tuple[str, str], float]:
+    return {
+        (name, labels[0]): value
+        for (name, labels), value in deltas.items()
+        if isinstance(value, (int, float)) and labels
+    }
+
+
+def operation_stats(deltas: Dict[Tuple[str, Tuple[str, ...]], Any]) -> Dict[str, Any]:
+    """Operaciones internas (histograma wildindex_operation_seconds): llamadas, total y media."""
+    stats = {}
+    for (name, labels), value in sorted(deltas.items()):
+        if name != "wildindex_operation_seconds":
+            continue
+        counts, total = value
+        calls = sum(counts)
+        stats[labels[0]] = {
+            "count": calls,
+            "total_seconds": round(total, 3),
+            "mean": round(total / calls, 6) if calls else 0.0,
+        }
+    return stats
+
+
+def reset_peak_rss():
+    """Reinicia el pico de RSS del proceso (Linux >= 4.0) para medir solo esta corrida."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Sin /proc: pico de todo el proceso (ru_maxrss en KB en Linux)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def git_info() -> Dict[str, Any]:
+    repo = Path(__file__).resolve().parents[1]
+
+    def git(*command: str) -> Optional[str]:
+        try:
+            return subprocess.run(
+                ["git", *command], cwd=repo, capture_output=True, text=True, timeout=30, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "subject": git("log", "-1", "--format=%s"),
+        "dirty": bool(status) if status is not None else None,
+    }
+
+
+def host_info() -> Dict[str, Any]:
+    return {
+        "hostname": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "cpu_affinity": len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else None,
+    }
+
+
+def default_output(args, result: Dict[str, Any]) -> Path:
+    commit = (result["git"]["commit"] or "nogit")[:8]
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return RESULTS_DIR / f"pipeline-{args.models}-{result['config']['corpus']['files']}-{commit}-{stamp}.json"
+
+
+def log_run(run_index: int, run: Dict[str, Any]):
+    latency = run["latency"]
+    logger.info(
+        f"⏱️  Corrida {run_index + 1}: {run['files']} archivos en {run['wall_seconds']:.2f}s "
+        f"({run['files_per_second']:.1f} archivos/s), p50 {latency.get('p50', 0):.3f}s, "
+        f"p99 {latency.get('p99', 0):.3f}s, RSS pico {run['peak_rss_mb']:.0f} MB"
+    )
+
+
+def print_summary(result: Dict[str, Any]):
+    run = result["summary"]
+    config = result["config"]
+    print("\n" + "=" * 78)
+    print(f"📊 Pipeline — {config['corpus']['files']} archivos, {config['corpus']['bytes'] / (1024 * 1024):.0f} MB, "
+          f"modelos {config['models']}, {len(result['runs'])} corrida(s)")
+    print("=" * 78)
+    print(f"Total: {run['wall_seconds']:.2f}s ({run['discovery_seconds']:.2f}s descubrimiento)  "
+          f"{run['files_per_second']:.1f} archivos/s  {run['mb_per_second']:.1f} MB/s")
+    print(f"Archivos: {run['processed']} procesados, {run['reused']} ráfaga reutilizada, {run['errors']} errores")
+    latency = run["latency"]
+    if latency:
+        print(f"Latencia por archivo: p50 {latency['p50']:.3f}s  p95 {latency['p95']:.3f}s  p99 {latency['p99']:.3f}s")
+    workers_rss = f" (workers: {result['peak_rss_children_mb']:.0f} MB)" if config["inference_processes"] else ""
+    print(f"RSS pico: {run['peak_rss_mb']:.0f} MB{workers_rss}")
+    print("-" * 78)
+    print(f"{'etapa':<8} {'llamadas':>9} {'items':>7} {'items/s':>9} {'cap./hilo':>10} {'p50':>9} {'p99':>9}")
+    for stage_name, stats in run["stages"].items():
+        print(f"{stage_name:<8} {stats['calls']:>9} {stats['items']:>7} {stats['items_per_second']:>9.1f} "
+              f"{stats['items_per_busy_second']:>10.1f} {stats['latency']['p50']:>8.3f}s {stats['latency']['p99']:>8.3f}s")
+    if run["operations"]:
+        print("-" * 78)
+        for op, stats in run["operations"].items():
+            print(f"{op:<20} {stats['count']:>8} llamadas  media {stats['mean'] * 1000:>9.2f} ms  total {stats['total_seconds']:>8.2f}s")
+    print("=" * 78 + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Compara dos resultados JSON de bench_pipeline.py (base vs candidato) y marca las
+regresiones que superan un umbral relativo. Sale con código 1 si hay alguna, para
+usarlo en CI o en un bisect.
+
+Uso:
+    python benchmarks/compare_results.py base.json candidato.json
+    python benchmarks/compare_results.py base.json candidato.json --threshold 0.05 --operations
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# (nombre, ruta en el resumen, mayor es mejor)
+Metric = Tuple[str, Tuple[str, ...], bool]
+
+TOP_METRICS: List[Metric] = [
+    ("archivos/s", ("files_per_second",), True),
+    ("MB/s", ("mb_per_second",), True),
+    ("latencia p50", ("latency", "p50"), False),
+    ("latencia p99", ("latency", "p99"), False),
+    ("descubrimiento", ("discovery_seconds",), False),
+    ("RSS pico MB", ("peak_rss_mb",), False),
+]
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        result = json.load(f)
+    if result.get("benchmark") != "pipeline":
+        raise SystemExit(f"{path} no es un resultado de bench_pipeline.py")
+    return result
+
+
+def lookup(data: Dict[str, Any], path: Tuple[str, ...]) -> Optional[float]:
+    for key in path:
+        if not isinstance(data, dict) or key not in data:
+            return None
+        data = data[key]
+    return data if isinstance(data, (int, float)) else None
+
+
+def metrics(base: Dict[str, Any], candidate: Dict[str, Any], operations: bool) -> Iterator[Metric]:
+    yield from TOP_METRICS
+    stages = list(base["summary"]["stages"]) + [s for s in candidate["summary"]["stages"] if s not in base["summary"]["stages"]]
+    for stage in stages:
+        yield (f"{stage} cap./hilo", ("stages", stage, "items_per_busy_second"), True)
+        yield (f"{stage} p50", ("stages", stage, "latency", "p50"), False)
+        yield (f"{stage} p99", ("stages", stage, "latency", "p99"), False)
+    if operations:
+        for op in sorted(set(base["summary"]["operations"]) | set(candidate["summary"]["operations"])):
+            yield (f"op {op} media", ("operations", op, "mean"), False)
+
+
+def config_differences(base: Dict[str, Any], candidate: Dict[str, Any]) -> List[str]:
+    differences = []
+    for section in ("config", "host"):
+        for key in sorted(set(base.get(section, {})) | set(candidate.get(section, {}))):
+            if key == "hostname":
+                continue
+            before, after = base.get(section, {}).get(key), candidate.get(section, {}).get(key)
+            if before != after:
+                differences.append(f"{section}.{key}: {before} -> {after}")
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara dos resultados de bench_pipeline.py")
+    parser.add_argument("base")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Cambio relativo que cuenta como regresión")
+    parser.add_argument("--operations", action="store_true", help="Incluir las operaciones internas")
+    args = parser.parse_args()
+
+    base, candidate = load(args.base), load(args.candidate)
+    print(f"Base:      {base['git'].get('commit', '')[:10]} {base['git'].get('subject') or ''} ({base['timestamp']})")
+    print(f"Candidato: {candidate['git'].get('commit', '')[:10]} {candidate['git'].get('subject') or ''} ({candidate['timestamp']})")
+    differences = config_differences(base, candidate)
+    if differences:
+        print("⚠️  Configuración o host distintos (la comparación puede no ser válida):")
+        for difference in differences:
+            print(f"   {difference}")
+
+    print("=" * 72)
+    print(f"{'métrica':<28} {'base':>12} {'candidato':>12} {'cambio':>9}")
+    print("-" * 72)
+    regressions = []
+    for name, path, higher_is_better in metrics(base, candidate, args.operations):
+        before = lookup(base["summary"], path)
+        after = lookup(candidate["summary"], path)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before if before else 0.0
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > args.threshold:
+            flag = "  ❌"
+            regressions.append(name)
+        elif -worse > args.threshold:
+            flag = "  ✅"
+        print(f"{name:<28} {before:>12.4g} {after:>12.4g} {change:>+8.1%}{flag}")
+    print("=" * 72)
+
+    if regressions:
+        print(f"❌ {len(regressions)} regresiones por encima de {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print(f"✅ Sin regresiones por encima de {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Modelos deterministas para el benchmark de pipeline: mismo contrato que AIEngine
+(analyze_batch / analyze_image / analyze_video) sin pesos ni GPU.
+
+La detección sale de la verdad del manifiesto del corpus sintético (o, para archivos
+ajenos, de un hash de la ruta), así que dos corridas producen exactamente los mismos
+resultados. El trabajo de CPU que no depende del modelo sí se hace de verdad
+(decodificar, redimensionar a la entrada de MegaDetector, recortar para BioCLIP, leer
+frames de video); la inferencia se simula con una latencia fija configurable.
+"""
+import hashlib
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+from PIL import Image
+
+from src.core.decoded_image import DecodedImage
+
+ImageSource = Union[str, DecodedImage]
+
+MD_INPUT_SIZE = 1280
+BIOCLIP_INPUT_SIZE = 224
+EMBEDDING_DIM = 512
+SPECIES = [
+    ("Odocoileus virginianus", "White-tailed Deer"),
+    ("Procyon lotor", "Raccoon"),
+    ("Sus scrofa", "Wild Boar"),
+    ("Vulpes vulpes", "Red Fox"),
+    ("Lynx rufus", "Bobcat"),
+]
+
+
+class StubAIEngine:
+    """
+    detect_ms: latencia simulada de MegaDetector por imagen.
+    classify_ms: latencia simulada de BioCLIP por recorte de animal.
+    """
+
+    def __init__(
+        self,
+        truth: Optional[Dict[str, Dict[str, Any]]] = None,
+        detect_ms: float = 0.0,
+        classify_ms: float = 0.0,
+        video_sample_fps: float = 1.0
+    ):
+        # {ruta absoluta: entrada del manifiesto}
+        self.truth = truth or {}
+        self.detect_ms = detect_ms
+        self.classify_ms = classify_ms
+        self.video_sample_fps = video_sample_fps
+
+    def analyze_image(self, image: ImageSource, release: bool = False) -> Dict[str, Any]:
+        return self.analyze_batch([image], release=release)[0]
+
+    def analyze_batch(self, images: List[ImageSource], release: bool = False) -> List[Dict[str, Any]]:
+        results = []
+        for item in images:
+            owned = not isinstance(item, DecodedImage) or release
+            try:
+                decoded = item if isinstance(item, DecodedImage) else DecodedImage.open(item)
+            except Exception as e:
+                results.append(self._error(str(e)))
+                continue
+            try:
+                results.append(self._analyze(decoded.path, decoded.pixels))
+            finally:
+                if owned:
+                    decoded.close()
+        return results
+
+    def analyze_video(self, video_path: str) -> Dict[str, Any]:
+        import cv2
+
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            return self._error(f"No se pudo abrir el video: {video_path}")
+        try:
+            fps = cap.get(cv2.CAP_PROP_FPS) or 10.0
+            step = max(1, int(round(fps / self.video_sample_fps)))
+            frames = 0
+            best = None
+            best_index = 0
+            index = 0
+            while True:
+                ok = cap.grab()
+                if not ok:
+                    break
+                if index % step == 0:
+                    ok, frame = cap.retrieve()
+                    if not ok:
+                        break
+                    frames += 1
+                    image = Image.fromarray(frame[..., ::-1])
+                    best, best_index = self._analyze(video_path, image), index
+                index += 1
+        finally:
+            cap.release()
+        if best is None:
+            return self._error("Video sin frames")
+        best.update({
+            "video_frame_index": best_index,
+            "video_frame_time": best_index / fps,
+            "video_frames_analyzed": frames
+        })
+        return best
+
+    def _analyze(self, path: str, pixels: Image.Image) -> Dict[str, Any]:
+        # Preprocesado real de MegaDetector (lado mayor a MD_INPUT_SIZE), inferencia simulada
+        scale = MD_INPUT_SIZE / max(pixels.size)
+        if scale < 1:
+            pixels.resize((round(pixels.width * scale), round(pixels.height * scale)), Image.BILINEAR).close()
+        _sleep_ms(self.detect_ms)
+
+        category, confidence, bbox = self._detection(path, pixels.size)
+        detections = [{"category": category, "confidence": confidence, "bbox": bbox}] if bbox else []
+        result = {
+            "md_category": category,
+            "md_confidence": confidence,
+            "md_bbox": bbox or [],
+            "llava_caption": None,
+            "species_prediction": None,
+            "detections": detections,
+        }
+        if category == "animal" and bbox:
+            crop = pixels.crop(tuple(int(v) for v in bbox)).resize((BIOCLIP_INPUT_SIZE, BIOCLIP_INPUT_SIZE))
+            crop.close()
+            _sleep_ms(self.classify_ms)
+            species = self._species(path)
+            detections[0].update({key: species[key] for key in ("species_common", "species_scientific", "species_confidence")})
+            result.update(species)
+            result["species_prediction"] = f"{species['species_common']} ({species['species_scientific']})"
+        return result
+
+    def _detection(self, path: str, size) -> tuple:
+        entry = self.truth.get(str(Path(path)))
+        if entry is not None:
+            category = entry["category"]
+            bbox = entry.get("bbox")
+        else:
+            digest = _digest(path)
+            category = ("animal", "animal", "empty", "person")[digest % 4]
+            w, h = size
+            bbox = None if category == "empty" else [w * 0.25, h * 0.4, w * 0.6, h * 0.8]
+        if category == "empty":
+            return "empty", 0.0, None
+        if bbox is None:
+            # Videos: el sujeto cruza la escena; bbox del frame central
+            w, h = size
+            bbox = [w * 0.4, h * 0.5, w * 0.6, h * 0.8]
+        return category, 0.6 + (_digest(path) % 40) / 100.0, [float(v) for v in bbox]
+
+    @staticmethod
+    def _species(path: str) -> Dict[str, Any]:
+        digest = _digest(path)
+        scientific, common = SPECIES[digest % len(SPECIES)]
+        rng = np.random.default_rng(digest % len(SPECIES))
+        embedding = rng.standard_normal(EMBEDDING_DIM).astype(np.float32)
+        return {
+            "species_common": common,
+            "species_scientific": scientific,
+            "species_confidence": 0.5 + (digest % 50) / 100.0,
+            "embedding": embedding / np.linalg.norm(embedding),
+        }
+
+    @staticmethod
+    def _error(message: str) -> Dict[str, Any]:
+        return {
+            "md_category": "error",
+            "md_confidence": 0.0,
+            "md_bbox": [],
+            "llava_caption": None,
+            "species_prediction": None,
+            "detections": [],
+            "error": message,
+        }
+
+
+class StubMetadataInjector:
+    """Sustituto de MetadataInjector cuando ExifTool no está instalado (no escribe nada)."""
+
+    def write_metadata(self, file_path: str, metadata: Dict[str, Any], sidecar: bool = False) -> bool:
+        return True
+
+    def read_tags(self, file_paths: List[str], tags: List[str]) -> Dict[str, Dict[str, Any]]:
+        return {}
+
+    def close(self):
+        pass
+
+
+def _digest(path: str) -> int:
+    # Independiente de la raíz del corpus: solo el nombre del archivo
+    return int.from_bytes(hashlib.blake2b(Path(path).name.encode(), digest_size=8).digest(), "little")
+
+
+def _sleep_ms(milliseconds: float):
+    if milliseconds > 0:
+        time.sleep(milliseconds / 1000.0)
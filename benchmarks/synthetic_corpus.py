@@ -0,0 +1,292 @@
+"""
+Corpus sintético de cámara trampa para los benchmarks, reproducible con una semilla.
+
+Estructura: <raíz>/input/<estación>/<archivo>, como en el NAS. Las capturas llegan en
+ráfagas (varios frames de la misma escena a 1 s de distancia) con animal, persona o
+vacías (disparos por viento), en la mezcla de formatos de una instalación real:
+
+- JPEG y PNG con EXIF (DateTimeOriginal, serie de la cámara).
+- RAW falso (.arw): contenedor TIFF con la vista previa comprimida en JPEG (lo único que
+  decodifica el pipeline) seguida de un bloque de datos del tamaño de un sensor de
+  12 bits, para que el hash y la copia lean lo mismo que con un RAW real. Sin EXIF (la
+  fecha se toma del mtime, fijado a la hora de captura).
+- Videos cortos MP4 (mp4v) con el sujeto cruzando la escena.
+
+`manifest.json` guarda la configuración y la verdad de cada archivo (categoría, bbox en
+píxeles, ráfaga); si ya existe con la misma configuración, el corpus se reutiliza.
+
+Uso:
+    python benchmarks/synthetic_corpus.py --out /tmp/wildindex-corpus --size medium
+    python benchmarks/synthetic_corpus.py --out /tmp/corpus --count 200 --resolution 4000x3000
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+logger = logging.getLogger("WildIndex.Bench.Corpus")
+
+# Archivos por tamaño de corpus
+PRESETS = {"small": 60, "medium": 600, "large": 6000}
+# Fracción de cada formato
+DEFAULT_MIX = {"jpeg": 0.80, "png": 0.06, "raw": 0.10, "video": 0.04}
+# Probabilidad de cada tipo de escena por ráfaga
+SCENES = (("animal", 0.6), ("empty", 0.3), ("person", 0.1))
+EXTENSIONS = {"jpeg": ".jpg", "png": ".png", "raw": ".arw", "video": ".mp4"}
+
+FILES_PER_STATION = 200
+VIDEO_SIZE = (1280, 720)
+VIDEO_FPS = 10
+START_TIME = datetime(2026, 5, 1, 5, 30, 0)
+
+# Tags EXIF
+TAG_MAKE = 0x010F
+TAG_MODEL = 0x0110
+TAG_EXIF_IFD = 0x8769
+TAG_DATETIME_ORIGINAL = 0x9003
+TAG_BODY_SERIAL = 0xA431
+
+
+def parse_resolution(value: str) -> Tuple[int, int]:
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def corpus_config(
+    count: int,
+    seed: int = 0,
+    resolution: Tuple[int, int] = (2048, 1536),
+    burst: int = 3,
+    video_seconds: int = 5,
+    mix: Optional[Dict[str, float]] = None
+) -> Dict[str, Any]:
+    return {
+        "count": count,
+        "seed": seed,
+        "resolution": list(resolution),
+        "burst": burst,
+        "video_seconds": video_seconds,
+        "mix": mix or DEFAULT_MIX,
+    }
+
+
+def load_or_generate(root: Path, config: Dict[str, Any]) -> Dict[str, Any]:
+    """Retorna el manifiesto del corpus en `root`, generándolo si falta o cambió la configuración."""
+    manifest_path = root / "manifest.json"
+    if manifest_path.exists():
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("config") == config and all((root / e["path"]).exists() for e in manifest["files"]):
+            logger.info(f"♻️  Reutilizando corpus existente en {root} ({len(manifest['files'])} archivos)")
+            return manifest
+    return generate_corpus(root, config)
+
+
+def generate_corpus(root: Path, config: Dict[str, Any]) -> Dict[str, Any]:
+    rng = np.random.default_rng(config["seed"])
+    width, height = config["resolution"]
+    input_dir = root / "input"
+    shutil.rmtree(input_dir, ignore_errors=True)
+
+    quotas = _quotas(config["count"], config["mix"])
+    stations = max(1, config["count"] // FILES_PER_STATION)
+    logger.info(f"🧪 Generando {config['count']} archivos ({width}x{height}, {stations} estaciones) en {root}...")
+
+    files: List[Dict[str, Any]] = []
+    clock = {station: START_TIME + timedelta(hours=station) for station in range(stations)}
+    index = 0
+    burst_id = 0
+    while any(quotas.values()):
+        station = burst_id % stations
+        station_dir = input_dir / f"CAM{station + 1:02d}"
+        station_dir.mkdir(parents=True, exist_ok=True)
+        serial = f"WI{station + 1:06d}"
+        category = _pick_scene(rng)
+
+        # Una ráfaga: mismos fondo, formato y sujeto (que se mueve un poco entre frames)
+        kind = _pick_kind(quotas, rng)
+        frames = 1 if kind == "video" else min(config["burst"], quotas[kind])
+        quotas[kind] -= frames
+        background = _background(rng, width, height)
+        bbox = _subject_bbox(rng, width, height) if category != "empty" else None
+        for frame in range(frames):
+            captured = clock[station]
+            name = f"{station_dir.name}_{index:06d}{EXTENSIONS[kind]}"
+            path = station_dir / name
+            if kind == "video":
+                _write_video(path, rng, category, config["video_seconds"])
+                frame_bbox = None
+            else:
+                frame_bbox = _move(bbox, rng, width, height) if bbox else None
+                image = _render(background, rng, category, frame_bbox)
+                _save_image(image, path, kind, captured, serial, rng)
+            epoch = captured.timestamp()
+            os.utime(path, (epoch, epoch))
+            files.append({
+                "path": str(path.relative_to(root)),
+                "kind": kind,
+                "category": category,
+                "bbox": frame_bbox,
+                "burst_id": burst_id,
+                "frame": frame,
+                "capture_time": captured.isoformat(),
+                "size": path.stat().st_size,
+            })
+            clock[station] = captured + timedelta(seconds=1)
+            index += 1
+        # Siguiente ráfaga de la estación: minutos después
+        clock[station] += timedelta(minutes=int(rng.integers(2, 90)))
+        burst_id += 1
+
+    manifest = {"config": config, "files": files}
+    with open(root / "manifest.json", "w") as f:
+        json.dump(manifest, f, indent=1)
+    total_mb = sum(entry["size"] for entry in files) / (1024 * 1024)
+    logger.info(f"✅ Corpus generado: {len(files)} archivos, {total_mb:.0f} MB")
+    return manifest
+
+
+def _quotas(count: int, mix: Dict[str, float]) -> Dict[str, int]:
+    """Archivos exactos por formato (el redondeo se compensa con JPEG)."""
+    total = sum(mix.values())
+    quotas = {kind: int(round(count * share / total)) for kind, share in mix.items()}
+    quotas["jpeg"] = max(0, quotas.get("jpeg", 0) + count - sum(quotas.values()))
+    return quotas
+
+
+def _pick_kind(quotas: Dict[str, int], rng: np.random.Generator) -> str:
+    """Formato de la siguiente ráfaga, con probabilidad proporcional a lo que falta de cada uno."""
+    kinds = [kind for kind, left in quotas.items() if left > 0]
+    weights = np.array([quotas[kind] for kind in kinds], dtype=float)
+    return kinds[int(rng.choice(len(kinds), p=weights / weights.sum()))]
+
+
+def _pick_scene(rng: np.random.Generator) -> str:
+    value = rng.random()
+    for category, probability in SCENES:
+        if value < probability:
+            return category
+        value -= probability
+    return SCENES[-1][0]
+
+
+def _background(rng: np.random.Generator, width: int, height: int) -> np.ndarray:
+    """Fondo suave (vegetación desenfocada): ruido de baja frecuencia ampliado."""
+    low = rng.integers(30, 170, size=(12, 16, 3), dtype=np.uint8)
+    low[..., 1] = np.clip(low[..., 1].astype(np.int16) + 30, 0, 255)
+    base = Image.fromarray(low).resize((width, height), Image.BICUBIC)
+    return np.asarray(base, dtype=np.int16)
+
+
+def _subject_bbox(rng: np.random.Generator, width: int, height: int) -> List[float]:
+    w = float(rng.uniform(0.08, 0.3) * width)
+    h = float(w * rng.uniform(0.5, 0.9))
+    x = float(rng.uniform(0, width - w))
+    y = float(rng.uniform(height * 0.3, height - h))
+    return [x, y, x + w, y + h]
+
+
+def _move(bbox: List[float], rng: np.random.Generator, width: int, height: int) -> List[float]:
+    dx = float(rng.normal(0, 0.02 * width))
+    dx = min(max(dx, -bbox[0]), width - bbox[2])
+    return [round(bbox[0] + dx, 1), bbox[1], round(bbox[2] + dx, 1), bbox[3]]
+
+
+def _render(background: np.ndarray, rng: np.random.Generator, category: str, bbox: Optional[List[float]]) -> Image.Image:
+    """Frame = fondo + ruido de sensor + sujeto (elipse marrón o figura alta)."""
+    noise = rng.integers(-6, 7, size=background.shape[:2] + (1,), dtype=np.int16)
+    image = Image.fromarray(np.clip(background + noise, 0, 255).astype(np.uint8))
+    if bbox:
+        draw = ImageDraw.Draw(image)
+        x0, y0, x1, y1 = bbox
+        if category == "person":
+            cx = (x0 + x1) / 2
+            draw.rectangle([cx - (x1 - x0) / 6, y0, cx + (x1 - x0) / 6, y1], fill=(60, 60, 90))
+        else:
+            draw.ellipse([x0, y0 + (y1 - y0) * 0.25, x1 - (x1 - x0) * 0.2, y1], fill=(110, 80, 50))
+            draw.ellipse([x1 - (x1 - x0) * 0.3, y0, x1, y0 + (y1 - y0) * 0.45], fill=(100, 70, 45))
+    return image
+
+
+def _exif(captured: datetime, serial: str) -> Image.Exif:
+    exif = Image.Exif()
+    exif[TAG_MAKE] = "WildIndex"
+    exif[TAG_MODEL] = "Synthetic Trail Cam"
+    exif_ifd = exif.get_ifd(TAG_EXIF_IFD)
+    exif_ifd[TAG_DATETIME_ORIGINAL] = captured.strftime("%Y:%m:%d %H:%M:%S")
+    exif_ifd[TAG_BODY_SERIAL] = serial
+    return exif
+
+
+def _save_image(image: Image.Image, path: Path, kind: str, captured: datetime, serial: str, rng: np.random.Generator):
+    if kind == "jpeg":
+        image.save(path, format="JPEG", quality=90, exif=_exif(captured, serial))
+    elif kind == "png":
+        image.save(path, format="PNG", exif=_exif(captured, serial))
+    else:
+        # Vista previa JPEG en TIFF + datos "de sensor" (12 bits por píxel) al final
+        image.save(path, format="TIFF", compression="jpeg")
+        with open(path, "ab") as f:
+            f.write(rng.bytes(image.width * image.height * 3 // 2))
+
+
+def _write_video(path: Path, rng: np.random.Generator, category: str, seconds: int):
+    import cv2
+
+    width, height = VIDEO_SIZE
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), VIDEO_FPS, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError("OpenCV no puede escribir MP4 (mp4v) en este entorno")
+    background = _background(rng, width, height)
+    bbox = _subject_bbox(rng, width, height) if category != "empty" else None
+    frames = seconds * VIDEO_FPS
+    try:
+        for frame in range(frames):
+            frame_bbox = None
+            if bbox:
+                # El sujeto cruza la escena de izquierda a derecha
+                shift = (frame / max(frames - 1, 1)) * (width - (bbox[2] - bbox[0])) - bbox[0]
+                frame_bbox = [bbox[0] + shift, bbox[1], bbox[2] + shift, bbox[3]]
+            image = _render(background, rng, category, frame_bbox)
+            writer.write(np.asarray(image)[..., ::-1])
+    finally:
+        writer.release()
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Genera un corpus sintético de cámara trampa")
+    parser.add_argument("--out", required=True, help="Directorio del corpus")
+    parser.add_argument("--size", choices=sorted(PRESETS), default="small")
+    parser.add_argument("--count", type=int, default=0, help="Número de archivos (anula --size)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--resolution", default="2048x1536", help="Resolución de las fotos (ANCHOxALTO)")
+    parser.add_argument("--burst", type=int, default=3, help="Frames por ráfaga")
+    parser.add_argument("--video-seconds", type=int, default=5)
+    args = parser.parse_args()
+
+    config = corpus_config(
+        args.count or PRESETS[args.size],
+        seed=args.seed,
+        resolution=parse_resolution(args.resolution),
+        burst=args.burst,
+        video_seconds=args.video_seconds
+    )
+    root = Path(args.out)
+    root.mkdir(parents=True, exist_ok=True)
+    load_or_generate(root, config)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""
+Paridad entre backends de inferencia (PyTorch fp32 vs ONNX Runtime / int8).
+
+Ejecuta MegaDetector y BioCLIP con el backend de referencia ('torch') y con el backend
+candidato sobre las mismas imágenes, y verifica que:
+  - La detección principal coincide en categoría, con IoU y confianza dentro de tolerancia.
+  - La especie top-1 de BioCLIP coincide en al menos `--min-top1-agreement` de los recortes,
+    y los embeddings tienen similitud coseno >= `--min-cosine`.
+
+Uso:
+    python scripts/backend_parity.py --images /app/data/sample --backend onnx
+    python scripts/backend_parity.py --images ./fotos --backend onnx-int8 --skip-detector
+Retorna código de salida 1 si alguna comprobación falla.
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import torch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.core.decoded_image import DecodedImage
+from src.core.detectors.megadetector import MegaDetector
+from src.core.backends.clip_encoders import TorchImageEncoder, create_image_encoder
+from src.core.species_list import load_species_list
+from src.core.species_embeddings import load_species_embeddings
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("WildIndex.Parity")
+
+BIOCLIP_MODEL = 'hf-hub:imageomics/bioclip'
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.tiff'}
+
+
+def iou(a: List[float], b: List[float]) -> float:
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def compare_detector(args, images: List[DecodedImage]) -> bool:
+    if args.backend == "torch-int8":
+        logger.info("ℹ️  torch-int8 no aplica a MegaDetector (sin capas Linear). Se omite la detección.")
+        return True
+
+    logger.info(f"🔍 MegaDetector: torch vs {args.backend}")
+    common = dict(confidence_threshold=args.threshold, device="cpu", onnx_dir=args.onnx_dir)
+    reference = MegaDetector(args.model, backend="torch", **common)
+    candidate = MegaDetector(args.model, backend=args.backend, **common)
+    if candidate.backend == "torch":
+        logger.error(f"❌ El backend {args.backend} no se pudo cargar para MegaDetector.")
+        return False
+
+    pixels = [img.pixels for img in images]
+    ref_results = reference.detect_batch(pixels)
+    cand_results = candidate.detect_batch(pixels)
+
+    failures = 0
+    for img, ref, cand in zip(images, ref_results, cand_results):
+        problem = _detection_mismatch(ref, cand, args)
+        if problem:
+            failures += 1
+            logger.warning(f"⚠️ {Path(img.path).name}: {problem}")
+
+    logger.info(f"📊 Detección: {len(images) - failures}/{len(images)} imágenes dentro de tolerancia")
+    return failures <= args.max_detector_failures
+
+
+def _detection_mismatch(ref: Dict[str, Any], cand: Dict[str, Any], args) -> Optional[str]:
+    if 'error' in ref or 'error' in cand:
+        return f"error de inferencia (ref={ref.get('error')}, cand={cand.get('error')})"
+    if ref['md_category'] != cand['md_category']:
+        return f"categoría {ref['md_category']} vs {cand['md_category']}"
+    if ref['md_category'] == 'empty':
+        return None
+    if abs(ref['md_confidence'] - cand['md_confidence']) > args.conf_tolerance:
+        return f"confianza {ref['md_confidence']:.3f} vs {cand['md_confidence']:.3f}"
+    overlap = iou(ref['md_bbox'], cand['md_bbox'])
+    if overlap < args.min_iou:
+        return f"IoU del bbox principal {overlap:.3f}"
+    return None
+
+
+def compare_bioclip(args, images: List[DecodedImage]) -> bool:
+    import open_clip
+
+    logger.info(f"🧬 BioCLIP: torch vs {args.backend}")
+    # Dos instancias: torch-int8 cuantiza la torre visual in-place
+    ref_model, _, preprocess = open_clip.create_model_and_transforms(BIOCLIP_MODEL)
+    cand_model, _, _ = open_clip.create_model_and_transforms(BIOCLIP_MODEL)
+    tokenizer = open_clip.get_tokenizer(BIOCLIP_MODEL)
+    ref_model.eval()
+    cand_model.eval()
+
+    labels = load_species_list(args.species_list)
+    species = torch.from_numpy(load_species_embeddings(
+        ref_model, tokenizer, labels, model_id=BIOCLIP_MODEL, cache_dir=args.species_cache_dir
+    ))
+
+    reference = TorchImageEncoder(ref_model)
+    candidate = create_image_encoder(args.backend, cand_model, BIOCLIP_MODEL, args.onnx_dir)
+
+    # Imagen completa como recorte: la paridad del codificador no depende del detector
+    batch = torch.stack([preprocess(img.pixels) for img in images])
+    ref_features = torch.nn.functional.normalize(reference(batch).float(), dim=-1)
+    cand_features = torch.nn.functional.normalize(candidate(batch).float(), dim=-1)
+
+    cosine = (ref_features * cand_features).sum(dim=-1)
+    ref_top1 = (ref_features @ species.T).argmax(dim=-1)
+    cand_top1 = (cand_features @ species.T).argmax(dim=-1)
+    agreement = (ref_top1 == cand_top1).float().mean().item()
+
+    for img, ref_idx, cand_idx in zip(images, ref_top1.tolist(), cand_top1.tolist()):
+        if ref_idx != cand_idx:
+            logger.warning(f"⚠️ {Path(img.path).name}: top-1 {labels[ref_idx]} vs {labels[cand_idx]}")
+
+    logger.info(
+        f"📊 BioCLIP: acuerdo top-1 {agreement:.1%}, "
+        f"coseno mín {cosine.min().item():.4f} / medio {cosine.mean().item():.4f}"
+    )
+    return agreement >= args.min_top1_agreement and cosine.min().item() >= args.min_cosine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paridad de backends de inferencia de WildIndex")
+    parser.add_argument("--images", required=True, help="Carpeta con imágenes de muestra")
+    parser.add_argument("--backend", default="onnx", choices=["torch-int8", "onnx", "onnx-int8"])
+    parser.add_argument("--limit", type=int, default=64, help="Máximo de imágenes a comparar")
+    parser.add_argument("--model", default="models/md_v5a.0.0.pt", help="Ruta al modelo MegaDetector")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--onnx-dir", default="models/onnx")
+    parser.add_argument("--species-list", default=None)
+    parser.add_argument("--species-cache-dir", default="models/species_cache")
+    parser.add_argument("--min-iou", type=float, default=0.9)
+    parser.add_argument("--conf-tolerance", type=float, default=0.05)
+    parser.add_argument("--max-detector-failures", type=int, default=0)
+    parser.add_argument("--min-top1-agreement", type=float, default=0.95)
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    parser.add_argument("--skip-detector", action="store_true")
+    parser.add_argument("--skip-bioclip", action="store_true")
+    args = parser.parse_args()
+
+    paths = sorted(p for p in Path(args.images).rglob("*") if p.suffix.lower() in IMAGE_EXTENSIONS)[:args.limit]
+    if not paths:
+        logger.error(f"❌ No hay imágenes en {args.images}")
+        sys.exit(1)
+
+    images = [DecodedImage.open(str(p)) for p in paths]
+    ok = True
+    try:
+        if not args.skip_detector:
+            ok &= compare_detector(args, images)
+        if not args.skip_bioclip:
+            ok &= compare_bioclip(args, images)
+    finally:
+        for img in images:
+            img.close()
+
+    if ok:
+        logger.info(f"✅ Backend {args.backend} dentro de tolerancia.")
+    else:
+        logger.error(f"❌ Backend {args.backend} fuera de tolerancia.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Backfill de datos de captura (fecha EXIF, serie de cámara, estación) para registros
+procesados antes de que se extrajeran al ingerir.
+
+Reanudable: solo toma filas PROCESSED con capture_source NULL (índice parcial
+idx_capture_backfill) y cada lote se confirma por separado, así que puede interrumpirse
+y relanzarse en cualquier momento, incluso con el agente en marcha. Lee los metadatos
+con una llamada `exiftool -j` por lote. Si el original ya no existe se usa la copia
+procesada; si tampoco, la fila queda marcada como 'missing' para no reintentarla.
+
+Uso:
+    python scripts/backfill_capture_time.py --db /app/data/db/wildindex.db --input-root /app/data/input
+    python scripts/backfill_capture_time.py --batch-size 500 --limit 10000
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.database.db_manager import DatabaseManager
+from src.core.capture_info import CAPTURE_TAGS, capture_info
+from src.core.metadata_injector import MetadataInjector
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("WildIndex.Backfill")
+
+
+def readable_path(row) -> Optional[str]:
+    for key in ("original_path", "output_path"):
+        if row.get(key) and os.path.exists(row[key]):
+            return row[key]
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill de fecha de captura / serie / estación")
+    parser.add_argument("--db", default=os.getenv("DB_PATH", "/app/data/db/wildindex.db"))
+    parser.add_argument("--input-root", default=os.getenv("NAS_INPUT_PATH", "/app/data/input"),
+                        help="Raíz de entrada (la estación es la primera carpeta bajo ella)")
+    parser.add_argument("--batch-size", type=int, default=200, help="Archivos por llamada a exiftool")
+    parser.add_argument("--limit", type=int, default=0, help="Máximo de filas en esta corrida (0 = todas)")
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    reader = MetadataInjector()
+    input_root = Path(args.input_root)
+
+    done = 0
+    missing = 0
+    after_id = ""
+    start = time.monotonic()
+    try:
+        while not args.limit or done < args.limit:
+            batch_size = args.batch_size if not args.limit else min(args.batch_size, args.limit - done)
+            rows = db.get_missing_capture(after_id, batch_size)
+            if not rows:
+                break
+            after_id = rows[-1]["id"]
+
+            paths = {row["id"]: readable_path(row) for row in rows}
+            tags = reader.read_tags([path for path in paths.values() if path], CAPTURE_TAGS)
+
+            updates = {}
+            for row in rows:
+                path = paths[row["id"]]
+                if path is None:
+                    updates[row["id"]] = {"capture_source": "missing"}
+                    missing += 1
+                    continue
+                try:
+                    updates[row["id"]] = capture_info(
+                        Path(row["original_path"]), tags.get(path), input_root, mtime=os.stat(path).st_mtime
+                    )
+                except OSError:
+                    updates[row["id"]] = {"capture_source": "missing"}
+                    missing += 1
+            db.update_capture_info(updates)
+
+            done += len(rows)
+            rate = done / max(time.monotonic() - start, 1e-9)
+            logger.info(f"🕒 {done} filas actualizadas ({rate:.0f} filas/s, {missing} sin archivo)")
+    finally:
+        reader.close()
+        db.close()
+
+    logger.info(f"✅ Backfill terminado: {done} filas, {missing} sin archivo.")
+
+
+if __name__ == "__main__":
+    main()
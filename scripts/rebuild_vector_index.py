@@ -0,0 +1,109 @@
+"""
+Reconstruye el índice vectorial (.faiss) desde los embeddings guardados en SQLite.
+
+La tabla `embeddings` es la fuente de verdad: cada vector se guarda en la DB antes de
+añadirse al índice. Sirve para recuperar un .faiss corrupto o borrado, o para cambiar
+de tipo de índice (--kind). Con --reembed primero recalcula con BioCLIP los embeddings
+que no tienen vector guardado (filas anteriores a la columna `vector`), leyendo el
+original o, si ya no existe, la copia procesada. Detener el agente antes: al apagarse
+guardaría su índice en memoria encima del reconstruido.
+
+Uso:
+    python scripts/rebuild_vector_index.py --db /app/data/db/wildindex.db
+    python scripts/rebuild_vector_index.py --reembed --kind flat
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.database.db_manager import DatabaseManager
+from src.core.vector_index import VectorIndex, normalize
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("WildIndex.Rebuild")
+
+
+def readable_path(row) -> Optional[str]:
+    for key in ("original_path", "output_path"):
+        if row.get(key) and os.path.exists(row[key]):
+            return row[key]
+    return None
+
+
+def reembed_missing(db: DatabaseManager, batch_size: int) -> int:
+    """Recalcula y guarda los vectores que faltan. Retorna cuántos quedaron sin recuperar."""
+    from src.core.ai_engine import AIEngine
+
+    ai = AIEngine(config={})
+    done = 0
+    missing = 0
+    after_id = 0
+    start = time.monotonic()
+    while True:
+        rows = db.get_embeddings_without_vector(after_id, batch_size)
+        if not rows:
+            break
+        after_id = rows[-1]["vector_id"]
+        vectors = []
+        for row in rows:
+            path = readable_path(row)
+            vector = ai.embed_image(path) if path else None
+            if vector is None:
+                missing += 1
+                continue
+            vectors.append((row["vector_id"], normalize(vector.reshape(1, -1))[0].tobytes()))
+        db.store_vectors(vectors)
+        done += len(vectors)
+        rate = done / max(time.monotonic() - start, 1e-9)
+        logger.info(f"🧬 {done} embeddings recalculados ({rate:.1f}/s, {missing} sin archivo)")
+    return missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruye el índice vectorial desde la DB")
+    parser.add_argument("--db", default=os.getenv("DB_PATH", "/app/data/db/wildindex.db"))
+    parser.add_argument("--index", default=os.getenv("VECTOR_INDEX_PATH"))
+    parser.add_argument("--kind", choices=["hnsw", "flat"], default="hnsw")
+    parser.add_argument("--reembed", action="store_true",
+                        help="Recalcular con BioCLIP los embeddings sin vector guardado")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--force", action="store_true",
+                        help="Reconstruir aunque haya embeddings sin vector (quedan fuera del índice)")
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    try:
+        if args.reembed:
+            reembed_missing(db, args.batch_size)
+        without_vector = len(db.get_embeddings_without_vector(0, 1))
+        if without_vector and not args.force:
+            logger.error("❌ Hay embeddings sin vector guardado: usar --reembed (o --force para omitirlos).")
+            sys.exit(1)
+
+        index_path = args.index or str(Path(args.db).with_suffix(".faiss"))
+        # Sin cargar el .faiss existente: se reconstruye desde cero y se reemplaza de forma atómica
+        rebuild_path = Path(index_path + ".rebuild")
+        rebuild_path.unlink(missing_ok=True)
+        index = VectorIndex(str(rebuild_path), db, kind=args.kind)
+        start = time.monotonic()
+        index.rebuild()
+        if not index.size:
+            logger.warning("⚠️ No hay vectores guardados: el índice existente no se toca.")
+            return
+        os.replace(rebuild_path, index_path)
+        logger.info(f"✅ Índice reconstruido: {index.size} vectores en {time.monotonic() - start:.1f}s -> {index_path}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+import argparse
+import logging
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.database.db_manager import DatabaseManager
+from src.core.vector_index import VectorIndex
+from src.core.ai_engine import AIEngine
+
+# Configuración de Logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("WildIndex.Search")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Búsqueda semántica sobre el índice vectorial de WildIndex")
+    query = parser.add_mutually_exclusive_group(required=True)
+    query.add_argument("--text", help="Consulta texto -> imagen (ej. 'Panthera onca')")
+    query.add_argument("--image", help="Consulta imagen -> imagen (ruta de una imagen)")
+    parser.add_argument("-k", type=int, default=10, help="Número de resultados")
+    parser.add_argument("--db", default=os.getenv("DB_PATH", "/app/data/db/wildindex.db"))
+    parser.add_argument("--index", default=os.getenv("VECTOR_INDEX_PATH"))
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    index = VectorIndex(args.index or str(Path(args.db).with_suffix(".faiss")), db)
+    ai = AIEngine(config={})
+
+    start = time.perf_counter()
+    if args.text:
+        hits = index.search_text(ai, args.text, k=args.k)
+    else:
+        hits = index.search_image(ai, args.image, k=args.k)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    print("\n" + "=" * 60)
+    print(f"🔎 {len(hits)} resultados en {elapsed_ms:.1f} ms (índice: {index.size} vectores)")
+    print("=" * 60)
+    for file_hash, score in hits:
+        record = db.get_image_by_hash(file_hash) or {}
+        print(f"{score:.3f}  {record.get('file_name', '?'):<32} {record.get('species_common') or record.get('md_category', '')}")
+    print("=" * 60 + "\n")
+
+
+if __name__ == "__main__":
+    main()
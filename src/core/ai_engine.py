@@ -1,14 +1,27 @@
 import logging
 import torch
 import os
-from typing import Dict, Any
+import time
+import numpy as np
+from typing import Dict, Any, List, Optional, Tuple, Union
 from PIL import Image
+from src.core.decoded_image import DecodedImage
+from src.core.metrics import ERRORS_TOTAL, MODEL_LOAD_SECONDS, OPERATION_SECONDS
+from src.core.profiling import span
 from src.core.detectors.megadetector import MegaDetector
+from src.core.video_analyzer import VideoAnalyzer
+from src.core.species_list import load_species_list
+from src.core.species_embeddings import load_species_embeddings
+from src.core.backends.onnx_runtime import validate_backend
+from src.core.backends.clip_encoders import TorchImageEncoder, create_image_encoder
 # LLaVA imports
 from transformers import LlavaNextProcessor, LlavaNextForConditionalGeneration, BitsAndBytesConfig
 
 logger = logging.getLogger("WildIndex.AI")
 
+# Una imagen puede llegar como ruta o ya decodificada (compartida entre etapas)
+ImageSource = Union[str, DecodedImage]
+
 class AIEngine:
     """
     Orquestador de modelos de IA (MegaDetector, LLaVA, BioCLIP).
@@ -20,8 +33,29 @@ class AIEngine:
         # 1. Cargar MegaDetector (Detección)
         self.md_model_path = config.get("megadetector_model_path", "models/md_v5a.0.0.pt")
         self.md_threshold = config.get("megadetector_threshold", 0.2)
+        self.md_batch_size = config.get("megadetector_batch_size", 32)
         # Force CPU for MegaDetector to avoid CUDA conflicts/zombie states with LLaVA
-        self.megadetector = MegaDetector(self.md_model_path, self.md_threshold, device="cpu")
+        load_start = time.perf_counter()
+        self.megadetector = MegaDetector(
+            self.md_model_path,
+            self.md_threshold,
+            device="cpu",
+            batch_size=self.md_batch_size,
+            max_detections=config.get("megadetector_max_detections", 20),
+            backend=config.get("megadetector_backend", "torch"),
+            onnx_dir=config.get("onnx_dir", "models/onnx"),
+            num_threads=config.get("onnx_threads", 0)
+        )
+        MODEL_LOAD_SECONDS.labels("megadetector").set(time.perf_counter() - load_start)
+        
+        # 1b. Videos: muestreo de frames + salida temprana sobre el mismo MegaDetector
+        self.video_analyzer = VideoAnalyzer(
+            self.megadetector,
+            sample_fps=config.get("video_sample_fps", 1.0),
+            max_frames=config.get("video_max_frames", 120),
+            batch_size=config.get("video_batch_size", 8),
+            early_exit_confidence=config.get("video_early_exit_confidence", 0.8)
+        )
         
         # 2. LLaVA (Descripción) - DESACTIVADO
         # Razón: bitsandbytes requiere compilación custom para CUDA en esta imagen base
@@ -32,6 +66,12 @@ class AIEngine:
         logger.info("ℹ️  LLaVA desactivado. Sistema enfocado en clasificación de especies (BioCLIP).")
 
         # 3. Cargar BioCLIP (Especies)
+        self.bioclip_batch_size = config.get("bioclip_batch_size", 64)
+        self.bioclip_top_k = config.get("bioclip_top_k", 3)
+        self.species_list_path = config.get("species_list_path")
+        self.species_cache_dir = config.get("species_cache_dir", "models/species_cache")
+        # Backend del codificador de imagen: torch | torch-int8 | onnx | onnx-int8
+        self.bioclip_backend = validate_backend(config.get("bioclip_backend", "torch"))
         self.bioclip_model = None
         self._load_bioclip()
 
@@ -60,16 +100,116 @@ class AIEngine:
             logger.error(f"❌ Error cargando LLaVA: {e}")
             logger.warning("⚠️ Continuando sin capacidades de descripción detallada.")
 
-    def analyze_image(self, image_path: str) -> Dict[str, Any]:
+    def analyze_image(self, image: ImageSource, release: bool = False) -> Dict[str, Any]:
         """
         Pipeline principal:
         1. MegaDetector -> Detectar si hay algo.
         2. Si hay animal/persona -> LLaVA -> Describir qué hace.
         3. Si hay animal -> BioCLIP -> Clasificar especie.
         """
-        # 1. Detección
-        md_result = self.megadetector.detect(image_path)
-        
+        return self.analyze_batch([image], release=release)[0]
+
+    def analyze_batch(self, images: List[ImageSource], release: bool = False) -> List[Dict[str, Any]]:
+        """
+        Versión en lote de analyze_image: MegaDetector corre una sola vez sobre todo el lote
+        y BioCLIP clasifica los recortes de todas las detecciones de animal del lote (no
+        solo la principal de cada imagen) en una sola pasada.
+
+        Acepta rutas o DecodedImage. Cada archivo se decodifica una sola vez y los mismos
+        píxeles se comparten con todos los modelos. Las imágenes decodificadas aquí se
+        liberan en cuanto termina su última etapa; las DecodedImage recibidas solo se
+        liberan si `release=True` (si no, el llamador es responsable de cerrarlas).
+        Retorna un resultado por imagen, en el mismo orden de entrada.
+        """
+        decoded: List[Optional[DecodedImage]] = []
+        owned: List[bool] = []
+        for item in images:
+            if isinstance(item, DecodedImage):
+                decoded.append(item)
+                owned.append(release)
+                continue
+            try:
+                with span("decode", file=os.path.basename(str(item))):
+                    decoded.append(DecodedImage.open(item))
+                owned.append(True)
+            except Exception as e:
+                logger.error(f"❌ Error decodificando {item}: {e}")
+                ERRORS_TOTAL.labels("decode").inc()
+                decoded.append(None)
+                owned.append(False)
+
+        try:
+            # 1. Detección (una pasada del modelo por lote, sobre los píxeles ya decodificados)
+            md_results: List[Dict[str, Any]] = [{"error": "No se pudo decodificar la imagen"} for _ in decoded]
+            valid = [idx for idx, img in enumerate(decoded) if img is not None]
+            with OPERATION_SECONDS.labels("megadetector").time(), span("megadetector", images=len(valid)):
+                detections = self.megadetector.detect_batch([decoded[idx].pixels for idx in valid])
+            for idx, md_result in zip(valid, detections):
+                md_results[idx] = md_result
+
+            results = []
+            crops = []
+            owners = []
+            for idx, (img, md_result) in enumerate(zip(decoded, md_results)):
+                result = self._build_result(img, md_result)
+                results.append(result)
+
+                # Recortes de todas las detecciones de animal (se clasifican después, en lote)
+                if self.bioclip_model and img is not None:
+                    self._collect_crops(img, result, idx, crops, owners)
+
+                # Última etapa que usa los píxeles completos: liberar
+                if owned[idx]:
+                    img.close()
+
+        finally:
+            for img, is_owned in zip(decoded, owned):
+                if is_owned and img is not None:
+                    img.close()
+
+        # 3. Clasificación de Especie (BioCLIP): todos los recortes del lote en una pasada
+        if crops:
+            with span("bioclip", crops=len(crops)):
+                predictions = self._classify_crops(crops)
+            self._apply_species(results, owners, predictions)
+
+        return results
+
+    def analyze_video(self, video_path: str) -> Dict[str, Any]:
+        """
+        Analiza un clip: muestrea frames, los pasa por MegaDetector en lotes con salida
+        temprana, y clasifica con BioCLIP (y describe con LLaVA) solo el mejor frame.
+        """
+        try:
+            with OPERATION_SECONDS.labels("video").time(), span("video", file=os.path.basename(video_path)):
+                best = self.video_analyzer.find_best_frame(video_path)
+        except Exception as e:
+            ERRORS_TOTAL.labels("video").inc()
+            best = {"md_result": {"error": str(e)}, "frames_analyzed": 0}
+
+        frame = best.get("frame")
+        decoded = DecodedImage(video_path, frame) if frame is not None else None
+        try:
+            result = self._build_result(decoded, best["md_result"])
+            result.update({
+                "video_frame_index": best.get("frame_index"),
+                "video_frame_time": best.get("frame_time"),
+                "video_frames_analyzed": best.get("frames_analyzed", 0)
+            })
+
+            if self.bioclip_model and decoded is not None:
+                crops, owners = [], []
+                self._collect_crops(decoded, result, 0, crops, owners)
+                if crops:
+                    self._apply_species([result], owners, self._classify_crops(crops))
+        finally:
+            if decoded is not None:
+                decoded.close()
+
+        return result
+
+    def _build_result(self, image: Optional[DecodedImage], md_result: Dict[str, Any]) -> Dict[str, Any]:
+        """Completa el resultado de detección con la descripción (LLaVA)."""
         # Fix: MegaDetector devuelve 'md_category', no 'category'
         if 'error' in md_result:
             logger.error(f"Error en detección: {md_result['error']}")
@@ -78,7 +218,8 @@ class AIEngine:
                 "md_confidence": 0.0,
                 "md_bbox": [],
                 "llava_caption": None,
-                "species_prediction": None
+                "species_prediction": None,
+                "detections": []
             }
 
         category = md_result['md_category']
@@ -88,32 +229,67 @@ class AIEngine:
             "md_confidence": md_result['md_confidence'],
             "md_bbox": md_result['md_bbox'],
             "llava_caption": None,
-            "species_prediction": None
+            "species_prediction": None,
+            # Todas las detecciones sobre el umbral (copias: se completan con la especie)
+            "detections": [dict(det) for det in md_result.get('detections', [])]
         }
 
         # 2. Descripción (Solo si vale la pena)
         if category in ['animal', 'person'] and self.llava_model:
-            result['llava_caption'] = self._generate_caption(image_path, category)
-            
-        # 3. Clasificación de Especie (BioCLIP)
-        if category == 'animal' and self.bioclip_model:
-            if result['md_bbox'] and len(result['md_bbox']) == 4:
-                species_result = self._analyze_species(image_path, result['md_bbox'])
-                if species_result:
-                    result.update(species_result)
-                    # Actualizar species_prediction para compatibilidad
-                    result['species_prediction'] = f"{species_result['species_common']} ({species_result['species_scientific']})"
+            with span("llava", file=os.path.basename(image.path)):
+                result['llava_caption'] = self._generate_caption(image, category)
 
         return result
 
-    def _generate_caption(self, image_path: str, category: str) -> str:
-        """Genera una descripción usando LLaVA."""
+    def _collect_crops(
+        self,
+        image: DecodedImage,
+        result: Dict[str, Any],
+        idx: int,
+        crops: List[Image.Image],
+        owners: List[Tuple[int, int]]
+    ):
+        """
+        Añade a `crops` el recorte de cada detección de animal de la imagen y a `owners`
+        su (índice de imagen, índice de detección). Los píxeles se decodificaron una sola vez.
+        """
+        for det_index, det in enumerate(result['detections']):
+            if det['category'] != 'animal':
+                continue
+            crop = self._crop_detection(image.pixels, det['bbox'])
+            if crop is not None:
+                crops.append(crop)
+                owners.append((idx, det_index))
+
+    @staticmethod
+    def _apply_species(
+        results: List[Dict[str, Any]],
+        owners: List[Tuple[int, int]],
+        predictions: List[Optional[Dict[str, Any]]]
+    ):
+        """
+        Reparte las predicciones de BioCLIP entre las detecciones de cada imagen.
+        La especie (y el embedding) a nivel de imagen es la de la detección de animal
+        más confiable: las detecciones vienen ordenadas por confianza.
+        """
+        for (idx, det_index), species_result in zip(owners, predictions):
+            if not species_result:
+                continue
+            result = results[idx]
+            result['detections'][det_index].update({
+                "species_common": species_result['species_common'],
+                "species_scientific": species_result['species_scientific'],
+                "species_confidence": species_result['species_confidence']
+            })
+            if result.get('species_common') is None:
+                result.update(species_result)
+                # Actualizar species_prediction para compatibilidad
+                result['species_prediction'] = f"{species_result['species_common']} ({species_result['species_scientific']})"
+
+    def _generate_caption(self, decoded: DecodedImage, category: str) -> str:
+        """Genera una descripción usando LLaVA (sobre los píxeles ya decodificados en RGB)."""
         try:
-            image = Image.open(image_path)
-            
-            # Asegurar formato RGB
-            if image.mode != "RGB":
-                image = image.convert("RGB")
+            image = decoded.pixels
 
             # Prompt manual simplificado para evitar problemas con templates
             # Llava-Next espera [INST] <image>\nTEXT [/INST]
@@ -150,6 +326,7 @@ class AIEngine:
 
     def _load_bioclip(self):
         """Carga BioCLIP para identificación de especies."""
+        load_start = time.perf_counter()
         try:
             import open_clip
             logger.info("🧬 Cargando BioCLIP (imageomics/bioclip)...")
@@ -161,90 +338,185 @@ class AIEngine:
             self.bioclip_device = "cpu"
             self.bioclip_model.to(self.bioclip_device)
             
-            # Pre-computar embeddings de texto para la lista de especies
-            from src.core.species_list import SPECIES_LIST
-            self.species_labels = SPECIES_LIST
-            text_tokens = self.bioclip_tokenizer(self.species_labels).to(self.bioclip_device)
-            
-            # No usar autocast en CPU
-            with torch.no_grad():
-                self.species_embeddings = self.bioclip_model.encode_text(text_tokens)
-                self.species_embeddings /= self.species_embeddings.norm(dim=-1, keepdim=True)
+            # Embeddings de texto del vocabulario: caché en disco mapeada en memoria
+            # (solo se recalcula si cambia el modelo o la lista de especies)
+            self.species_labels = load_species_list(self.species_list_path)
+            matrix = load_species_embeddings(
+                self.bioclip_model,
+                self.bioclip_tokenizer,
+                self.species_labels,
+                model_id=model_name,
+                cache_dir=self.species_cache_dir,
+                device=self.bioclip_device
+            )
+            self.species_embeddings = torch.from_numpy(matrix)
+
+            # Codificador de imagen (el de texto sigue en PyTorch fp32: solo se usa para la
+            # caché de especies y las consultas de búsqueda)
+            self.image_encoder = self._create_image_encoder(model_name)
                 
-            logger.info(f"✅ BioCLIP cargado con {len(self.species_labels)} especies.")
+            MODEL_LOAD_SECONDS.labels("bioclip").set(time.perf_counter() - load_start)
+            logger.info(f"✅ BioCLIP cargado con {len(self.species_labels)} especies (backend: {self.bioclip_backend}).")
             
         except Exception as e:
             logger.error(f"❌ Error cargando BioCLIP: {e}")
             self.bioclip_model = None
 
-    def _analyze_species(self, image_path: str, bbox: list) -> Dict[str, Any]:
+    def _create_image_encoder(self, model_id: str):
+        """Codificador de imagen según `bioclip_backend`, con fallback a PyTorch fp32 si falla."""
+        try:
+            return create_image_encoder(
+                self.bioclip_backend,
+                self.bioclip_model,
+                model_id=model_id,
+                onnx_dir=self.config.get("onnx_dir", "models/onnx"),
+                image_size=self._bioclip_image_size(),
+                num_threads=self.config.get("onnx_threads", 0)
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Backend {self.bioclip_backend} no disponible para BioCLIP ({e}). Usando PyTorch.")
+            self.bioclip_backend = "torch"
+            return TorchImageEncoder(self.bioclip_model)
+
+    def _bioclip_image_size(self) -> int:
+        size = getattr(self.bioclip_model.visual, "image_size", 224)
+        return size[0] if isinstance(size, (tuple, list)) else int(size)
+
+    def _analyze_species(self, image: ImageSource, bbox: list) -> Dict[str, Any]:
         """Clasifica la especie usando BioCLIP en el recorte del animal."""
         if not self.bioclip_model:
             return None
-            
+
         try:
-            # 1. Abrir imagen
-            img = Image.open(image_path).convert("RGB")
-            width, height = img.size
-            
-            # MegaDetector devuelve [xmin, ymin, xmax, ymax] en píxeles absolutos
-            # Necesitamos convertir a coordenadas normalizadas
-            if len(bbox) != 4:
-                logger.warning(f"⚠️ Bbox con formato inválido: {bbox}")
-                return None
-                
-            xmin, ymin, xmax, ymax = bbox
-            
-            # Validar coordenadas
-            if xmin >= xmax or ymin >= ymax:
-                logger.warning(f"⚠️ Bbox con coordenadas inválidas: {bbox}")
-                return None
-            
-            # Margen de seguridad (padding) - 5% del tamaño del bbox
-            bbox_width = xmax - xmin
-            bbox_height = ymax - ymin
-            padding = 0.05 * max(bbox_width, bbox_height)
-            
-            left = max(0, xmin - padding)
-            top = max(0, ymin - padding)
-            right = min(width, xmax + padding)
-            bottom = min(height, ymax + padding)
-            
-            # Validar coordenadas finales
-            if left >= right or top >= bottom:
-                logger.warning(f"⚠️ Bbox inválido después de padding: {bbox}")
-                return None
-            
-            crop = img.crop((left, top, right, bottom))
-            
-            # 2. Preprocesar
-            image_input = self.bioclip_preprocess(crop).unsqueeze(0).to(self.bioclip_device)
-            
-            # 3. Inferencia (CPU, sin autocast)
-            with torch.no_grad():
-                image_features = self.bioclip_model.encode_image(image_input)
-                image_features /= image_features.norm(dim=-1, keepdim=True)
-                text_probs = (100.0 * image_features @ self.species_embeddings.T).softmax(dim=-1)
-            
-            # 4. Top 1
-            top_prob, top_idx = text_probs[0].topk(1)
-            confidence = top_prob.item()
-            label = self.species_labels[top_idx.item()]
-            
-            # Separar Científico y Común "Panthera onca (Jaguar)"
-            if "(" in label:
-                scientific = label.split("(")[0].strip()
-                common = label.split("(")[1].replace(")", "").strip()
+            if isinstance(image, DecodedImage):
+                crop = self._crop_detection(image.pixels, bbox)
             else:
-                scientific = label
-                common = label
-                
-            return {
-                "species_scientific": scientific,
-                "species_common": common,
-                "species_confidence": confidence
-            }
-            
+                with DecodedImage.open(image) as decoded:
+                    crop = self._crop_detection(decoded.pixels, bbox)
         except Exception as e:
             logger.error(f"❌ Error en BioCLIP: {e}")
             return None
+
+        if crop is None:
+            return None
+        return self._classify_crops([crop])[0]
+
+    def _crop_detection(self, img: Image.Image, bbox: list) -> Optional[Image.Image]:
+        """Recorta el bbox (con padding del 5%) de una imagen ya decodificada."""
+        width, height = img.size
+
+        # MegaDetector devuelve [xmin, ymin, xmax, ymax] en píxeles absolutos
+        if len(bbox) != 4:
+            logger.warning(f"⚠️ Bbox con formato inválido: {bbox}")
+            return None
+            
+        xmin, ymin, xmax, ymax = bbox
+        
+        # Validar coordenadas
+        if xmin >= xmax or ymin >= ymax:
+            logger.warning(f"⚠️ Bbox con coordenadas inválidas: {bbox}")
+            return None
+        
+        # Margen de seguridad (padding) - 5% del tamaño del bbox
+        bbox_width = xmax - xmin
+        bbox_height = ymax - ymin
+        padding = 0.05 * max(bbox_width, bbox_height)
+        
+        left = max(0, xmin - padding)
+        top = max(0, ymin - padding)
+        right = min(width, xmax + padding)
+        bottom = min(height, ymax + padding)
+        
+        # Validar coordenadas finales
+        if left >= right or top >= bottom:
+            logger.warning(f"⚠️ Bbox inválido después de padding: {bbox}")
+            return None
+        
+        return img.crop((left, top, right, bottom))
+
+    def _classify_crops(self, crops: List[Image.Image]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Clasifica N recortes con BioCLIP: un tensor apilado, un encode_image y un
+        producto contra species_embeddings por cada `bioclip_batch_size` recortes.
+        Retorna un resultado (top-1 + top-k) por recorte, o None si falló su lote.
+        """
+        predictions: List[Optional[Dict[str, Any]]] = []
+        top_k = min(self.bioclip_top_k, len(self.species_labels))
+
+        for start in range(0, len(crops), self.bioclip_batch_size):
+            chunk = crops[start:start + self.bioclip_batch_size]
+            chunk_start = time.perf_counter()
+            try:
+                # 1. Preprocesar y apilar
+                image_input = torch.stack([self.bioclip_preprocess(crop) for crop in chunk]).to(self.bioclip_device)
+
+                # 2. Inferencia (CPU, sin autocast) con el backend configurado
+                image_features = self.image_encoder(image_input)
+                with torch.no_grad():
+                    image_features /= image_features.norm(dim=-1, keepdim=True)
+                    logits = 100.0 * image_features @ self.species_embeddings.T
+
+                    # 3. Top-k por recorte: probabilidades softmax solo de los k mejores
+                    # (logsumexp evita materializar el softmax completo con vocabularios grandes)
+                    top_logits, top_idxs = logits.topk(top_k, dim=-1)
+                    top_probs = (top_logits - logits.logsumexp(dim=-1, keepdim=True)).exp()
+
+                # Embedding normalizado para el índice vectorial
+                embeddings = image_features.cpu().float().numpy()
+                for probs, idxs, embedding in zip(top_probs.tolist(), top_idxs.tolist(), embeddings):
+                    prediction = self._format_species(probs, idxs)
+                    prediction["embedding"] = embedding
+                    predictions.append(prediction)
+                OPERATION_SECONDS.labels("bioclip").observe(time.perf_counter() - chunk_start)
+
+            except Exception as e:
+                logger.error(f"❌ Error en BioCLIP: {e}")
+                ERRORS_TOTAL.labels("bioclip").inc()
+                predictions.extend(None for _ in chunk)
+
+        return predictions
+
+    def embed_text(self, text: str) -> np.ndarray:
+        """Embedding BioCLIP normalizado de un texto (búsqueda texto -> imagen)."""
+        tokens = self.bioclip_tokenizer([text]).to(self.bioclip_device)
+        with torch.no_grad():
+            features = self.bioclip_model.encode_text(tokens)
+            features /= features.norm(dim=-1, keepdim=True)
+        return features[0].cpu().float().numpy()
+
+    def embed_image(self, image_path: str) -> Optional[np.ndarray]:
+        """
+        Embedding BioCLIP de una imagen de consulta, calculado igual que al indexar:
+        sobre el recorte del animal principal (o la imagen completa si no hay animal).
+        """
+        result = self.analyze_image(image_path)
+        if result.get("embedding") is not None:
+            return result["embedding"]
+
+        with DecodedImage.open(image_path) as decoded:
+            prediction = self._classify_crops([decoded.pixels])[0]
+        return prediction["embedding"] if prediction else None
+
+    def _format_species(self, probs: List[float], idxs: List[int]) -> Dict[str, Any]:
+        """Construye el resultado de especie a partir del top-k de un recorte."""
+        top_k = []
+        for prob, idx in zip(probs, idxs):
+            scientific, common = self._split_label(self.species_labels[idx])
+            top_k.append({
+                "species_scientific": scientific,
+                "species_common": common,
+                "species_confidence": prob
+            })
+
+        return {**top_k[0], "species_top_k": top_k}
+
+    @staticmethod
+    def _split_label(label: str):
+        """Separar Científico y Común "Panthera onca (Jaguar)"."""
+        if "(" in label:
+            scientific = label.split("(")[0].strip()
+            common = label.split("(")[1].replace(")", "").strip()
+        else:
+            scientific = label
+            common = label
+        return scientific, common
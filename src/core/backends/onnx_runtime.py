@@ -0,0 +1,116 @@
+import inspect
+import logging
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import torch
+
+logger = logging.getLogger("WildIndex.Backends")
+
+# Backends de inferencia seleccionables por configuración
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+ONNX_OPSET = 17
+
+
+def validate_backend(backend: str) -> str:
+    backend = (backend or "torch").lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de inferencia desconocido: '{backend}' (opciones: {', '.join(BACKENDS)})")
+    return backend
+
+
+def create_session(model_path: Path, num_threads: int = 0):
+    """
+    Crea una sesión de ONNX Runtime en CPU con todas las optimizaciones de grafo.
+    num_threads=0 deja que ONNX Runtime use todos los núcleos físicos.
+    """
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if num_threads > 0:
+        options.intra_op_num_threads = num_threads
+    return ort.InferenceSession(str(model_path), sess_options=options, providers=["CPUExecutionProvider"])
+
+
+def export_onnx(
+    module: torch.nn.Module,
+    dummy_input: torch.Tensor,
+    output_path: Path,
+    dynamic_axes: Dict[str, Dict[int, str]],
+    metadata: Optional[Dict[str, str]] = None
+):
+    """
+    Exporta un módulo a ONNX (escritura atómica: tmp + os.replace).
+    `metadata` se guarda en metadata_props del modelo (ej. nombres de clases).
+    """
+    import onnx
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_suffix(f".{os.getpid()}.tmp")
+
+    kwargs: Dict[str, Any] = {}
+    # PyTorch >= 2.5 puede exportar con dynamo; el exportador TorchScript soporta ambos modelos
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        kwargs["dynamo"] = False
+
+    logger.info(f"📦 Exportando a ONNX: {output_path.name}...")
+    with torch.no_grad():
+        torch.onnx.export(
+            module,
+            dummy_input,
+            str(tmp_path),
+            input_names=["images"],
+            output_names=["output"],
+            dynamic_axes=dynamic_axes,
+            opset_version=ONNX_OPSET,
+            do_constant_folding=True,
+            **kwargs
+        )
+
+    if metadata:
+        model = onnx.load(str(tmp_path))
+        for key, value in metadata.items():
+            prop = model.metadata_props.add()
+            prop.key, prop.value = key, value
+        onnx.save(model, str(tmp_path))
+
+    os.replace(tmp_path, output_path)
+    logger.info(f"✅ Modelo ONNX exportado: {output_path}")
+
+
+def quantize_onnx(source_path: Path, output_path: Path):
+    """Cuantización dinámica int8 (pesos int8, activaciones cuantizadas al vuelo)."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    tmp_path = output_path.with_suffix(f".{os.getpid()}.tmp")
+    logger.info(f"🗜️  Cuantizando a int8: {output_path.name}...")
+    quantize_dynamic(str(source_path), str(tmp_path), weight_type=QuantType.QInt8)
+    os.replace(tmp_path, output_path)
+
+
+def onnx_paths(onnx_dir: str, stem: str) -> Tuple[Path, Path]:
+    """Rutas (fp32, int8) de los modelos ONNX exportados para `stem`."""
+    base = Path(onnx_dir)
+    return base / f"{stem}.onnx", base / f"{stem}.int8.onnx"
+
+
+def ensure_onnx_model(backend: str, onnx_dir: str, stem: str, export_fn: Callable[[Path], None]) -> Path:
+    """
+    Retorna la ruta del modelo ONNX para el backend ('onnx' u 'onnx-int8'),
+    exportándolo (y cuantizándolo) la primera vez con `export_fn(ruta_fp32)`.
+    """
+    fp32_path, int8_path = onnx_paths(onnx_dir, stem)
+    if not fp32_path.exists():
+        export_fn(fp32_path)
+    if backend == "onnx-int8":
+        if not int8_path.exists():
+            quantize_onnx(fp32_path, int8_path)
+        return int8_path
+    return fp32_path
+
+
+def read_metadata(session) -> Dict[str, str]:
+    return dict(session.get_modelmeta().custom_metadata_map)
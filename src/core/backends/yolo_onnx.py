@@ -0,0 +1,168 @@
+import json
+import logging
+import math
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+import cv2
+import numpy as np
+import torch
+from PIL import Image, ImageOps
+
+from src.core.backends.onnx_runtime import create_session, export_onnx, read_metadata
+
+logger = logging.getLogger("WildIndex.Backends")
+
+ImageInput = Union[str, Image.Image, np.ndarray]
+
+# Mismos parámetros que AutoShape de YOLOv5 (para paridad con el backend torch)
+IOU_THRESHOLD = 0.45
+MAX_NMS_DETECTIONS = 300
+MAX_WH = 7680 # Desplazamiento por clase en NMS (NMS por clase en una sola pasada)
+PAD_COLOR = 114
+
+
+def export_yolov5(hub_model, output_path: Path, image_size: int):
+    """
+    Exporta el modelo YOLOv5 cargado con torch.hub (AutoShape) a ONNX con lote y
+    resolución dinámicos. Guarda stride y nombres de clases en los metadatos.
+    """
+    # AutoShape -> DetectMultiBackend -> DetectionModel
+    model = hub_model.model
+    model = getattr(model, "model", model)
+    model = model.float().eval()
+
+    # Igual que yolov5/export.py: la capa Detect devuelve solo el tensor concatenado
+    for module in model.modules():
+        if type(module).__name__ == "Detect":
+            module.inplace = False
+            module.dynamic = True
+            module.export = True
+
+    stride = int(max(hub_model.stride)) if hasattr(hub_model, "stride") else 64
+    names = hub_model.names if isinstance(hub_model.names, dict) else dict(enumerate(hub_model.names))
+
+    export_onnx(
+        model,
+        torch.zeros(1, 3, image_size, image_size),
+        output_path,
+        dynamic_axes={"images": {0: "batch", 2: "height", 3: "width"}, "output": {0: "batch", 1: "anchors"}},
+        metadata={"stride": str(stride), "names": json.dumps({int(k): v for k, v in names.items()})}
+    )
+
+
+class OnnxYoloDetector:
+    """
+    MegaDetector (YOLOv5) sobre ONNX Runtime.
+
+    Reproduce el pre y postproceso de AutoShape: letterbox común a todo el lote
+    (múltiplo del stride), NMS por clase con IoU 0.45 y reescalado de cajas a píxeles
+    de la imagen original. Retorna por imagen un array [xmin, ymin, xmax, ymax, conf, cls]
+    ordenado por confianza, igual que `results.xyxy` de YOLOv5.
+    """
+
+    def __init__(self, model_path: Path, confidence_threshold: float, image_size: int = 640, num_threads: int = 0):
+        self.session = create_session(model_path, num_threads)
+        self.input_name = self.session.get_inputs()[0].name
+        self.conf = confidence_threshold
+        self.image_size = image_size
+
+        metadata = read_metadata(self.session)
+        self.stride = int(metadata.get("stride", 64))
+        self.names: Dict[int, str] = {int(k): v for k, v in json.loads(metadata.get("names", "{}")).items()}
+
+    def __call__(self, images: List[ImageInput]) -> Tuple[List[np.ndarray], Dict[int, str]]:
+        arrays = [self._to_array(image) for image in images]
+        batch, shape = self._letterbox_batch(arrays)
+        prediction = self.session.run(None, {self.input_name: batch})[0]
+
+        preds = []
+        for pred, original in zip(prediction, arrays):
+            boxes = self._nms(pred)
+            preds.append(self._scale_boxes(boxes, shape, original.shape[:2]))
+        return preds, self.names
+
+    @staticmethod
+    def _to_array(image: ImageInput) -> np.ndarray:
+        """Array HWC RGB uint8 (las rutas y PIL se rotan según EXIF, como AutoShape)."""
+        if isinstance(image, np.ndarray):
+            return image
+        if isinstance(image, (str, Path)):
+            image = Image.open(image)
+        return np.asarray(ImageOps.exif_transpose(image).convert("RGB"))
+
+    def _letterbox_batch(self, arrays: List[np.ndarray]) -> Tuple[np.ndarray, Tuple[int, int]]:
+        # Forma común del lote: la mayor imagen reescalada a image_size, múltiplo del stride
+        scaled = []
+        for array in arrays:
+            gain = self.image_size / max(array.shape[:2])
+            scaled.append([int(dim * gain) for dim in array.shape[:2]])
+        height, width = (math.ceil(dim / self.stride) * self.stride for dim in np.max(scaled, axis=0))
+
+        batch = np.stack([self._letterbox(array, (height, width)) for array in arrays])
+        batch = batch.transpose(0, 3, 1, 2).astype(np.float32) / 255.0
+        return np.ascontiguousarray(batch), (height, width)
+
+    @staticmethod
+    def _letterbox(array: np.ndarray, shape: Tuple[int, int]) -> np.ndarray:
+        h, w = array.shape[:2]
+        ratio = min(shape[0] / h, shape[1] / w)
+        new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+        dw, dh = (shape[1] - new_w) / 2, (shape[0] - new_h) / 2
+
+        if (w, h) != (new_w, new_h):
+            array = cv2.resize(array, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+        left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+        return cv2.copyMakeBorder(array, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(PAD_COLOR,) * 3)
+
+    def _nms(self, pred: np.ndarray) -> np.ndarray:
+        """pred: [anchors, 5 + clases] (cx, cy, w, h, obj, scores...) -> [n, 6] tras NMS."""
+        pred = pred[pred[:, 4] > self.conf]
+        if not len(pred):
+            return np.zeros((0, 6), dtype=np.float32)
+
+        scores = pred[:, 5:] * pred[:, 4:5]
+        cls = scores.argmax(axis=1)
+        conf = scores[np.arange(len(scores)), cls]
+        keep = conf > self.conf
+        pred, cls, conf = pred[keep], cls[keep], conf[keep]
+
+        boxes = np.empty((len(pred), 4), dtype=np.float32)
+        boxes[:, 0] = pred[:, 0] - pred[:, 2] / 2
+        boxes[:, 1] = pred[:, 1] - pred[:, 3] / 2
+        boxes[:, 2] = pred[:, 0] + pred[:, 2] / 2
+        boxes[:, 3] = pred[:, 1] + pred[:, 3] / 2
+
+        kept = _greedy_nms(boxes + (cls * MAX_WH)[:, None], conf, IOU_THRESHOLD)[:MAX_NMS_DETECTIONS]
+        return np.concatenate([boxes[kept], conf[kept, None], cls[kept, None].astype(np.float32)], axis=1)
+
+    @staticmethod
+    def _scale_boxes(dets: np.ndarray, shape: Tuple[int, int], original: Tuple[int, int]) -> np.ndarray:
+        """Deshace el letterbox: coordenadas en píxeles de la imagen original."""
+        if not len(dets):
+            return dets
+        gain = min(shape[0] / original[0], shape[1] / original[1])
+        pad_x = (shape[1] - original[1] * gain) / 2
+        pad_y = (shape[0] - original[0] * gain) / 2
+        dets[:, [0, 2]] = ((dets[:, [0, 2]] - pad_x) / gain).clip(0, original[1])
+        dets[:, [1, 3]] = ((dets[:, [1, 3]] - pad_y) / gain).clip(0, original[0])
+        return dets
+
+
+def _greedy_nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """NMS clásico. Retorna los índices conservados, ordenados por score descendente."""
+    order = scores.argsort()[::-1]
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        xx1 = np.maximum(boxes[i, 0], boxes[order[1:], 0])
+        yy1 = np.maximum(boxes[i, 1], boxes[order[1:], 1])
+        xx2 = np.minimum(boxes[i, 2], boxes[order[1:], 2])
+        yy2 = np.minimum(boxes[i, 3], boxes[order[1:], 3])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / (areas[i] + areas[order[1:]] - inter + 1e-9)
+        order = order[1:][iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
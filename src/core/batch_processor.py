@@ -1,18 +1,53 @@
 import os
-import shutil
 import json
 import logging
+import threading
+import time
 from pathlib import Path
-from typing import List
+from typing import Callable, List, Dict, Any, Optional, Tuple, Union
 from datetime import datetime
 
+import numpy as np
+
 from src.database.db_manager import DatabaseManager
 from src.core.checkpoint_manager import CheckpointManager
 from src.core.ai_engine import AIEngine
+from src.core.capture_info import CAPTURE_TAGS, capture_info
+from src.core.decoded_image import DecodedImage
 from src.core.metadata_injector import MetadataInjector
+from src.core.metrics import ERRORS_TOTAL, FILES_TOTAL, OPERATION_SECONDS, STAGE_SECONDS
+from src.core.output_writer import OutputWriter
+from src.core.pipeline import Pipeline, Stage
+from src.core.profiling import PROFILER, span
+from src.core.sequence_grouper import SequenceGrouper, image_signature
+from src.core.thumbnails import Preview, ThumbnailCache
+from src.core.vector_index import VectorIndex
+from src.core.worker_pool import InferenceWorkerPool
 
 logger = logging.getLogger("WildIndex.BatchProcessor")
 
+
+class FileTask:
+    """Estado de un archivo mientras recorre las etapas del pipeline."""
+
+    def __init__(self, file_path: Path, file_hash: str):
+        self.file_path = file_path
+        self.file_hash = file_hash
+        self.image: Optional[DecodedImage] = None
+        # Copia reducida para miniaturas, recortes y firma (sobrevive a la inferencia)
+        self.preview: Optional[Preview] = None
+        self.ai_result: Optional[Dict[str, Any]] = None
+        # Agrupación de ráfagas: firma perceptual y momento de captura
+        self.signature: Optional[np.ndarray] = None
+        self.capture_time: Optional[float] = None
+        # Columnas de captura (EXIF o mtime) para processed_images
+        self.capture: Optional[Dict[str, Any]] = None
+        self.sequence_ref: Optional[str] = None
+
+    def __repr__(self) -> str:
+        return f"FileTask({self.file_path.name})"
+
+
 class BatchProcessor:
     def __init__(
         self,
@@ -20,8 +55,19 @@ class BatchProcessor:
         output_dir: str,
         db_manager: DatabaseManager,
         checkpoint_manager: CheckpointManager,
-        ai_engine: AIEngine,
-        metadata_injector: MetadataInjector
+        ai_engine: Union[AIEngine, InferenceWorkerPool],
+        metadata_injector: MetadataInjector,
+        reader_workers: int = 2,
+        inference_workers: int = 1,
+        inference_batch_size: int = 8,
+        writer_workers: int = 2,
+        queue_size: int = 16,
+        vector_index: Optional[VectorIndex] = None,
+        output_writer: Optional[OutputWriter] = None,
+        sequence_grouper: Optional[SequenceGrouper] = None,
+        thumbnail_cache: Optional[ThumbnailCache] = None,
+        exif_reader: Optional[MetadataInjector] = None,
+        exif_batch_size: int = 32
     ):
         self.input_dir = Path(input_dir)
         self.output_dir = Path(output_dir)
@@ -29,7 +75,27 @@ class BatchProcessor:
         self.checkpoint = checkpoint_manager
         self.ai = ai_engine
         self.metadata = metadata_injector
+        self.vector_index = vector_index
+        self.output_writer = output_writer or OutputWriter()
+        # Ráfagas de cámara trampa: los frames casi idénticos reutilizan el resultado
+        self.sequences = sequence_grouper
+        # Miniaturas WebP locales para el dashboard (no lee originales del NAS)
+        self.thumbnails = thumbnail_cache
+        # Lectura de fecha de captura / serie en bloque (su propia sesión ExifTool)
+        self.exif_reader = exif_reader
+        self.exif_batch_size = exif_batch_size
         self.supported_extensions = {'.jpg', '.jpeg', '.png', '.arw', '.cr2', '.mp4', '.avi'}
+        self.image_extensions = {'.jpg', '.jpeg', '.png', '.arw', '.cr2'}
+        self.video_extensions = {'.mp4', '.avi'}
+
+        # Concurrencia por etapa del pipeline (lectura -> inferencia -> escritura)
+        self.reader_workers = reader_workers
+        self.inference_workers = inference_workers
+        self.inference_batch_size = inference_batch_size
+        self.writer_workers = writer_workers
+        self.queue_size = queue_size
+        # Con el pool multiproceso cada worker decodifica sus imágenes: solo viajan rutas
+        self.predecode = not isinstance(ai_engine, InferenceWorkerPool)
 
     def scan_files(self) -> List[Path]:
         """Escanea recursivamente el directorio de entrada buscando archivos soportados."""
@@ -42,35 +108,327 @@ class BatchProcessor:
         logger.info(f"📄 Encontrados {len(files)} archivos candidatos.")
         return files
 
+    def find_pending(self, file_paths: Optional[List[Path]] = None) -> List[Tuple[Path, str]]:
+        """
+        Retorna los archivos que requieren procesamiento. Sin argumentos hace una
+        reconciliación completa (os.walk del directorio de entrada).
+        """
+        if file_paths is None:
+            file_paths = self.scan_files()
+        return self.checkpoint.filter_pending(file_paths)
+
+    def process_paths(self, file_paths: List[Path]) -> int:
+        """Procesa archivos concretos (ej. eventos del watcher), saltando los ya procesados."""
+        pending_files = self.checkpoint.filter_pending(file_paths)
+        if not pending_files:
+            return 0
+        logger.info(f"🚀 Procesando {len(pending_files)} archivos nuevos...")
+        return self.process_files(pending_files)
+
+    def enqueue(self, file_paths: List[Path], priority: int = 0) -> int:
+        """
+        Descubrimiento: filtra los archivos que requieren procesamiento y los encola en la
+        DB como filas PENDING. Retorna cuántos se encolaron.
+        """
+        pending_files = self.checkpoint.filter_pending(file_paths)
+        enqueued = self.db.enqueue([(str(path), file_hash) for path, file_hash in pending_files], priority)
+        if enqueued:
+            logger.info(f"📥 {enqueued} archivos encolados.")
+        return enqueued
+
+    def process_claimed(self, owner: str, batch_size: int, lease_seconds: float = 900.0) -> int:
+        """
+        Procesamiento: reclama un lote de la cola de la DB (lease de `lease_seconds`) y lo
+        procesa. Mientras dura el lote se renueva el lease; si el proceso muere, el lease
+        vence y otro agente retoma esos archivos. Retorna cuántos archivos se reclamaron.
+        """
+        claimed = self.db.claim_batch(owner, batch_size, lease_seconds)
+        if not claimed:
+            return 0
+
+        ids = [row["id"] for row in claimed]
+        stop = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(lease_seconds / 3):
+                self.db.extend_leases(owner, ids, lease_seconds)
+
+        renewer = threading.Thread(target=heartbeat, name="lease-heartbeat", daemon=True)
+        renewer.start()
+        try:
+            logger.info(f"🚀 Procesando lote de {len(claimed)} archivos de la cola...")
+            self.process_files([(Path(row["original_path"]), row["file_hash"]) for row in claimed])
+        finally:
+            stop.set()
+            renewer.join()
+        return len(claimed)
+
     def process_batch(self, batch_size: int = 10):
         """Procesa un lote de archivos."""
         all_files = self.scan_files()
         
-        # Filtrar los que ya están procesados
-        pending_files = []
-        for f in all_files:
-            should_process, file_hash = self.checkpoint.should_process(str(f))
-            if should_process:
-                pending_files.append((f, file_hash))
-                if len(pending_files) >= batch_size:
-                    break
+        # Filtrar los que ya están procesados (índice stat + consultas en bloque)
+        pending_files = self.checkpoint.filter_pending(all_files, limit=batch_size)
         
         if not pending_files:
             logger.info("✅ No hay archivos pendientes de procesamiento.")
             return
 
         logger.info(f"🚀 Procesando lote de {len(pending_files)} imágenes...")
-        
-        for file_path, file_hash in pending_files:
-            self._process_single_file(file_path, file_hash)
+        self.process_files(pending_files)
+
+    @property
+    def stage_workers(self) -> Dict[str, int]:
+        """
+        Ejecutores en paralelo de cada etapa (para repartir su tiempo medido entre ellos).
+        Con el pool multiproceso la inferencia la ejecutan sus procesos, no los hilos que
+        esperan los resultados.
+        """
+        inference = self.ai.workers if isinstance(self.ai, InferenceWorkerPool) else self.inference_workers
+        workers = {"read": self.reader_workers, "infer": inference, "write": self.writer_workers}
+        if self.exif_reader is not None:
+            workers["exif"] = 1
+        return workers
+
+    @property
+    def stage_busy_seconds(self) -> Dict[str, Callable[[], float]]:
+        """
+        Contadores de segundos ocupados que sustituyen al histograma de la etapa. Con el pool,
+        el tiempo de los hilos de inferencia incluye la espera en su cola (hay dos lotes en
+        vuelo por proceso): se usa el tiempo de cómputo que reportan los workers.
+        """
+        if isinstance(self.ai, InferenceWorkerPool):
+            return {"infer": self.ai.busy_seconds}
+        return {}
+
+    def process_files(self, pending_files: List[Tuple[Path, str]]) -> int:
+        """
+        Procesa archivos ya filtrados con un pipeline por etapas:
+        [EXIF en lotes] -> lectura (decodificar) -> inferencia (en lotes) -> escritura
+        (copia/metadatos/DB).
+        Las colas acotadas entre etapas mantienen ocupados a la vez al modelo y al NAS
+        sin acumular imágenes decodificadas en memoria.
+        """
+        stages = [
+            Stage("read", self._timed("read", self._read_stage), workers=self.reader_workers),
+            Stage(
+                "infer",
+                self._timed("infer", self._infer_stage),
+                workers=self.inference_workers,
+                batch_size=self.inference_batch_size
+            ),
+            Stage("write", self._timed("write", self._write_stage), workers=self.writer_workers),
+        ]
+        if self.exif_reader is not None:
+            # Primera etapa: los lotes se llenan directamente desde la lista de pendientes
+            stages.insert(0, Stage(
+                "exif", self._timed("exif", self._exif_stage), batch_size=self.exif_batch_size, batch_timeout=0.2
+            ))
+        pipeline = Pipeline(
+            stages,
+            queue_size=self.queue_size,
+            on_error=self._on_stage_error
+        )
+        # Perfilado bajo demanda (PROFILE_ENABLED / SIGUSR1): la captura abarca lotes completos
+        PROFILER.batch_started()
+        try:
+            done = pipeline.run(FileTask(file_path, file_hash) for file_path, file_hash in pending_files)
+        finally:
+            # Los registros se escriben en bloque; volcar antes del siguiente ciclo de checkpoint
+            with span("db_flush"):
+                self.db.flush()
+            if self.vector_index is not None:
+                self.vector_index.maybe_save()
+            PROFILER.batch_finished()
+        return len(done)
+
+    @staticmethod
+    def _timed(stage_name: str, fn):
+        """Envuelve la función de una etapa para registrar su latencia (por llamada o por lote)."""
+        histogram = STAGE_SECONDS.labels(stage_name)
+
+        def timed(item):
+            start = time.perf_counter()
+            try:
+                with span(stage_name, files=item):
+                    return fn(item)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return timed
+
+    def _exif_stage(self, tasks: List[FileTask]) -> List[FileTask]:
+        """Fecha de captura, subsegundos y número de serie de todo el lote en una llamada a exiftool."""
+        tags = self.exif_reader.read_tags([str(task.file_path) for task in tasks], CAPTURE_TAGS)
+        for task in tasks:
+            try:
+                task.capture = capture_info(task.file_path, tags.get(str(task.file_path)), self.input_dir)
+                task.capture_time = task.capture["capture_epoch"]
+            except Exception as e:
+                # Sin datos de captura se usará el mtime al escribir
+                logger.debug(f"Sin datos de captura para {task.file_path.name}: {e}")
+        return tasks
+
+    def _read_stage(self, task: FileTask) -> FileTask:
+        """Decodifica la imagen una sola vez (pool de lectura, E/S del NAS)."""
+        if self.predecode and task.file_path.suffix.lower() in self.image_extensions:
+            try:
+                task.image = DecodedImage.open(str(task.file_path))
+            except Exception as e:
+                # AIEngine reportará el error de decodificación en su resultado
+                logger.warning(f"⚠️ No se pudo decodificar {task.file_path.name}: {e}")
+        if (self.sequences is not None or self.thumbnails is not None) \
+                and task.file_path.suffix.lower() in self.image_extensions:
+            self._prepare_preview(task)
+        return task
+
+    def _prepare_preview(self, task: FileTask):
+        """
+        Vista previa reducida (de los píxeles ya decodificados o con decodificación parcial
+        del JPEG) y, de ella, la firma perceptual y el momento de captura del frame.
+        """
+        try:
+            if task.image is not None:
+                preview = Preview.from_image(task.image.pixels)
+            else:
+                preview = Preview.open(str(task.file_path))
+        except Exception as e:
+            # Sin vista previa: sin miniatura y el frame se analiza completo
+            logger.debug(f"Sin vista previa para {task.file_path.name}: {e}")
+            return
+
+        if self.sequences is not None:
+            task.signature = image_signature(preview.image)
+            if task.capture_time is None:
+                task.capture_time = task.file_path.stat().st_mtime
+        if self.thumbnails is not None:
+            task.preview = preview
+        else:
+            preview.close()
+
+    def _infer_stage(self, tasks: List[FileTask]) -> List[FileTask]:
+        """Ejecuta la IA sobre un lote; los píxeles se liberan en cuanto el motor termina con ellos."""
+        videos = [task for task in tasks if task.file_path.suffix.lower() in self.video_extensions]
+        images = [task for task in tasks if task.file_path.suffix.lower() not in self.video_extensions]
 
-    def _process_single_file(self, file_path: Path, file_hash: str):
+        duplicates: List[FileTask] = []
+        if self.sequences is not None:
+            images, duplicates = self._group_sequences(images)
+
+        self._analyze_images(images)
+        if duplicates:
+            self._reuse_sequence_results(images, duplicates)
+
+        # Videos: muestreo de frames con salida temprana (cada clip es su propio lote de frames)
+        for task in videos:
+            task.ai_result = self.ai.analyze_video(str(task.file_path))
+
+        return tasks
+
+    def _analyze_images(self, images: List[FileTask]):
+        try:
+            if images:
+                results = self.ai.analyze_batch(
+                    [task.image if task.image is not None else str(task.file_path) for task in images],
+                    release=True
+                )
+                for task, ai_result in zip(images, results):
+                    task.ai_result = ai_result
+        finally:
+            for task in images:
+                if task.image is not None:
+                    task.image.close()
+                    task.image = None
+
+    def _group_sequences(self, images: List[FileTask]) -> Tuple[List[FileTask], List[FileTask]]:
+        """
+        Separa el lote en frames a analizar y casi duplicados de un frame ya analizado
+        (o por analizar en este mismo lote). Se recorre en orden de captura por carpeta.
+        """
+        analyze = [task for task in images if task.signature is None]
+        duplicates = []
+        framed = sorted(
+            (task for task in images if task.signature is not None),
+            key=lambda task: (str(task.file_path.parent), task.capture_time, task.file_path.name)
+        )
+        for task in framed:
+            reference = self.sequences.match(
+                task.file_hash, str(task.file_path.parent), task.capture_time, task.signature
+            )
+            task.signature = None
+            if reference is None or reference == task.file_hash:
+                analyze.append(task)
+                continue
+            task.sequence_ref = reference
+            if task.image is not None:
+                task.image.close()
+                task.image = None
+            duplicates.append(task)
+        return analyze, duplicates
+
+    def _reuse_sequence_results(self, analyzed: List[FileTask], duplicates: List[FileTask]):
+        """Copia a cada casi duplicado el resultado de su referencia; si no está disponible, lo analiza."""
+        local = {}
+        for task in analyzed:
+            # Una referencia fallida no se comparte: sus duplicados se analizan completos
+            if task.ai_result is not None and task.ai_result.get('md_category') != 'error':
+                local[task.file_hash] = task.ai_result
+                self.sequences.set_result(task.file_hash, task.ai_result)
+
+        pending = []
+        for task in duplicates:
+            # Referencia de este lote, o de un lote anterior que ya terminó
+            reference = local.get(task.sequence_ref) or self.sequences.result(task.sequence_ref)
+            if reference is None:
+                task.sequence_ref = None
+                pending.append(task)
+                continue
+            task.ai_result = dict(reference, sequence_ref=task.sequence_ref)
+
+        if pending:
+            self._analyze_images(pending)
+        reused = len(duplicates) - len(pending)
+        if reused:
+            FILES_TOTAL.labels("reused").inc(reused)
+            logger.info(f"♻️  {reused} frames de ráfaga reutilizaron el resultado de su secuencia.")
+
+    def _write_stage(self, task: FileTask) -> FileTask:
+        """Copia, inyecta metadatos y guarda en DB (pool de escritura, E/S del NAS)."""
+        try:
+            self._process_single_file(task.file_path, task.file_hash, task.ai_result, task.preview, task.capture)
+        finally:
+            if task.preview is not None:
+                task.preview.close()
+                task.preview = None
+        return task
+
+    def _on_stage_error(self, stage_name: str, task: FileTask, error: Exception):
+        """Un fallo en cualquier etapa deja constancia en la DB para reintentarlo después."""
+        logger.error(f"❌ Error en etapa '{stage_name}' procesando {task.file_path.name}: {error}")
+        ERRORS_TOTAL.labels(stage_name).inc()
+        if task.image is not None:
+            task.image.close()
+            task.image = None
+        if task.preview is not None:
+            task.preview.close()
+            task.preview = None
+        self._record_error(task.file_path, task.file_hash, error)
+
+    def _process_single_file(
+        self,
+        file_path: Path,
+        file_hash: str,
+        ai_result: Optional[Dict[str, Any]] = None,
+        preview: Optional[Preview] = None,
+        capture: Optional[Dict[str, Any]] = None
+    ):
         """Procesa un archivo individual: IA -> Copia -> Metadatos -> DB."""
         try:
             logger.info(f"📸 Procesando: {file_path.name}")
             
-            # 1. Ejecutar IA
-            ai_result = self.ai.analyze_image(str(file_path))
+            # 1. Ejecutar IA (si no viene ya del lote)
+            if ai_result is None:
+                with span("ai", file=file_path.name):
+                    ai_result = self.ai.analyze_image(str(file_path))
             
             # 2. Preparar destino (Organizado por Fecha/Categoría)
             # 2. Preparar destino (Organizado por Fecha/Categoría)
@@ -78,81 +436,121 @@ class BatchProcessor:
             dest_folder = self.output_dir / category
             
             # Lógica defensiva PARANOICA para NAS
-            try:
-                dest_folder.mkdir(parents=True, exist_ok=True)
-            except FileExistsError:
-                # Si mkdir dice que existe, le creemos (aunque exists() diga que no por permisos)
-                if dest_folder.is_file():
-                    logger.warning(f"⚠️ {dest_folder} es un archivo. Renombrando...")
-                    dest_folder.rename(f"{dest_folder}_backup_{datetime.now().timestamp()}")
+            with span("mkdir", file=file_path.name):
+                try:
                     dest_folder.mkdir(parents=True, exist_ok=True)
-                else:
-                    logger.warning(f"⚠️ mkdir falló con FileExists pero no es archivo. Asumiendo directorio existente (NAS quirk).")
+                except FileExistsError:
+                    # Si mkdir dice que existe, le creemos (aunque exists() diga que no por permisos)
+                    if dest_folder.is_file():
+                        logger.warning(f"⚠️ {dest_folder} es un archivo. Renombrando...")
+                        dest_folder.rename(f"{dest_folder}_backup_{datetime.now().timestamp()}")
+                        dest_folder.mkdir(parents=True, exist_ok=True)
+                    else:
+                        logger.warning(f"⚠️ mkdir falló con FileExists pero no es archivo. Asumiendo directorio existente (NAS quirk).")
             
             # Intentar copiar directamente. Si falla, fallará aquí.
             dest_path = dest_folder / file_path.name
+            is_raw = file_path.suffix.lower() in ['.arw', '.cr2', '.dng', '.nef', '.orf', '.rw2']
+            is_video = file_path.suffix.lower() in self.video_extensions
             
-            # 3. Copiar archivo
-            if not dest_path.exists():
-                try:
-                    shutil.copy2(file_path, dest_path)
-                except Exception as e:
-                    logger.warning(f"⚠️ Fallo al copiar a NAS ({e}). Intentando fallback local...")
+            # 3. Copiar archivo (reflink / copy_file_range / sendfile, verificado antes del rename)
+            with span("copy", file=file_path.name):
+                if not dest_path.exists():
+                    # RAW / video solo reciben sidecar: la copia no se modifica y admite hardlink
+                    link_ok = is_raw or is_video
+                    try:
+                        method = self.output_writer.copy(file_path, dest_path, file_hash, link_ok=link_ok)
+                    except Exception as e:
+                        logger.warning(f"⚠️ Fallo al copiar a NAS ({e}). Intentando fallback local...")
                     
-                    # FALLBACK: Usar directorio local si el NAS falla
-                    fallback_dir = Path("/app/data/processed_local") / category
-                    fallback_dir.mkdir(parents=True, exist_ok=True)
-                    dest_path = fallback_dir / file_path.name
+                        # FALLBACK: Usar directorio local si el NAS falla
+                        fallback_dir = Path("/app/data/processed_local") / category
+                        fallback_dir.mkdir(parents=True, exist_ok=True)
+                        dest_path = fallback_dir / file_path.name
                     
-                    try:
-                        shutil.copy2(file_path, dest_path)
-                        logger.info(f"✅ Guardado en fallback local: {dest_path}")
-                    except Exception as e2:
-                        logger.error(f"❌ Fallo crítico al copiar a fallback {dest_path}: {e2}")
-                        raise e2
-                
-                # Verificar copia (NAS latency)
-                import time
-                time.sleep(0.2)
+                        try:
+                            method = self.output_writer.copy(file_path, dest_path, file_hash, link_ok=link_ok)
+                            logger.info(f"✅ Guardado en fallback local: {dest_path}")
+                        except Exception as e2:
+                            logger.error(f"❌ Fallo crítico al copiar a fallback {dest_path}: {e2}")
+                            raise e2
+                    logger.debug(f"📦 {file_path.name} copiado con {method}")
             
             # 4. Inyectar Metadatos (Sobre la copia)
-            # Detectar si es RAW para usar sidecar
-            is_raw = dest_path.suffix.lower() in ['.arw', '.cr2', '.dng', '.nef', '.orf', '.rw2']
+            with span("metadata", file=file_path.name):
+                # RAW / Video (detectados arriba) usan sidecar
+                if is_raw or is_video:
+                    # RAW / Video -> Generar .xmp sidecar
+                    self.metadata.write_metadata(str(dest_path), ai_result, sidecar=True)
+                elif dest_path.suffix.lower() in ['.jpg', '.jpeg', '.png', '.tiff']:
+                    # Imagen normal -> Inyectar dentro del archivo
+                    self.metadata.write_metadata(str(dest_path), ai_result, sidecar=False)
             
-            if is_raw:
-                # RAW -> Generar .xmp sidecar
-                self.metadata.write_metadata(str(dest_path), ai_result, sidecar=True)
-            elif dest_path.suffix.lower() in ['.jpg', '.jpeg', '.png', '.tiff']:
-                # Imagen normal -> Inyectar dentro del archivo
-                self.metadata.write_metadata(str(dest_path), ai_result, sidecar=False)
-            
-            # 5. Guardar en DB
+            # 5. Miniatura y recortes para el dashboard (caché local por hash)
+            # Copias de las detecciones: los frames de ráfaga comparten el resultado de su referencia
+            detections = [dict(det) for det in ai_result.get('detections', [])]
+            thumbnail_path = None
+            if preview is not None and self.thumbnails is not None:
+                try:
+                    with OPERATION_SECONDS.labels("thumbnail").time(), span("thumbnail", file=file_path.name):
+                        thumbnail_path, crops = self.thumbnails.write(file_hash, preview, detections)
+                    for det_index, crop_path in crops.items():
+                        detections[det_index]['crop_path'] = crop_path
+                except Exception as e:
+                    logger.warning(f"⚠️ No se pudo generar la miniatura de {file_path.name}: {e}")
+
+            # 6. Guardar en DB
+            # Fecha real de captura (EXIF, leída en bloque) o, en su defecto, el mtime
+            if capture is None:
+                capture = capture_info(file_path, input_root=self.input_dir)
             record = {
                 "id": file_hash,
                 "file_hash": file_hash,
                 "original_path": str(file_path),
+                "output_path": str(dest_path),
+                "thumbnail_path": thumbnail_path,
                 "file_name": file_path.name,
                 "file_size": file_path.stat().st_size,
-                "capture_timestamp": datetime.now().isoformat(),
+                **capture,
                 "md_category": category,
                 "md_confidence": ai_result.get('md_confidence'),
                 "md_bbox": json.dumps(ai_result.get('md_bbox')) if ai_result.get('md_bbox') else None,
                 "llava_caption": ai_result.get('llava_caption'),
                 "species_prediction": ai_result.get('species_prediction'),
+                "species_common": ai_result.get('species_common'),
+                "species_scientific": ai_result.get('species_scientific'),
+                "species_confidence": ai_result.get('species_confidence'),
+                "detection_count": len(detections),
+                "sequence_ref": ai_result.get('sequence_ref'),
                 "status": "PROCESSED"
             }
             
-            self.db.upsert_image(record)
+            # Registro + detecciones individuales en la misma transacción
+            with span("db", file=file_path.name):
+                self.db.queue_upsert(record, detections)
+
+            # 7. Embedding BioCLIP -> índice vectorial (búsqueda semántica)
+            if self.vector_index is not None and ai_result.get('embedding') is not None:
+                with span("vector_index", file=file_path.name):
+                    self.vector_index.add(file_hash, ai_result['embedding'])
+
+            FILES_TOTAL.labels("processed").inc()
             logger.info(f"✅ Completado: {file_path.name} -> {category}")
 
         except Exception as e:
             logger.error(f"❌ Error procesando {file_path.name}: {e}")
-            error_record = {
-                "id": file_hash,
-                "file_hash": file_hash,
-                "original_path": str(file_path),
-                "file_name": file_path.name,
-                "status": "ERROR",
-                "error_message": str(e)
-            }
-            self.db.upsert_image(error_record)
+            ERRORS_TOTAL.labels("write").inc()
+            self._record_error(file_path, file_hash, e)
+
+    def _record_error(self, file_path: Path, file_hash: str, error: Exception):
+        """Guarda el fallo en la DB (estado ERROR) para que el checkpoint lo reintente."""
+        error_record = {
+            "id": file_hash,
+            "file_hash": file_hash,
+            "original_path": str(file_path),
+            "file_name": file_path.name,
+            "status": "ERROR",
+            "error_message": str(error)
+        }
+        FILES_TOTAL.labels("error").inc()
+        self.db.queue_upsert(error_record)
@@ -0,0 +1,85 @@
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("WildIndex.CaptureInfo")
+
+# Tags que se leen en bloque con `exiftool -j` (MetadataInjector.read_tags)
+CAPTURE_TAGS = [
+    "DateTimeOriginal", "SubSecTimeOriginal", "OffsetTimeOriginal", "CreateDate",
+    "SerialNumber", "InternalSerialNumber", "CameraSerialNumber",
+]
+SERIAL_TAGS = ["SerialNumber", "InternalSerialNumber", "CameraSerialNumber"]
+
+
+def parse_exif_datetime(value: Any, subsec: Any = None) -> Optional[datetime]:
+    """
+    'YYYY:MM:DD HH:MM:SS[.ss][+HH:MM]' -> datetime ingenuo (hora de pared de la cámara).
+    Retorna None para fechas vacías o a cero (cámaras sin reloj configurado).
+    """
+    if not value or not isinstance(value, str):
+        return None
+    text = value.strip()
+    # Zona horaria al final (+02:00 / Z): la hora de pared es lo que se indexa
+    for sep in ("+", "-", "Z"):
+        pos = text.rfind(sep)
+        if pos > 10:
+            text = text[:pos]
+    fraction = ""
+    if "." in text:
+        text, fraction = text.split(".", 1)
+    if subsec not in (None, ""):
+        fraction = str(subsec).strip()
+    try:
+        parsed = datetime.strptime(text, "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
+    if fraction.isdigit():
+        parsed = parsed.replace(microsecond=int(fraction[:6].ljust(6, "0")))
+    return parsed
+
+
+def station_for(path: Path, input_root: Optional[Path]) -> Optional[str]:
+    """Estación = primera carpeta bajo la raíz de entrada (input/<estación>/...)."""
+    if input_root is None:
+        return None
+    try:
+        parts = Path(path).relative_to(input_root).parts
+    except ValueError:
+        return None
+    return parts[0] if len(parts) > 1 else None
+
+
+def capture_info(
+    path: Path,
+    tags: Optional[Dict[str, Any]] = None,
+    input_root: Optional[Path] = None,
+    mtime: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Columnas tipadas de captura para processed_images a partir de los tags de exiftool.
+    Sin fecha EXIF válida se usa el mtime del archivo (capture_source = 'mtime').
+
+    capture_epoch codifica la hora de pared de la cámara como si fuera UTC: las cámaras
+    trampa casi nunca guardan zona horaria y las consultas se hacen por día local.
+    """
+    tags = tags or {}
+    captured = parse_exif_datetime(tags.get("DateTimeOriginal"), tags.get("SubSecTimeOriginal")) \
+        or parse_exif_datetime(tags.get("CreateDate"))
+    source = "exif"
+    if captured is None:
+        if mtime is None:
+            mtime = Path(path).stat().st_mtime
+        captured = datetime.fromtimestamp(mtime)
+        source = "mtime"
+
+    serial = next((str(tags[tag]).strip() for tag in SERIAL_TAGS if tags.get(tag) not in (None, "")), None)
+    return {
+        "capture_timestamp": captured.isoformat(),
+        "capture_epoch": captured.replace(tzinfo=timezone.utc).timestamp(),
+        "capture_date": captured.date().isoformat(),
+        "camera_serial": serial,
+        "station_id": station_for(path, input_root),
+        "capture_source": source,
+    }
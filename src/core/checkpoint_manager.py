@@ -1,23 +1,35 @@
-import hashlib
+import os
 import logging
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Optional, Tuple, List, Dict, Any
 from src.database.db_manager import DatabaseManager
+from src.core.fingerprint import Fingerprinter
+from src.core.metrics import OPERATION_SECONDS
 
 logger = logging.getLogger("WildIndex.Checkpoint")
 
 class CheckpointManager:
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        chunk_size: int = 500,
+        hash_workers: int = 1,
+        fingerprinter: Optional[Fingerprinter] = None,
+        reuse_quick_identity: bool = True
+    ):
         self.db = db_manager
+        # Número de archivos que se resuelven por consulta en bloque contra el índice
+        self.chunk_size = chunk_size
+        # Hilos de lectura para hashear archivos nuevos (hashlib libera el GIL)
+        self.hash_workers = max(1, hash_workers)
+        self.fingerprinter = fingerprinter or Fingerprinter(workers=self.hash_workers)
+        # Reutilizar el hash de un archivo con la misma identidad rápida (tamaño + cabecera/cola)
+        self.reuse_quick_identity = reuse_quick_identity
 
-    def calculate_hash(self, file_path: str, chunk_size: int = 8192) -> str:
-        """Calcula el hash SHA-256 de un archivo de manera eficiente."""
-        sha256 = hashlib.sha256()
+    def calculate_hash(self, file_path: str) -> str:
+        """Calcula el hash SHA-256 de un archivo (lecturas grandes, buffer reutilizado)."""
         try:
-            with open(file_path, 'rb') as f:
-                while chunk := f.read(chunk_size):
-                    sha256.update(chunk)
-            return sha256.hexdigest()
+            return self.fingerprinter.hash_file(file_path)
         except Exception as e:
             logger.error(f"❌ Error calculando hash para {file_path}: {e}")
             raise
@@ -54,3 +66,162 @@ class CheckpointManager:
             # Ante la duda, procesar (o fallar seguro, depende de la estrategia. Aquí fallamos seguro)
             return False, ""
 
+
+    def filter_pending(self, file_paths: List[Path], limit: Optional[int] = None) -> List[Tuple[Path, str]]:
+        """
+        Versión en bloque de should_process basada en el índice de archivos.
+
+        Los archivos cuyo (tamaño, mtime, inodo) coincide con el índice reutilizan el hash
+        guardado sin abrirse; solo los archivos nuevos o modificados se leen para calcular
+        su hash. Las consultas a la DB se hacen por bloques, no una por archivo.
+        Retorna: [(file_path, file_hash)] con como máximo `limit` elementos.
+        """
+        pending: List[Tuple[Path, str]] = []
+        seen_hashes = set()
+
+        for start in range(0, len(file_paths), self.chunk_size):
+            chunk = file_paths[start:start + self.chunk_size]
+            with OPERATION_SECONDS.labels("checkpoint_chunk").time():
+                chunk_pending = self._filter_chunk(chunk)
+            for file_path, file_hash in chunk_pending:
+                # El mismo contenido en dos rutas se procesa una sola vez
+                if file_hash in seen_hashes:
+                    continue
+                seen_hashes.add(file_hash)
+                pending.append((file_path, file_hash))
+                if limit is not None and len(pending) >= limit:
+                    return pending
+
+        return pending
+
+    def _filter_chunk(self, chunk: List[Path]) -> List[Tuple[Path, str]]:
+        """Resuelve un bloque de rutas contra el índice y retorna las que requieren procesamiento."""
+        stats: Dict[str, os.stat_result] = {}
+        for file_path in chunk:
+            try:
+                stats[str(file_path)] = os.stat(file_path)
+            except OSError as e:
+                logger.warning(f"⚠️ No se pudo leer stat de {file_path}: {e}")
+
+        index = self.db.get_index_entries(list(stats.keys()))
+
+        result: List[Tuple[Path, str]] = []
+        changed: List[Tuple[Path, os.stat_result]] = []
+        for file_path in chunk:
+            key = str(file_path)
+            st = stats.get(key)
+            if st is None:
+                continue
+            entry = index.get(key)
+            if entry and self._stat_matches(entry, st):
+                # Sin cambios desde la última vez: decidir solo con el estado guardado
+                if entry.get('status') == 'PROCESSED':
+                    continue
+                if entry.get('status') == 'ERROR':
+                    logger.info(f"🔄 Reintentando {file_path.name} (Estado previo: ERROR)")
+                result.append((file_path, entry['file_hash']))
+            else:
+                changed.append((file_path, st))
+
+        if not changed:
+            return result
+
+        # Archivos nuevos o modificados: identidad rápida -> hash reutilizado o SHA-256 completo
+        hashed: List[Tuple[Path, str]] = []
+        new_entries: List[Dict[str, Any]] = []
+        for (file_path, st), (file_hash, quick_id) in zip(changed, self._fingerprint_many(changed)):
+            if file_hash is None:
+                continue
+            hashed.append((file_path, file_hash))
+            new_entries.append(self._index_entry(file_path, st, file_hash, quick_id))
+
+        known = self.db.get_images_by_hashes([h for _, h in hashed])
+        self.db.upsert_index_entries(new_entries)
+
+        for file_path, file_hash in hashed:
+            status = known.get(file_hash, {}).get('status')
+            if status == 'PROCESSED':
+                logger.debug(f"⏭️  Saltando {file_path.name} (Ya procesado)")
+                continue
+            if status == 'ERROR':
+                logger.info(f"🔄 Reintentando {file_path.name} (Estado previo: ERROR)")
+            result.append((file_path, file_hash))
+
+        return result
+
+    def _fingerprint_many(
+        self,
+        changed: List[Tuple[Path, os.stat_result]]
+    ) -> List[Tuple[Optional[str], Optional[str]]]:
+        """
+        Huellas por niveles de los archivos nuevos o modificados: [(file_hash, quick_id)].
+
+        1. Identidad rápida (tamaño + cabecera/cola, dos lecturas de 64 KB).
+        2. Se reutiliza el hash guardado sin leer el archivo solo si es un renombrado: otra
+           ruta del índice, que ya no existe, con el mismo inodo y el mismo mtime. Dos fotos
+           pueden compartir tamaño, cabecera y cola y diferir solo en el medio, y una edición
+           en sitio (EXIF reescrito, JPEG guardado de nuevo) es justo ese caso: con la misma
+           ruta y otro mtime el archivo se vuelve a leer completo.
+        3. Solo el resto se lee completo para calcular el SHA-256, en paralelo.
+        """
+        paths = [file_path for file_path, _ in changed]
+        if not self.reuse_quick_identity:
+            return [(file_hash, None) for file_hash in self.fingerprinter.hash_many(paths)]
+
+        quick_ids = self.fingerprinter.quick_many(paths, [st.st_size for _, st in changed])
+        known = self.db.get_hashes_by_quick_ids([
+            (st.st_size, quick_id) for (_, st), quick_id in zip(changed, quick_ids) if quick_id
+        ])
+
+        hashes: List[Optional[str]] = []
+        to_hash: List[int] = []
+        for i, ((file_path, st), quick_id) in enumerate(zip(changed, quick_ids)):
+            reused = None
+            if quick_id:
+                reused = self._renamed_from(file_path, known.get((st.st_size, quick_id), []), st)
+            hashes.append(reused)
+            if reused is None:
+                to_hash.append(i)
+
+        reused = len(changed) - len(to_hash)
+        if reused:
+            logger.debug(f"♻️  {reused} hashes reutilizados por identidad rápida")
+
+        for i, file_hash in zip(to_hash, self.fingerprinter.hash_many([paths[i] for i in to_hash])):
+            hashes[i] = file_hash
+        return list(zip(hashes, quick_ids))
+
+    @staticmethod
+    def _renamed_from(file_path: Path, candidates: List[Dict[str, Any]], st: os.stat_result) -> Optional[str]:
+        """
+        Hash de la entrada del índice de la que este archivo es un renombrado: otra ruta,
+        ya ausente, con el mismo inodo y mtime (renombrar no cambia el contenido ni el mtime).
+        """
+        for candidate in candidates:
+            if (
+                candidate['path'] != str(file_path)
+                and candidate['inode'] == st.st_ino
+                and candidate['mtime_ns'] == st.st_mtime_ns
+                and not os.path.exists(candidate['path'])
+            ):
+                return candidate['file_hash']
+        return None
+
+    @staticmethod
+    def _stat_matches(entry: Dict[str, Any], st: os.stat_result) -> bool:
+        return (
+            entry['file_size'] == st.st_size
+            and entry['mtime_ns'] == st.st_mtime_ns
+            and entry['inode'] == st.st_ino
+        )
+
+    @staticmethod
+    def _index_entry(file_path: Path, st: os.stat_result, file_hash: str, quick_id: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            "path": str(file_path),
+            "file_size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "inode": st.st_ino,
+            "file_hash": file_hash,
+            "quick_id": quick_id
+        }
@@ -0,0 +1,55 @@
+import logging
+from typing import Optional, Tuple
+from PIL import Image, ImageOps
+
+logger = logging.getLogger("WildIndex.DecodedImage")
+
+
+class DecodedImage:
+    """
+    Imagen decodificada una sola vez y compartida por todas las etapas del pipeline
+    (MegaDetector, BioCLIP, LLaVA).
+
+    El ciclo de vida es explícito: quien la crea (o a quien se le cede) debe llamar a
+    close() en cuanto la última etapa termina, o usarla como context manager.
+    """
+
+    def __init__(self, path: str, image: Image.Image):
+        self.path = path
+        self._image: Optional[Image.Image] = image
+
+    @classmethod
+    def open(cls, path: str) -> "DecodedImage":
+        """Decodifica el archivo a RGB aplicando la orientación EXIF (igual que YOLOv5)."""
+        with Image.open(path) as img:
+            oriented = ImageOps.exif_transpose(img)
+            rgb = oriented if oriented.mode == "RGB" else oriented.convert("RGB")
+            rgb.load()
+        return cls(path, rgb)
+
+    @property
+    def pixels(self) -> Image.Image:
+        """Imagen PIL RGB. Falla si la imagen ya fue liberada."""
+        if self._image is None:
+            raise ValueError(f"Imagen ya liberada: {self.path}")
+        return self._image
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.pixels.size
+
+    @property
+    def closed(self) -> bool:
+        return self._image is None
+
+    def close(self):
+        """Libera los píxeles decodificados."""
+        if self._image is not None:
+            self._image.close()
+            self._image = None
+
+    def __enter__(self) -> "DecodedImage":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -1,17 +1,78 @@
 import logging
 import torch
+import numpy as np
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Union
+from PIL import Image
+
+from src.core.backends.onnx_runtime import ensure_onnx_model, validate_backend
 
 logger = logging.getLogger("WildIndex.MegaDetector")
 
+# Entradas aceptadas por YOLOv5 AutoShape
+ImageInput = Union[str, Image.Image, np.ndarray]
+
 class MegaDetector:
-    def __init__(self, model_path: str, confidence_threshold: float = 0.1, device: str = 'cuda'):
+    def __init__(
+        self,
+        model_path: str,
+        confidence_threshold: float = 0.1,
+        device: str = 'cuda',
+        batch_size: int = 32,
+        image_size: int = 640,
+        max_detections: int = 20,
+        backend: str = "torch",
+        onnx_dir: str = "models/onnx",
+        num_threads: int = 0
+    ):
         self.model_path = model_path
         self.conf_thres = confidence_threshold
+        self.batch_size = batch_size
+        self.image_size = image_size
+        # Máximo de detecciones por imagen que se conservan (y se clasifican con BioCLIP)
+        self.max_detections = max_detections
         self.device = device if torch.cuda.is_available() else 'cpu'
+        # Backend: 'torch' (AutoShape), 'onnx' u 'onnx-int8' (ONNX Runtime, CPU)
+        self.backend = validate_backend(backend)
+        self.onnx_dir = onnx_dir
+        self.num_threads = num_threads
         self.model = None
-        self._load_model()
+        self.runtime = None
+        self._load_backend()
+
+    def _load_backend(self):
+        """Carga el modelo con el backend configurado (con fallback a PyTorch si falla)."""
+        if self.backend == "torch-int8":
+            # YOLOv5 es convolucional: la cuantización dinámica de Torch solo afecta a Linear
+            logger.warning("⚠️ 'torch-int8' no aplica a MegaDetector (sin capas Linear). Usando 'torch'.")
+            self.backend = "torch"
+
+        if self.backend == "torch":
+            self._load_model()
+            return
+
+        try:
+            from src.core.backends.yolo_onnx import OnnxYoloDetector, export_yolov5
+
+            def export(path: Path):
+                # Solo la primera vez: exportar desde el modelo PyTorch
+                if self.model is None:
+                    self._load_model()
+                export_yolov5(self.model, path, self.image_size)
+
+            stem = f"{Path(self.model_path).stem}_{self.image_size}"
+            onnx_path = ensure_onnx_model(self.backend, self.onnx_dir, stem, export)
+            self.runtime = OnnxYoloDetector(onnx_path, self.conf_thres, self.image_size, self.num_threads)
+            # El modelo PyTorch ya no hace falta: liberar memoria
+            self.model = None
+            self.device = 'cpu'
+            logger.info(f"✅ MegaDetector cargado con ONNX Runtime ({self.backend}): {onnx_path.name}")
+        except Exception as e:
+            logger.warning(f"⚠️ Backend {self.backend} no disponible para MegaDetector ({e}). Usando PyTorch.")
+            self.backend = "torch"
+            self.runtime = None
+            if self.model is None:
+                self._load_model()
 
     def _load_model(self):
         """Carga el modelo YOLOv5 (MegaDetector)."""
@@ -73,46 +134,71 @@ class MegaDetector:
         Realiza detección sobre una imagen.
         Retorna el 'mejor' resultado (la categoría con mayor confianza).
         """
-        if not self.model:
-            return {"error": "Model not loaded"}
+        return self.detect_batch([image_path])[0]
 
-        try:
-            # Inferencia
-            results = self.model(image_path)
-            
-            # Procesar resultados (Pandas dataframe es lo más fácil con yolov5)
-            df = results.pandas().xyxy[0]
-            
-            if df.empty:
-                return {
-                    "md_category": "empty",
-                    "md_confidence": 0.0,
-                    "md_bbox": []
-                }
-            
-            # Obtener la detección con mayor confianza
-            best_detection = df.iloc[0]
-            
-            # Mapeo de clases MDv5a: 0=empty (no suele salir), 1=animal, 2=person, 3=vehicle
-            # Nota: MDv5 classes son {1: 'animal', 2: 'person', 3: 'vehicle'}
-            # Pero el modelo raw puede devolver índices 0-based dependiendo de cómo se cargue.
-            # Asumiremos nombres si el modelo los tiene, sino mapeamos.
-            
-            category_name = best_detection['name'] # 'animal', 'person', etc.
-            confidence = float(best_detection['confidence'])
-            bbox = [
-                float(best_detection['xmin']),
-                float(best_detection['ymin']),
-                float(best_detection['xmax']),
-                float(best_detection['ymax'])
-            ]
-            
+    def detect_batch(self, images: List[ImageInput]) -> List[Dict[str, Any]]:
+        """
+        Detección en lote: una sola pasada del modelo por cada `batch_size` imágenes.
+        Acepta rutas, imágenes PIL o arrays numpy HWC RGB.
+        Retorna un resultado por imagen, en el mismo orden de entrada.
+        """
+        if not self.model and not self.runtime:
+            return [{"error": "Model not loaded"} for _ in images]
+
+        results: List[Dict[str, Any]] = []
+        for start in range(0, len(images), self.batch_size):
+            chunk = list(images[start:start + self.batch_size])
+            try:
+                preds, names = self._predict(chunk)
+                for pred in preds:
+                    results.append(self._parse_prediction(pred, names))
+
+            except Exception as e:
+                logger.error(f"❌ Error en inferencia MD para lote de {len(chunk)} imágenes: {e}")
+                results.extend({"error": str(e)} for _ in chunk)
+
+        return results
+
+    def _predict(self, chunk: List[ImageInput]):
+        """Una pasada del backend. Retorna ([xmin, ymin, xmax, ymax, conf, cls] por imagen, nombres)."""
+        if self.runtime is not None:
+            return self.runtime(chunk)
+
+        # Inferencia (AutoShape hace letterbox + forward + NMS para todo el lote)
+        with torch.no_grad():
+            output = self.model(chunk, size=self.image_size)
+        # Leer directamente los tensores
+        return output.xyxy, output.names
+
+    def _parse_prediction(self, pred: "torch.Tensor", names: Dict[int, str]) -> Dict[str, Any]:
+        """
+        Convierte el tensor de detecciones de una imagen al formato de resultado de WildIndex.
+        md_* describe la mejor detección; `detections` incluye todas las que superan el umbral
+        (hasta `max_detections`), ordenadas por confianza.
+        """
+        if pred.shape[0] == 0:
             return {
-                "md_category": category_name,
-                "md_confidence": confidence,
-                "md_bbox": bbox
+                "md_category": "empty",
+                "md_confidence": 0.0,
+                "md_bbox": [],
+                "detections": []
             }
 
-        except Exception as e:
-            logger.error(f"❌ Error en inferencia MD para {image_path}: {e}")
-            return {"error": str(e)}
+        # NMS devuelve las detecciones ordenadas por confianza: la fila 0 es la mejor
+        # Mapeo de clases MDv5a: {0: 'animal', 1: 'person', 2: 'vehicle'} (nombres del modelo)
+        detections = [
+            {
+                "category": names[int(cls)],
+                "confidence": float(confidence),
+                "bbox": [float(xmin), float(ymin), float(xmax), float(ymax)]
+            }
+            for xmin, ymin, xmax, ymax, confidence, cls in pred[:self.max_detections].tolist()
+        ]
+
+        best = detections[0]
+        return {
+            "md_category": best["category"],
+            "md_confidence": best["confidence"],
+            "md_bbox": best["bbox"],
+            "detections": detections
+        }
@@ -0,0 +1,154 @@
+import os
+import mmap
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Union
+
+from src.core.metrics import BYTES_READ_TOTAL, OPERATION_SECONDS
+
+logger = logging.getLogger("WildIndex.Fingerprint")
+
+# Lecturas grandes y alineadas a página: pocas llamadas al sistema (y pocos round-trips NFS)
+READ_BLOCK_SIZE = 4 * 1024 * 1024
+# Muestra de cabecera y cola para la identidad rápida
+SAMPLE_SIZE = 64 * 1024
+
+PathLike = Union[str, Path]
+
+
+def hash_file(path: PathLike, block_size: int = READ_BLOCK_SIZE, use_mmap: bool = False) -> str:
+    """
+    SHA-256 del contenido completo de un archivo.
+
+    Lee con readinto() sobre un único buffer reutilizado (sin crear un bytes por bloque).
+    Con use_mmap=True el archivo se mapea en memoria y se hashea por vistas del mapa
+    (recomendado solo en discos locales). hashlib libera el GIL con bloques grandes, así
+    que varios hilos pueden hashear archivos en paralelo.
+    """
+    start = time.perf_counter()
+    sha256 = hashlib.sha256()
+    with open(path, 'rb', buffering=0) as f:
+        _advise_sequential(f.fileno())
+        size = os.fstat(f.fileno()).st_size
+
+        if use_mmap and size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                view = memoryview(mm)
+                try:
+                    for offset in range(0, size, block_size):
+                        sha256.update(view[offset:offset + block_size])
+                finally:
+                    view.release()
+            _record_hash(start, size)
+            return sha256.hexdigest()
+
+        buffer = bytearray(block_size)
+        view = memoryview(buffer)
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            sha256.update(view[:n])
+    _record_hash(start, size)
+    return sha256.hexdigest()
+
+
+def quick_identity(path: PathLike, size: Optional[int] = None, sample_size: int = SAMPLE_SIZE) -> str:
+    """
+    Identidad barata: BLAKE2b de (tamaño, primeros y últimos `sample_size` bytes).
+
+    Dos lecturas pequeñas en lugar de leer el archivo entero. No sustituye al SHA-256,
+    pero si la identidad rápida coincide con la de un archivo ya hasheado (misma ruta
+    con mtime tocado, o el mismo archivo movido/renombrado) su hash se puede reutilizar.
+    En archivos de hasta 2 * sample_size cubre el contenido completo.
+    """
+    start = time.perf_counter()
+    digest = hashlib.blake2b(digest_size=16)
+    # Con buffer: read(n) garantiza n bytes salvo EOF (lecturas cortas en NFS)
+    with open(path, 'rb') as f:
+        if size is None:
+            size = os.fstat(f.fileno()).st_size
+        digest.update(size.to_bytes(8, "little"))
+        if size <= 2 * sample_size:
+            digest.update(f.read(size))
+        else:
+            digest.update(f.read(sample_size))
+            f.seek(size - sample_size)
+            digest.update(f.read(sample_size))
+    OPERATION_SECONDS.labels("quick_id").observe(time.perf_counter() - start)
+    return digest.hexdigest()
+
+
+def _record_hash(start: float, size: int):
+    OPERATION_SECONDS.labels("hash").observe(time.perf_counter() - start)
+    BYTES_READ_TOTAL.labels("hash").inc(size)
+
+
+def _advise_sequential(fd: int):
+    """Pide al kernel read-ahead agresivo (lectura secuencial completa)."""
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
+
+
+class Fingerprinter:
+    """
+    Huellas de contenido en paralelo: SHA-256 completo e identidad rápida, repartidos en
+    un pool de hilos persistente (hashlib y la E/S liberan el GIL).
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        block_size: int = READ_BLOCK_SIZE,
+        sample_size: int = SAMPLE_SIZE,
+        use_mmap: bool = False
+    ):
+        self.workers = max(1, workers)
+        self.block_size = block_size
+        self.sample_size = sample_size
+        self.use_mmap = use_mmap
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def hash_file(self, path: PathLike) -> str:
+        return hash_file(path, self.block_size, self.use_mmap)
+
+    def quick_identity(self, path: PathLike, size: Optional[int] = None) -> str:
+        return quick_identity(path, size, self.sample_size)
+
+    def hash_many(self, paths: List[PathLike]) -> List[Optional[str]]:
+        """SHA-256 de varios archivos en paralelo. None en los que fallaron."""
+        return self._map(self.hash_file, paths)
+
+    def quick_many(self, paths: List[PathLike], sizes: Optional[List[int]] = None) -> List[Optional[str]]:
+        """Identidad rápida de varios archivos en paralelo. None en los que fallaron."""
+        sizes = sizes if sizes is not None else [None] * len(paths)
+        return self._map(lambda args: self.quick_identity(*args), list(zip(paths, sizes)))
+
+    def _map(self, fn, items: List) -> List[Optional[str]]:
+        def safe(item) -> Optional[str]:
+            try:
+                return fn(item)
+            except Exception as e:
+                logger.error(f"❌ Error calculando huella de {item}: {e}")
+                return None
+
+        if self.workers == 1 or len(items) <= 1:
+            return [safe(item) for item in items]
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="hash")
+        return list(self._pool.map(safe, items))
+
+    def close(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
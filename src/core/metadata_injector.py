@@ -1,94 +1,283 @@
 import logging
+import queue
 import subprocess
+import threading
 import json
+import time
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
+
+from src.core.metrics import ERRORS_TOTAL, OPERATION_SECONDS
+
+try:
+    from exiftool.exceptions import ExifToolExecuteError
+except ImportError:
+    # PyExifTool es opcional (ver _start_session): sin él no hay sesión que lance este error
+    class ExifToolExecuteError(Exception):
+        pass
 
 logger = logging.getLogger("WildIndex.Metadata")
 
+# Argumentos comunes a toda escritura:
+# -overwrite_original: No crear archivo _original (ya trabajamos sobre copia en 'processed')
+# -P: Preservar fecha de modificación del archivo
+WRITE_ARGS = ["-overwrite_original", "-P"]
+
+
 class MetadataInjector:
-    def __init__(self, exiftool_path: str = "exiftool"):
+    """
+    Escribe metadatos XMP/IPTC con ExifTool.
+
+    Mantiene procesos `exiftool -stay_open True -@ -` (vía PyExifTool) que se reutilizan
+    entre archivos, evitando arrancar Perl en cada imagen. El protocolo stay_open es
+    secuencial (un comando a la vez por proceso), así que hay un pool de hasta `sessions`
+    procesos: cada hilo escritor toma uno libre y los demás escriben en paralelo. Los
+    procesos se arrancan bajo demanda y se reinician si mueren. Si PyExifTool no está
+    disponible se usa un proceso por archivo (comportamiento anterior).
+    """
+
+    def __init__(self, exiftool_path: str = "exiftool", persistent: bool = True, sessions: int = 1):
         self.exiftool_path = exiftool_path
+        self.persistent = persistent
+        self.sessions = max(1, sessions)
+        # Sesiones libres y cupo de sesiones en uso (como el pool de conexiones de DatabaseManager)
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.sessions)
+        self._all_sessions = []
+        self._sessions_lock = threading.Lock()
 
-    def write_metadata(self, file_path: str, metadata: Dict[str, Any], sidecar: bool = False) -> bool:
+    # ------------------------------------------------------------------
+    # Sesiones persistentes
+    # ------------------------------------------------------------------
+    def _start_session(self):
+        """Arranca el proceso exiftool persistente."""
+        import exiftool
+
+        session = exiftool.ExifToolHelper(executable=self.exiftool_path, common_args=[])
+        session.run()
+        logger.info("🏷️  Sesión ExifTool persistente iniciada.")
+        return session
+
+    def _acquire_session(self):
         """
-        Escribe metadatos XMP/IPTC en el archivo de imagen o en un sidecar .xmp.
-        Soporta: Keywords (Categoría, Especie), Description (Caption).
+        Toma una sesión libre del pool (o arranca una nueva). Retorna None si PyExifTool no
+        está disponible. Debe llamarse con un cupo de `_slots` tomado.
         """
-        path = Path(file_path)
-        target_path = path
-        
-        if sidecar:
-            target_path = path.with_suffix('.xmp')
-            logger.info(f"📝 Generando sidecar XMP: {target_path.name}")
-        elif not path.exists():
-            logger.error(f"❌ Archivo no encontrado: {file_path}")
-            return False
+        if not self.persistent:
+            return None
+
+        try:
+            session = self._idle.get_nowait()
+        except queue.Empty:
+            session = None
+        if session is not None and not session.running:
+            logger.warning("⚠️ El proceso ExifTool terminó inesperadamente. Reiniciando...")
+            self._discard_session(session)
+            session = None
+
+        if session is None:
+            try:
+                session = self._start_session()
+            except ImportError:
+                logger.warning("⚠️ PyExifTool no disponible. Usando un proceso exiftool por archivo.")
+                self.persistent = False
+                return None
+            with self._sessions_lock:
+                self._all_sessions.append(session)
+        return session
+
+    def _discard_session(self, session):
+        """Termina (si es posible) y descarta una sesión."""
+        with self._sessions_lock:
+            if session in self._all_sessions:
+                self._all_sessions.remove(session)
+        try:
+            session.terminate()
+        except Exception as e:
+            logger.debug(f"Error terminando sesión ExifTool: {e}")
+
+    def close(self):
+        """Cierra las sesiones persistentes de forma limpia."""
+        with self._sessions_lock:
+            sessions, self._all_sessions = self._all_sessions, []
+            self._idle = queue.LifoQueue()
+        for session in sessions:
+            try:
+                session.terminate()
+            except Exception as e:
+                logger.debug(f"Error terminando sesión ExifTool: {e}")
+        if sessions:
+            logger.info(f"🏷️  Sesiones ExifTool cerradas ({len(sessions)}).")
+
+    def __enter__(self) -> "MetadataInjector":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _execute(self, args: List[str]) -> Tuple[bool, str]:
+        """
+        Ejecuta un comando exiftool en una sesión libre del pool. Retorna (ok, salida o error).
+        Reintenta una vez con un proceso nuevo si la sesión se rompe a mitad de comando.
+        """
+        with self._slots:
+            session = None
+            try:
+                for attempt in range(2):
+                    session = self._acquire_session()
+                    if session is None:
+                        return self._execute_subprocess(args)
+
+                    try:
+                        return True, session.execute(*args)
+                    except ExifToolExecuteError as e:
+                        # ExifTool respondió con error (archivo inválido, etc.): la sesión sigue sana
+                        return False, e.stderr or str(e)
+                    except Exception as e:
+                        logger.warning(f"⚠️ Sesión ExifTool rota ({e}). Reiniciando (intento {attempt + 1})...")
+                        self._discard_session(session)
+                        session = None
+
+                return False, "La sesión ExifTool falló dos veces seguidas"
+            finally:
+                if session is not None:
+                    self._idle.put(session)
+
+    def _execute_subprocess(self, args: List[str]) -> Tuple[bool, str]:
+        """Fallback: un proceso exiftool por comando."""
+        try:
+            result = subprocess.run(
+                [self.exiftool_path, *args],
+                capture_output=True,
+                text=True,
+                check=False # Manejamos el error manualmente
+            )
+        except Exception as e:
+            return False, str(e)
+
+        if result.returncode == 0:
+            return True, result.stdout
+        return False, result.stderr
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+    def read_tags(self, file_paths: List[str], tags: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Lee `tags` de muchos archivos con una sola llamada `exiftool -j` (en la sesión
+        persistente). Retorna {ruta: {tag: valor}}. Si el lote falla (ej. un archivo
+        ilegible) se reintenta archivo por archivo para no perder el resto.
+        """
+        if not file_paths:
+            return {}
+        # -fast: no leer hasta el final del archivo buscando trailers (importante en NFS)
+        args = ["-j", "-fast", *[f"-{tag}" for tag in tags], *[str(path) for path in file_paths]]
+        start = time.perf_counter()
+        try:
+            ok, output = self._execute(args)
+        except Exception as e:
+            # ExifTool no disponible: el llamador sigue sin estos metadatos
+            logger.error(f"❌ Excepción ejecutando ExifTool: {e}")
+            ERRORS_TOTAL.labels("exiftool_read").inc()
+            return {}
+        OPERATION_SECONDS.labels("exiftool_read").observe(time.perf_counter() - start)
+        if ok:
+            try:
+                return {entry.pop("SourceFile"): entry for entry in json.loads(output or "[]")}
+            except (ValueError, KeyError) as e:
+                logger.warning(f"⚠️ Salida JSON de ExifTool inválida: {e}")
+
+        ERRORS_TOTAL.labels("exiftool_read").inc()
+        if len(file_paths) == 1:
+            logger.warning(f"⚠️ No se pudieron leer metadatos de {Path(file_paths[0]).name}: {output}")
+            return {}
+        results = {}
+        for path in file_paths:
+            results.update(self.read_tags([path], tags))
+        return results
 
-        # 1. Preparar Tags
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+    def _build_tags(self, metadata: Dict[str, Any]) -> List[str]:
+        """Construye los argumentos de tags a escribir (sin comillas de shell: no hay shell)."""
         tags_to_write = []
-        
+
         # Keywords / Subject (Lista acumulativa)
         keywords = set()
         if metadata.get('md_category'):
             keywords.add(metadata['md_category'])
         if metadata.get('species_prediction'):
             keywords.add(metadata['species_prediction'])
-            
+
         # BioCLIP Taxonomy
         if metadata.get('species_common'):
             keywords.add(metadata['species_common'])
         if metadata.get('species_scientific'):
             keywords.add(metadata['species_scientific'])
             # Hierarchical Subject (Lightroom/Synology friendly)
-            tags_to_write.append(f'-XMP:HierarchicalSubject+="Animal|{metadata["species_scientific"]}|{metadata["species_common"]}"')
-        
+            tags_to_write.append(f'-XMP:HierarchicalSubject+=Animal|{metadata["species_scientific"]}|{metadata["species_common"]}')
+
+        # Resto de especies del frame (manadas / varias especies): una keyword por especie
+        hierarchy = {metadata.get('species_scientific')}
+        for det in metadata.get('detections', []):
+            if det.get('species_common'):
+                keywords.add(det['species_common'])
+            if det.get('species_scientific') and det['species_scientific'] not in hierarchy:
+                hierarchy.add(det['species_scientific'])
+                keywords.add(det['species_scientific'])
+                tags_to_write.append(f'-XMP:HierarchicalSubject+=Animal|{det["species_scientific"]}|{det["species_common"]}')
+
         # Añadir tag de "Processed by WildIndex"
         keywords.add("WildIndex AI")
 
-        for kw in keywords:
+        for kw in sorted(keywords):
             tags_to_write.append(f"-XMP:Subject+={kw}")
             tags_to_write.append(f"-IPTC:Keywords+={kw}")
 
         # Description / Caption
         caption = metadata.get('llava_caption')
         if caption:
-            # Limpiar texto para evitar problemas de shell
-            clean_caption = caption.replace('"', '\\"')
-            tags_to_write.append(f'-XMP:Description="{clean_caption}"')
-            tags_to_write.append(f'-EXIF:ImageDescription="{clean_caption}"')
-            tags_to_write.append(f'-IPTC:Caption-Abstract="{clean_caption}"')
+            # Una línea por argumento en el protocolo -@: eliminar saltos de línea
+            clean_caption = " ".join(caption.split())
+            tags_to_write.append(f'-XMP:Description={clean_caption}')
+            tags_to_write.append(f'-EXIF:ImageDescription={clean_caption}')
+            tags_to_write.append(f'-IPTC:Caption-Abstract={clean_caption}')
 
         # Software Agent
-        tags_to_write.append(f'-XMP:CreatorTool="WildIndex v1.0"')
-
-        # 2. Construir Comando ExifTool
-        # -overwrite_original: No crear archivo _original (ya trabajamos sobre copia en 'processed')
-        # -P: Preservar fecha de modificación del archivo
-        cmd = [
-            self.exiftool_path,
-            "-overwrite_original",
-            "-P",
-            *tags_to_write,
-            str(target_path)
-        ]
-
-        # 3. Ejecutar
-        try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                check=False # Manejamos el error manualmente
-            )
-            
-            if result.returncode == 0:
-                logger.info(f"🏷️  Metadatos inyectados en {path.name}")
-                return True
-            else:
-                logger.error(f"❌ Error ExifTool en {path.name}: {result.stderr}")
-                return False
+        tags_to_write.append('-XMP:CreatorTool=WildIndex v1.0')
+        return tags_to_write
 
+    def write_metadata(self, file_path: str, metadata: Dict[str, Any], sidecar: bool = False) -> bool:
+        """
+        Escribe metadatos XMP/IPTC en el archivo de imagen o en un sidecar .xmp.
+        Soporta: Keywords (Categoría, Especie), Description (Caption).
+        """
+        path = Path(file_path)
+        target_path = path
+
+        if sidecar:
+            target_path = path.with_suffix('.xmp')
+            logger.info(f"📝 Generando sidecar XMP: {target_path.name}")
+        elif not path.exists():
+            logger.error(f"❌ Archivo no encontrado: {file_path}")
+            return False
+
+        args = [*WRITE_ARGS, *self._build_tags(metadata), str(target_path)]
+
+        start = time.perf_counter()
+        try:
+            ok, output = self._execute(args)
         except Exception as e:
             logger.error(f"❌ Excepción ejecutando ExifTool: {e}")
+            ERRORS_TOTAL.labels("exiftool_write").inc()
             return False
+        OPERATION_SECONDS.labels("exiftool_write").observe(time.perf_counter() - start)
+
+        if ok:
+            logger.info(f"🏷️  Metadatos inyectados en {path.name}")
+            return True
+
+        logger.error(f"❌ Error ExifTool en {path.name}: {output}")
+        ERRORS_TOTAL.labels("exiftool_write").inc()
+        return False
@@ -0,0 +1,332 @@
+"""
+Métricas internas del agente en formato de texto de Prometheus.
+
+Sin dependencias: contadores, gauges e histogramas con etiquetas, un temporizador y un
+servidor HTTP local (`GET /metrics`). Registrar una observación cuesta un lock y unas
+sumas (microsegundos), así que se puede instrumentar el camino caliente sin muestreo.
+
+Los procesos del pool de inferencia tienen su propio registro: envían al padre los
+incrementos desde el último envío (`REGISTRY.collect_deltas()`) junto con cada resultado,
+y el padre los suma al suyo (`REGISTRY.merge()`), así que un solo endpoint lo ve todo.
+"""
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("WildIndex.Metrics")
+
+# Latencias de 1 ms a 2 min (copias de RAW al NAS, lotes de inferencia en CPU)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class _CounterChild:
+    __slots__ = ("_lock", "value", "_reported")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+        self._reported = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def _samples(self, name: str, labels: str) -> List[str]:
+        return [f"{name}{labels} {_format(self.value)}"]
+
+    def _delta(self) -> Optional[float]:
+        with self._lock:
+            delta, self._reported = self.value - self._reported, self.value
+        return delta or None
+
+    def _merge(self, delta: float):
+        self.inc(delta)
+
+
+class _GaugeChild:
+    __slots__ = ("_lock", "value", "_function", "_reported")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+        self._reported: Optional[float] = None
+
+    def set(self, value: float):
+        with self._lock:
+            self.value = value
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set_function(self, function: Callable[[], float]):
+        """El valor se calcula al exportar (ej. profundidad de la cola en la DB)."""
+        self._function = function
+
+    def _samples(self, name: str, labels: str) -> List[str]:
+        value = self.value
+        if self._function is not None:
+            try:
+                value = self._function()
+            except Exception as e:
+                logger.debug(f"Gauge {name}{labels} falló: {e}")
+                return []
+        return [f"{name}{labels} {_format(value)}"]
+
+    def _delta(self) -> Optional[float]:
+        with self._lock:
+            if self.value == self._reported:
+                return None
+            self._reported = self.value
+            return self.value
+
+    def _merge(self, value: float):
+        self.set(value)
+
+
+class _HistogramChild:
+    __slots__ = ("_lock", "_buckets", "counts", "sum", "_reported_counts", "_reported_sum")
+
+    def __init__(self, buckets: Sequence[float]):
+        self._lock = threading.Lock()
+        self._buckets = buckets
+        # Un contador por bucket + el de +Inf (no acumulados; se acumulan al exportar)
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._reported_counts = [0] * (len(buckets) + 1)
+        self._reported_sum = 0.0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def _samples(self, name: str, labels: str) -> List[str]:
+        with self._lock:
+            counts, total_sum = list(self.counts), self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(list(self._buckets) + [float("inf")], counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else _format(bound)
+            lines.append(f"{name}_bucket{_with_label(labels, 'le', le)} {cumulative}")
+        lines.append(f"{name}_sum{labels} {_format(total_sum)}")
+        lines.append(f"{name}_count{labels} {cumulative}")
+        return lines
+
+    def _delta(self) -> Optional[Tuple[List[int], float]]:
+        with self._lock:
+            counts = [now - before for now, before in zip(self.counts, self._reported_counts)]
+            total = self.sum - self._reported_sum
+            self._reported_counts, self._reported_sum = list(self.counts), self.sum
+        return (counts, total) if any(counts) else None
+
+    def _merge(self, delta: Tuple[List[int], float]):
+        counts, total = delta
+        with self._lock:
+            for index, count in enumerate(counts):
+                self.counts[index] += count
+            self.sum += total
+
+
+class Metric:
+    """Familia de métricas con etiquetas; `labels(...)` retorna (y cachea) la serie concreta."""
+
+    def __init__(self, kind: str, name: str, documentation: str, labelnames: Sequence[str], factory):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._children: Dict[LabelValues, Any] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str, **kwargs: str):
+        key = tuple(str(v) for v in values) if values else tuple(str(kwargs[n]) for n in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._factory())
+        return child
+
+    def _render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(child._samples(self.name, _labels(self.labelnames, key)))
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Metric:
+        return self._register(Metric("counter", name, documentation, labelnames, _CounterChild))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Metric:
+        return self._register(Metric("gauge", name, documentation, labelnames, _GaugeChild))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Metric:
+        buckets = tuple(sorted(buckets))
+        return self._register(Metric("histogram", name, documentation, labelnames, lambda: _HistogramChild(buckets)))
+
+    def render(self) -> str:
+        """Exposición en formato de texto de Prometheus 0.0.4."""
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric._render())
+        return "\n".join(lines) + "\n"
+
+    def collect_deltas(self) -> Dict[Tuple[str, LabelValues], Any]:
+        """Cambios desde la última llamada (para enviarlos desde un proceso worker al padre)."""
+        deltas = {}
+        for metric in list(self._metrics.values()):
+            for key, child in list(metric._children.items()):
+                delta = child._delta()
+                if delta is not None:
+                    deltas[(metric.name, key)] = delta
+        return deltas
+
+    def merge(self, deltas: Dict[Tuple[str, LabelValues], Any]):
+        """Suma los cambios de otro proceso (las métricas deben existir con el mismo nombre)."""
+        for (name, key), delta in deltas.items():
+            metric = self._metrics.get(name)
+            if metric is not None:
+                metric.labels(*key)._merge(delta)
+
+
+def _format(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: LabelValues) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _with_label(labels: str, name: str, value: str) -> str:
+    extra = f'{name}="{value}"'
+    return "{" + extra + "}" if not labels else labels[:-1] + "," + extra + "}"
+
+
+# ----------------------------------------------------------------------
+# Registro global y métricas del agente
+# ----------------------------------------------------------------------
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "wildindex_stage_seconds",
+    "Latencia por llamada de cada etapa del pipeline (exif, read, infer, write; infer y exif por lote).",
+    ["stage"]
+)
+OPERATION_SECONDS = REGISTRY.histogram(
+    "wildindex_operation_seconds",
+    "Latencia de operaciones internas (hash, copy, exiftool_write, megadetector, bioclip, db_flush, ...).",
+    ["op"]
+)
+FILES_TOTAL = REGISTRY.counter(
+    "wildindex_files_total",
+    "Archivos terminados por resultado (processed, error, reused = resultado de ráfaga reutilizado).",
+    ["status"]
+)
+BYTES_READ_TOTAL = REGISTRY.counter(
+    "wildindex_bytes_read_total",
+    "Bytes leídos de archivos de entrada por motivo (hash, copy).",
+    ["source"]
+)
+ERRORS_TOTAL = REGISTRY.counter(
+    "wildindex_errors_total",
+    "Errores por etapa u operación.",
+    ["stage"]
+)
+QUEUE_DEPTH = REGISTRY.gauge(
+    "wildindex_queue_depth",
+    "Filas PENDING en la cola de la DB (ready = disponibles, leased = en curso).",
+    ["state"]
+)
+MODEL_LOAD_SECONDS = REGISTRY.gauge(
+    "wildindex_model_load_seconds",
+    "Tiempo de carga de cada modelo en el último arranque.",
+    ["model"]
+)
+SCHEDULER_BATCH_SIZE = REGISTRY.gauge(
+    "wildindex_scheduler_batch_size",
+    "Tamaño de lote elegido por el planificador para el siguiente reclamo de la cola."
+)
+SCHEDULER_FILE_SECONDS = REGISTRY.gauge(
+    "wildindex_scheduler_file_seconds",
+    "Estimación (EWMA) de segundos por archivo de cada etapa, repartidos entre sus hilos; la mayor es el cuello de botella.",
+    ["stage"]
+)
+SCHEDULER_OVERHEAD_SECONDS = REGISTRY.gauge(
+    "wildindex_scheduler_overhead_seconds",
+    "Estimación (EWMA) del coste fijo por lote (reclamo, arranque/vaciado del pipeline, flush)."
+)
+SCHEDULER_IDLE_WAIT_SECONDS = REGISTRY.gauge(
+    "wildindex_scheduler_idle_wait_seconds",
+    "Espera actual entre sondeos de la cola sin trabajo (0 = drenando backlog)."
+)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Sin una línea de log por scrape
+        pass
+
+
+def start_http_server(port: int, address: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Sirve /metrics en un hilo daemon. Por defecto solo en localhost."""
+    server = ThreadingHTTPServer((address, port), _Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+    thread.start()
+    logger.info(f"📈 Métricas en http://{address}:{port}/metrics")
+    return server
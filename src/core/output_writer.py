@@ -0,0 +1,181 @@
+import os
+import errno
+import shutil
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple, Union
+
+from src.core.fingerprint import hash_file
+from src.core.metrics import BYTES_READ_TOTAL, OPERATION_SECONDS
+
+logger = logging.getLogger("WildIndex.OutputWriter")
+
+# ioctl FICLONE (linux/fs.h): clon copy-on-write en Btrfs/XFS/ZFS; no mueve datos
+FICLONE = 0x40049409
+# Bloque por llamada de copy_file_range/sendfile (el kernel puede copiar menos)
+COPY_CHUNK_SIZE = 64 * 1024 * 1024
+
+METHODS = ("reflink", "copy_file_range", "sendfile", "python")
+VERIFY_MODES = ("none", "size", "checksum")
+
+PathLike = Union[str, Path]
+
+# Errores que indican "este método no sirve entre estos dos sistemas de archivos"
+_UNSUPPORTED = {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTSUP, errno.ENOSYS, errno.EINVAL, errno.ENOTTY}
+
+
+class OutputWriter:
+    """
+    Materializa archivos en la carpeta de salida con la estrategia más barata disponible:
+
+      1. hardlink (solo con allow_hardlink y si el destino no se modificará; mismo FS)
+      2. reflink (FICLONE): clon copy-on-write, instantáneo en Btrfs/XFS
+      3. os.copy_file_range: copia en el kernel; en NFS 4.2 / SMB3 es copia del lado
+         del servidor (los bytes no pasan por este host)
+      4. os.sendfile: copia en el kernel sin pasar por espacio de usuario
+      5. copia en Python (shutil.copyfileobj) como último recurso
+
+    Cada copia se escribe en un temporal del directorio destino y se renombra al final
+    (nunca queda un archivo a medias con el nombre final) y se verifica por tamaño o
+    checksum antes del rename. Un semáforo acota las copias simultáneas contra el NAS.
+    Los métodos que fallan por no estar soportados se recuerdan por par de dispositivos.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 4,
+        verify: str = "size",
+        allow_hardlink: bool = False
+    ):
+        if verify not in VERIFY_MODES:
+            raise ValueError(f"Verificación desconocida '{verify}'. Opciones: {', '.join(VERIFY_MODES)}")
+        self.verify = verify
+        self.allow_hardlink = allow_hardlink
+        self._slots = threading.BoundedSemaphore(max(1, max_in_flight))
+        self._lock = threading.Lock()
+        self._unsupported: Dict[Tuple[int, int], Set[str]] = {}
+        self._counts: Dict[str, int] = {}
+
+    def copy(
+        self,
+        source: PathLike,
+        dest: PathLike,
+        expected_hash: Optional[str] = None,
+        link_ok: bool = False
+    ) -> str:
+        """
+        Copia `source` a `dest` y retorna el método usado.
+
+        expected_hash: SHA-256 del origen (ya calculado por el checkpoint) para la
+            verificación por checksum; sin él se hashea el origen.
+        link_ok: el destino no se modificará después (ej. RAW/video con sidecar), así que
+            un hardlink es seguro. Los archivos que reciben metadatos embebidos nunca se
+            enlazan: se modificaría el original.
+        """
+        source, dest = Path(source), Path(dest)
+        with self._slots:
+            start = time.perf_counter()
+            src_stat = source.stat()
+            dest_dev = dest.parent.stat().st_dev
+            key = (src_stat.st_dev, dest_dev)
+
+            if link_ok and self.allow_hardlink and src_stat.st_dev == dest_dev:
+                try:
+                    os.link(source, dest)
+                    self._count("hardlink")
+                    return "hardlink"
+                except OSError as e:
+                    logger.debug(f"hardlink no disponible para {dest.name}: {e}")
+
+            tmp_path = dest.with_name(f".{dest.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            try:
+                method = self._copy_data(source, tmp_path, src_stat.st_size, key)
+                shutil.copystat(source, tmp_path)
+                self._verify(source, tmp_path, src_stat.st_size, expected_hash)
+                os.replace(tmp_path, dest)
+            except BaseException:
+                try:
+                    tmp_path.unlink()
+                except OSError:
+                    pass
+                raise
+            OPERATION_SECONDS.labels("copy").observe(time.perf_counter() - start)
+
+        BYTES_READ_TOTAL.labels("copy").inc(src_stat.st_size)
+        self._count(method)
+        return method
+
+    def stats(self) -> Dict[str, int]:
+        """Archivos materializados por método."""
+        with self._lock:
+            return dict(self._counts)
+
+    def _count(self, method: str):
+        with self._lock:
+            self._counts[method] = self._counts.get(method, 0) + 1
+
+    def _copy_data(self, source: Path, dest: Path, size: int, key: Tuple[int, int]) -> str:
+        with self._lock:
+            skip = set(self._unsupported.get(key, ()))
+
+        with open(source, 'rb') as fsrc, open(dest, 'wb') as fdst:
+            for method in METHODS:
+                if method in skip:
+                    continue
+                try:
+                    self._run(method, fsrc, fdst, size)
+                    return method
+                except OSError as e:
+                    if method == "python" or e.errno not in _UNSUPPORTED:
+                        raise
+                    logger.info(f"ℹ️  {method} no soportado entre estos sistemas de archivos ({e.strerror}). Usando el siguiente método.")
+                    with self._lock:
+                        self._unsupported.setdefault(key, set()).add(method)
+                    # Reiniciar el destino por si el método escribió parcialmente
+                    fsrc.seek(0)
+                    fdst.seek(0)
+                    fdst.truncate()
+        raise RuntimeError("Ningún método de copia disponible")
+
+    @staticmethod
+    def _run(method: str, fsrc, fdst, size: int):
+        src_fd, dst_fd = fsrc.fileno(), fdst.fileno()
+        if method == "reflink":
+            import fcntl
+            fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        elif method == "copy_file_range":
+            if not hasattr(os, "copy_file_range"):
+                raise OSError(errno.ENOSYS, "copy_file_range no disponible")
+            _kernel_copy(lambda n, offset: os.copy_file_range(src_fd, dst_fd, n, offset, offset), size)
+        elif method == "sendfile":
+            if not hasattr(os, "sendfile"):
+                raise OSError(errno.ENOSYS, "sendfile no disponible")
+            # sendfile a un archivo regular escribe en la posición actual del destino
+            _kernel_copy(lambda n, offset: os.sendfile(dst_fd, src_fd, offset, n), size)
+        else:
+            shutil.copyfileobj(fsrc, fdst, length=COPY_CHUNK_SIZE)
+
+    def _verify(self, source: Path, copy: Path, size: int, expected_hash: Optional[str]):
+        """Reemplaza la espera fija de 'latencia del NAS' por una comprobación real."""
+        if self.verify == "none":
+            return
+        copied = copy.stat().st_size
+        if copied != size:
+            raise IOError(f"Copia incompleta de {source.name}: {copied} de {size} bytes")
+        if self.verify == "checksum":
+            expected = expected_hash or hash_file(source)
+            if hash_file(copy) != expected:
+                raise IOError(f"Checksum de la copia de {source.name} no coincide con el original")
+
+
+def _kernel_copy(copy_fn, size: int):
+    """Llama a copy_file_range/sendfile hasta copiar `size` bytes (pueden copiar menos por llamada)."""
+    offset = 0
+    while offset < size:
+        copied = copy_fn(min(COPY_CHUNK_SIZE, size - offset), offset)
+        if copied == 0:
+            # El origen se acortó mientras se copiaba
+            raise IOError(f"Fin de archivo inesperado tras {offset} de {size} bytes")
+        offset += copied
@@ -0,0 +1,175 @@
+import logging
+import queue
+import threading
+from typing import Any, Callable, Iterable, List, Optional
+
+logger = logging.getLogger("WildIndex.Pipeline")
+
+# Marca de fin de flujo: cada worker consume exactamente una
+_STOP = object()
+
+
+class Stage:
+    """
+    Etapa de un pipeline: `fn` se ejecuta en `workers` hilos.
+
+    Si `batch_size` > 1, `fn` recibe una lista de hasta `batch_size` elementos (los que
+    estén disponibles, esperando como máximo `batch_timeout` segundos a completar el
+    lote) y debe retornar una lista con un resultado por elemento. Si no, recibe y
+    retorna un único elemento.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[Any], Any],
+        workers: int = 1,
+        batch_size: int = 1,
+        batch_timeout: float = 0.05
+    ):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.batch_timeout = batch_timeout
+
+
+class Pipeline:
+    """
+    Ejecutor por etapas con colas acotadas entre ellas.
+
+    Cada etapa corre en su propio pool de hilos, de modo que la E/S (NAS) y la inferencia
+    se solapan. Las colas acotadas aplican backpressure: si una etapa se atrasa, las
+    anteriores se bloquean en lugar de acumular elementos en memoria.
+    """
+
+    def __init__(
+        self,
+        stages: List[Stage],
+        queue_size: int = 16,
+        on_error: Optional[Callable[[str, Any, Exception], None]] = None
+    ):
+        if not stages:
+            raise ValueError("El pipeline necesita al menos una etapa")
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self.on_error = on_error or self._log_error
+
+    @staticmethod
+    def _log_error(stage_name: str, item: Any, error: Exception):
+        logger.error(f"❌ Error en etapa '{stage_name}' con {item}: {error}")
+
+    def run(self, items: Iterable[Any]) -> List[Any]:
+        """Procesa todos los elementos y retorna las salidas de la última etapa (sin orden garantizado)."""
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        outputs: List[Any] = []
+        outputs_lock = threading.Lock()
+        threads: List[threading.Thread] = []
+
+        for idx, stage in enumerate(self.stages):
+            next_queue = queues[idx + 1] if idx + 1 < len(self.stages) else None
+            next_workers = self.stages[idx + 1].workers if next_queue is not None else 0
+            remaining = [stage.workers]
+            remaining_lock = threading.Lock()
+
+            def finish(next_queue=next_queue, next_workers=next_workers,
+                       remaining=remaining, remaining_lock=remaining_lock):
+                # El último worker en terminar propaga el fin de flujo a la siguiente etapa
+                with remaining_lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last and next_queue is not None:
+                    for _ in range(next_workers):
+                        next_queue.put(_STOP)
+
+            def emit(result, next_queue=next_queue):
+                if next_queue is not None:
+                    next_queue.put(result)
+                else:
+                    with outputs_lock:
+                        outputs.append(result)
+
+            for n in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker,
+                    args=(stage, queues[idx], emit, finish),
+                    name=f"pipeline-{stage.name}-{n}",
+                    daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        # Alimentar la primera etapa (bloquea si está llena: backpressure)
+        try:
+            for item in items:
+                queues[0].put(item)
+        finally:
+            for _ in range(self.stages[0].workers):
+                queues[0].put(_STOP)
+
+        for thread in threads:
+            thread.join()
+
+        return outputs
+
+    def _worker(self, stage: Stage, in_queue: queue.Queue, emit: Callable[[Any], None], finish: Callable[[], None]):
+        try:
+            while True:
+                item = in_queue.get()
+                if item is _STOP:
+                    return
+
+                stop = False
+                try:
+                    if stage.batch_size == 1:
+                        self._run_single(stage, item, emit)
+                    else:
+                        batch, stop = self._collect_batch(stage, in_queue, item)
+                        self._run_batch(stage, batch, emit)
+                except Exception as e:
+                    # El worker no puede morir: si murieran todos los de la etapa, nadie vaciaría
+                    # su cola y las etapas anteriores quedarían bloqueadas para siempre en put()
+                    logger.exception(f"❌ Fallo inesperado en worker de '{stage.name}': {e}")
+                if stop:
+                    return
+        finally:
+            finish()
+
+    @staticmethod
+    def _collect_batch(stage: Stage, in_queue: queue.Queue, first: Any):
+        """Completa un lote con lo que llegue dentro de `batch_timeout`. Retorna (lote, fin_de_flujo)."""
+        batch = [first]
+        while len(batch) < stage.batch_size:
+            try:
+                item = in_queue.get(timeout=stage.batch_timeout)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run_single(self, stage: Stage, item: Any, emit: Callable[[Any], None]):
+        try:
+            result = stage.fn(item)
+        except Exception as e:
+            self._report(stage.name, item, e)
+            return
+        emit(result)
+
+    def _run_batch(self, stage: Stage, batch: List[Any], emit: Callable[[Any], None]):
+        try:
+            results = stage.fn(batch)
+        except Exception as e:
+            for item in batch:
+                self._report(stage.name, item, e)
+            return
+        for result in results:
+            emit(result)
+
+    def _report(self, stage_name: str, item: Any, error: Exception):
+        """Llama a on_error sin dejar escapar sus propios fallos (ej. DB bloqueada al registrar el error)."""
+        try:
+            self.on_error(stage_name, item, error)
+        except Exception as e:
+            logger.error(f"❌ Error en on_error de '{stage_name}' con {item}: {e} (error original: {error})")
@@ -0,0 +1,278 @@
+"""
+Modo de perfilado bajo demanda: línea de tiempo por imagen en formato Chrome trace-event
+(se abre en https://ui.perfetto.dev o chrome://tracing).
+
+Desactivado, `span()` solo comprueba una bandera y retorna un context manager vacío
+compartido: se puede dejar en el camino caliente. Se activa al arrancar
+(PROFILE_ENABLED=true) o en caliente con `kill -USR1 <pid>`, y captura los siguientes
+PROFILE_BATCHES lotes de BatchProcessor.process_files; un segundo USR1 la termina antes.
+Cada captura escribe en PROFILE_DIR:
+
+- trace-<fecha>.json: un span por etapa del pipeline y por paso de cada archivo (hilo a
+  hilo), incluidos los procesos del pool de inferencia.
+- cprofile-<fecha>.prof (PROFILE_CPROFILE=true): estadísticas de cProfile de todos los
+  hilos del pipeline (`python -m pstats`, snakeviz).
+- torch-<fecha>.json (PROFILE_TORCH=true): traza de torch.profiler en CPU (solo el
+  proceso principal: con INFERENCE_PROCESSES > 0 los modelos corren en los workers).
+"""
+import cProfile
+import json
+import logging
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("WildIndex.Profiling")
+
+# Context manager vacío compartido: el coste de un span desactivado es una llamada y un if
+_NULL_SPAN = nullcontext()
+
+
+def _now_us() -> float:
+    # CLOCK_MONOTONIC es común a todos los procesos del host: los spans de los workers
+    # quedan alineados con los del proceso principal
+    return time.perf_counter_ns() / 1000.0
+
+
+class _Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name: str, args: Dict[str, Any]):
+        self.name = name
+        self.args = args
+
+    def __enter__(self) -> "_Span":
+        self.start = _now_us()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = _now_us()
+        if exc_type is not None:
+            self.args["error"] = repr(exc)
+        # Solo valores simples: el evento no debe retener objetos (ej. imágenes de un FileTask)
+        for key, value in self.args.items():
+            if not isinstance(value, (str, int, float, bool, type(None))):
+                self.args[key] = str(value)
+        PROFILER.add_event({
+            "name": self.name,
+            "ph": "X",
+            "ts": self.start,
+            "dur": end - self.start,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": self.args,
+        })
+
+
+def span(name: str, **args: Any):
+    """Span de la línea de tiempo (`with span("copy", file=...)`). Sin captura activa no hace nada."""
+    if not PROFILER.active:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+class Profiler:
+    """Estado de la captura del proceso. Usar la instancia global PROFILER."""
+
+    def __init__(self):
+        # Leída sin lock en cada span: solo cambia al empezar/terminar una captura
+        self.active = False
+        self.output_dir = Path("logs/profiles")
+        self.batches = 5
+        self.use_cprofile = False
+        self.use_torch = False
+        self.process_name: Optional[str] = None
+        self._lock = threading.Lock()
+        self._armed = False
+        self._stop_requested = False
+        self._remaining = 0
+        self._events: List[Dict[str, Any]] = []
+        self._thread_names: Dict[int, str] = {}
+        self._started_at: Optional[datetime] = None
+        self._profiles: List[cProfile.Profile] = []
+        self._torch_profiler = None
+
+    def configure(
+        self,
+        output_dir: str,
+        batches: int = 5,
+        cprofile: bool = False,
+        torch_profiler: bool = False
+    ):
+        self.output_dir = Path(output_dir)
+        self.batches = max(1, batches)
+        self.use_cprofile = cprofile
+        self.use_torch = torch_profiler
+
+    def install_signal_handler(self, signum: int = signal.SIGUSR1):
+        """`kill -USR1 <pid>`: inicia una captura en el siguiente lote, o termina la actual."""
+        signal.signal(signum, lambda *_: self.toggle())
+
+    def toggle(self):
+        # Llamado desde el manejador de señales: solo cambia banderas
+        if self.active:
+            self._stop_requested = True
+        else:
+            self._armed = True
+
+    def request(self):
+        """Captura los siguientes `batches` lotes."""
+        self._armed = True
+
+    # ------------------------------------------------------------------
+    # Límites de lote (BatchProcessor.process_files)
+    # ------------------------------------------------------------------
+    def batch_started(self):
+        if self._armed and not self.active:
+            self._start()
+
+    def batch_finished(self):
+        if not self.active:
+            return
+        self._remaining -= 1
+        if self._remaining <= 0 or self._stop_requested:
+            self._stop()
+
+    # ------------------------------------------------------------------
+    # Eventos
+    # ------------------------------------------------------------------
+    def add_event(self, event: Dict[str, Any]):
+        tid = event["tid"]
+        if tid not in self._thread_names and event["pid"] == os.getpid():
+            self._thread_names[tid] = threading.current_thread().name
+        self._events.append(event)
+
+    def add_events(self, events: Optional[List[Dict[str, Any]]]):
+        """Spans de otro proceso (workers del pool de inferencia)."""
+        if events and self.active:
+            self._events.extend(events)
+
+    def drain_events(self) -> List[Dict[str, Any]]:
+        """Eventos acumulados (con los nombres de proceso/hilo) y vacía el buffer. Para los workers."""
+        events, self._events = self._events, []
+        if not events:
+            return events
+        return self._metadata_events() + events
+
+    # ------------------------------------------------------------------
+    # Inicio / fin de captura
+    # ------------------------------------------------------------------
+    def _start(self):
+        with self._lock:
+            if self.active:
+                return
+            self._armed = False
+            self._stop_requested = False
+            self._remaining = self.batches
+            self._events = []
+            self._thread_names = {}
+            self._started_at = datetime.now()
+            if self.use_cprofile:
+                self._start_cprofile()
+            if self.use_torch:
+                self._start_torch()
+            self.active = True
+        logger.info(f"🔬 Perfilado activado para {self.batches} lotes.")
+
+    def _stop(self):
+        with self._lock:
+            if not self.active:
+                return
+            self.active = False
+            events, self._events = self._events, []
+            stamp = self._started_at.strftime("%Y%m%d-%H%M%S")
+            try:
+                self.output_dir.mkdir(parents=True, exist_ok=True)
+                trace_path = self.output_dir / f"trace-{stamp}.json"
+                self._write_trace(trace_path, events)
+                logger.info(f"🔬 Traza escrita en {trace_path} ({len(events)} spans).")
+                if self._profiles:
+                    self._stop_cprofile(self.output_dir / f"cprofile-{stamp}.prof")
+                if self._torch_profiler is not None:
+                    self._stop_torch(self.output_dir / f"torch-{stamp}.json")
+            except Exception as e:
+                logger.error(f"❌ Error guardando el perfilado: {e}")
+            finally:
+                threading.setprofile(None)
+                self._profiles = []
+                self._torch_profiler = None
+
+    def _metadata_events(self) -> List[Dict[str, Any]]:
+        pid = os.getpid()
+        events = [{
+            "name": "process_name", "ph": "M", "pid": pid, "tid": 0,
+            "args": {"name": self.process_name or f"wildindex ({pid})"},
+        }]
+        for tid, name in self._thread_names.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}})
+        return events
+
+    def _write_trace(self, path: Path, events: List[Dict[str, Any]]):
+        trace = {
+            "traceEvents": self._metadata_events() + events,
+            "displayTimeUnit": "ms",
+            "otherData": {"started_at": self._started_at.isoformat(), "batches": self.batches},
+        }
+        with open(path, "w") as f:
+            json.dump(trace, f)
+
+    def _start_cprofile(self):
+        """
+        cProfile en todos los hilos: los hilos del pipeline se crean en cada lote, así que
+        threading.setprofile los engancha al nacer (un Profile por hilo). En Python 3.12+
+        cProfile usa sys.monitoring y un solo Profile ve todos los hilos.
+        """
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            # Otro profiler activo (ej. un depurador)
+            logger.warning(f"⚠️ cProfile no disponible: {e}")
+            return
+        self._profiles.append(profile)
+        if sys.version_info < (3, 12):
+            threading.setprofile(self._profile_new_thread)
+
+    def _profile_new_thread(self, frame, event, arg):
+        sys.setprofile(None)
+        if not self.active:
+            return
+        profile = cProfile.Profile()
+        profile.enable()
+        with self._lock:
+            self._profiles.append(profile)
+
+    def _stop_cprofile(self, path: Path):
+        threading.setprofile(None)
+        profiles = self._profiles
+        profiles[0].disable()
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            # Los hilos del pipeline ya terminaron: sus Profile solo se leen
+            stats.add(profile)
+        stats.dump_stats(str(path))
+        logger.info(f"🔬 cProfile ({len(profiles)} hilos) escrito en {path}")
+
+    def _start_torch(self):
+        try:
+            from torch.profiler import ProfilerActivity, profile
+        except ImportError:
+            logger.warning("⚠️ torch.profiler no disponible. Continuando sin él.")
+            return
+        self._torch_profiler = profile(activities=[ProfilerActivity.CPU], record_shapes=True)
+        self._torch_profiler.__enter__()
+
+    def _stop_torch(self, path: Path):
+        self._torch_profiler.__exit__(None, None, None)
+        self._torch_profiler.export_chrome_trace(str(path))
+        logger.info(f"🔬 Traza de torch.profiler escrita en {path}")
+
+
+PROFILER = Profiler()
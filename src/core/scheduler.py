@@ -0,0 +1,178 @@
+"""
+Planificador del bucle principal: tamaño de lote adaptativo y espera con backoff.
+
+Cada lote tiene un coste fijo (reclamo en la cola, arranque y vaciado del pipeline,
+flush de la DB) y un coste por archivo que marca la etapa más lenta. Con lotes
+pequeños el coste fijo domina y las etapas esperan al vaciado; con lotes enormes los
+archivos nuevos del watcher esperan detrás del lote en curso. El planificador mide
+ambos tras cada lote:
+
+- segundos por archivo de cada etapa = tiempo en wildindex_stage_seconds / ejecutores / archivos
+  (la mayor es el cuello de botella, el ritmo sostenido del pipeline; con el pool de
+  inferencia cuentan sus procesos y el tiempo de cómputo que reportan)
+- coste fijo = duración del lote - archivos * segundos por archivo del cuello de botella
+
+y elige el lote más pequeño cuyo coste fijo no pase de `max_overhead` de su duración,
+sin superar `target_batch_seconds`. Si la memoria disponible baja de `min_free_mb`,
+el lote se reduce a la mitad.
+
+Mientras hay backlog los lotes se encadenan sin pausa; sin trabajo, la espera entre
+sondeos de la cola crece de `idle_min` a `idle_max` (los eventos del watcher la cortan).
+"""
+import logging
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from src.core.metrics import (
+    SCHEDULER_BATCH_SIZE,
+    SCHEDULER_FILE_SECONDS,
+    SCHEDULER_IDLE_WAIT_SECONDS,
+    SCHEDULER_OVERHEAD_SECONDS,
+    STAGE_SECONDS,
+)
+
+logger = logging.getLogger("WildIndex.Scheduler")
+
+
+def available_memory_mb() -> Optional[float]:
+    """MemAvailable del host, acotada por el límite del cgroup (v2) si el contenedor tiene uno."""
+    available = None
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    available = int(line.split()[1]) / 1024
+                    break
+    except OSError:
+        return None
+    try:
+        limit = Path("/sys/fs/cgroup/memory.max").read_text().strip()
+        if limit != "max":
+            current = int(Path("/sys/fs/cgroup/memory.current").read_text())
+            cgroup_free = (int(limit) - current) / (1024 * 1024)
+            available = cgroup_free if available is None else min(available, cgroup_free)
+    except (OSError, ValueError):
+        pass
+    return available
+
+
+class BatchScheduler:
+    """
+    stage_workers: ejecutores por etapa (BatchProcessor.stage_workers).
+    busy_seconds: contadores acumulados que sustituyen a wildindex_stage_seconds en algunas
+    etapas (BatchProcessor.stage_busy_seconds).
+    adaptive=False mantiene `batch_size` fijo (solo aplica el backoff sin trabajo).
+    """
+
+    def __init__(
+        self,
+        stage_workers: Dict[str, int],
+        busy_seconds: Optional[Dict[str, Callable[[], float]]] = None,
+        batch_size: int = 10,
+        min_batch_size: int = 1,
+        max_batch_size: int = 1000,
+        target_batch_seconds: float = 60.0,
+        max_overhead: float = 0.1,
+        min_free_mb: float = 1024.0,
+        idle_min: float = 1.0,
+        idle_max: float = 30.0,
+        smoothing: float = 0.3,
+        adaptive: bool = True
+    ):
+        self.stage_workers = {stage: max(1, workers) for stage, workers in stage_workers.items()}
+        self.busy_seconds = busy_seconds or {}
+        self.min_batch_size = max(1, min_batch_size)
+        self.max_batch_size = max(self.min_batch_size, max_batch_size)
+        self.batch_size = min(max(batch_size, self.min_batch_size), self.max_batch_size)
+        self.target_batch_seconds = target_batch_seconds
+        self.max_overhead = min(max(max_overhead, 0.01), 0.9)
+        self.min_free_mb = min_free_mb
+        self.idle_min = idle_min
+        self.idle_max = max(idle_min, idle_max)
+        self.smoothing = smoothing
+        self.adaptive = adaptive
+
+        # Estimaciones (EWMA); None hasta el primer lote
+        self.file_seconds: Dict[str, float] = {}
+        self.overhead_seconds: Optional[float] = None
+        self.idle_wait = 0.0
+
+        self._batch_start = 0.0
+        self._stage_sums: Dict[str, float] = {}
+        SCHEDULER_BATCH_SIZE.labels().set(self.batch_size)
+
+    # ------------------------------------------------------------------
+    # Lotes
+    # ------------------------------------------------------------------
+    def batch_started(self):
+        self._batch_start = time.perf_counter()
+        self._stage_sums = {stage: self._stage_busy(stage) for stage in self.stage_workers}
+
+    def batch_finished(self, files: int):
+        """Registra un lote de `files` archivos y recalcula el tamaño del siguiente."""
+        elapsed = time.perf_counter() - self._batch_start
+        self._set_idle_wait(0.0)
+        if files <= 0 or not self.adaptive:
+            return
+
+        for stage, workers in self.stage_workers.items():
+            busy = self._stage_busy(stage) - self._stage_sums.get(stage, 0.0)
+            self.file_seconds[stage] = self._ewma(self.file_seconds.get(stage), busy / workers / files)
+            SCHEDULER_FILE_SECONDS.labels(stage).set(self.file_seconds[stage])
+        bottleneck = max(self.file_seconds, key=self.file_seconds.get)
+        steady = self.file_seconds[bottleneck]
+        self.overhead_seconds = self._ewma(self.overhead_seconds, max(0.0, elapsed - steady * files))
+        SCHEDULER_OVERHEAD_SECONDS.labels().set(self.overhead_seconds)
+
+        previous = self.batch_size
+        reason = f"cuello de botella {bottleneck} {steady:.3f} s/archivo, coste fijo {self.overhead_seconds:.1f} s"
+        memory = available_memory_mb()
+        if memory is not None and memory < self.min_free_mb:
+            size = previous // 2
+            reason = f"memoria disponible {memory:.0f} MB < {self.min_free_mb:.0f} MB"
+        elif steady > 0:
+            # Lote en que el coste fijo es `max_overhead` de la duración, sin pasar del objetivo
+            amortized = self.overhead_seconds * (1 - self.max_overhead) / (self.max_overhead * steady)
+            size = min(amortized, self.target_batch_seconds / steady)
+            # Como mucho x2 / ÷2 por lote: una medida ruidosa no mueve el tamaño de golpe
+            size = min(max(size, previous / 2), previous * 2)
+        else:
+            return
+        self.batch_size = int(min(max(round(size), self.min_batch_size), self.max_batch_size))
+        SCHEDULER_BATCH_SIZE.labels().set(self.batch_size)
+
+        if self.batch_size != previous:
+            logger.info(f"📐 Lote {previous} -> {self.batch_size} ({reason}).")
+        else:
+            logger.debug(f"📐 Lote {self.batch_size} ({files} archivos en {elapsed:.1f} s; {reason}).")
+
+    # ------------------------------------------------------------------
+    # Sin trabajo
+    # ------------------------------------------------------------------
+    def next_idle_wait(self) -> float:
+        """Espera antes del siguiente sondeo de la cola vacía: idle_min, x2, ... hasta idle_max."""
+        if self.idle_wait == 0.0:
+            logger.info(f"💤 Cola vacía: esperando eventos (sondeo cada {self.idle_min:g}-{self.idle_max:g} s).")
+            self._set_idle_wait(self.idle_min)
+        else:
+            self._set_idle_wait(min(self.idle_wait * 2, self.idle_max))
+        return self.idle_wait
+
+    def reset_idle(self):
+        """Llegó trabajo (eventos del watcher): volver a sondear sin espera."""
+        self._set_idle_wait(0.0)
+
+    def _set_idle_wait(self, seconds: float):
+        self.idle_wait = seconds
+        SCHEDULER_IDLE_WAIT_SECONDS.labels().set(seconds)
+
+    def _stage_busy(self, stage: str) -> float:
+        if stage in self.busy_seconds:
+            return self.busy_seconds[stage]()
+        return STAGE_SECONDS.labels(stage).sum
+
+    def _ewma(self, previous: Optional[float], value: float) -> float:
+        if previous is None:
+            return value
+        return previous + self.smoothing * (value - previous)
@@ -0,0 +1,105 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger("WildIndex.SequenceGrouper")
+
+# Firma: miniatura en escala de grises, 4:3 como la mayoría de cámaras trampa. A 128x96 un
+# animal de ~0.2% del encuadre (60x60 px en 2 MP) ya cambia más de una docena de celdas
+SIGNATURE_SIZE = (128, 96)
+
+
+def image_signature(image: Image.Image, size: Tuple[int, int] = SIGNATURE_SIZE) -> np.ndarray:
+    """Miniatura en gris de `size` (reduce() interno de PIL: barato incluso sobre el original)."""
+    thumb = image.resize(size, Image.BILINEAR, reducing_gap=2.0)
+    return np.asarray(thumb.convert("L"), dtype=np.uint8)
+
+
+def signature_difference(a: np.ndarray, b: np.ndarray, pixel_threshold: float = 0.08) -> float:
+    """
+    Fracción de celdas de la miniatura que cambiaron más de `pixel_threshold` (0-1),
+    descontando el cambio global de exposición (mediana de la diferencia). Un animal que
+    entra en escena cambia un bloque de celdas; el ruido del sensor se promedia al reducir.
+    """
+    if a.shape != b.shape:
+        return 1.0
+    diff = a.astype(np.float32) / 255.0 - b.astype(np.float32) / 255.0
+    diff -= np.median(diff)
+    return float(np.mean(np.abs(diff) > pixel_threshold))
+
+
+class _Sequence:
+    """Estado de la secuencia en curso de una carpeta (estación)."""
+
+    __slots__ = ("last_time", "reference_id", "reference_signature")
+
+    def __init__(self, last_time: float, reference_id: str, reference_signature: np.ndarray):
+        self.last_time = last_time
+        self.reference_id = reference_id
+        self.reference_signature = reference_signature
+
+
+class SequenceGrouper:
+    """
+    Agrupa ráfagas de cámara trampa por carpeta y proximidad de captura y detecta frames
+    casi idénticos a uno ya analizado.
+
+    Por carpeta se guarda el frame de referencia (el último analizado completo). Un frame
+    nuevo de la misma carpeta, capturado a menos de `max_gap_seconds` del anterior y cuya
+    firma difiere de la referencia en menos de `change_threshold` (fracción de celdas),
+    reutiliza el resultado de la referencia. Se compara con la referencia y no con el
+    frame previo para que cambios lentos no se acumulen sin volver a analizar.
+
+    Es seguro entre hilos: varios lotes de inferencia pueden consultarlo a la vez.
+    """
+
+    def __init__(
+        self,
+        max_gap_seconds: float = 10.0,
+        change_threshold: float = 0.001,
+        pixel_threshold: float = 0.08,
+        max_results: int = 1024
+    ):
+        self.max_gap_seconds = max_gap_seconds
+        self.change_threshold = change_threshold
+        self.pixel_threshold = pixel_threshold
+        self._lock = threading.Lock()
+        self._sequences: Dict[str, _Sequence] = {}
+        self.max_results = max_results
+        # Resultados de referencias recientes (acotado): un lote puede reemplazar la
+        # referencia de una carpeta antes de que terminen los frames que dependían de ella
+        self._results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def match(self, frame_id: str, folder: str, capture_time: float, signature: np.ndarray) -> Optional[str]:
+        """
+        Retorna el id del frame de referencia si `frame_id` es casi duplicado de él; si no,
+        `frame_id` pasa a ser la referencia de su carpeta y retorna None (analizar completo).
+        Llamar en orden de captura dentro de cada carpeta.
+        """
+        with self._lock:
+            sequence = self._sequences.get(folder)
+            if sequence is not None and abs(capture_time - sequence.last_time) <= self.max_gap_seconds:
+                sequence.last_time = max(sequence.last_time, capture_time)
+                change = signature_difference(sequence.reference_signature, signature, self.pixel_threshold)
+                if change < self.change_threshold:
+                    return sequence.reference_id
+
+            self._sequences[folder] = _Sequence(capture_time, frame_id, signature)
+            return None
+
+    def set_result(self, frame_id: str, result: Dict[str, Any]):
+        """Guarda el resultado de un frame analizado (los más antiguos se descartan)."""
+        with self._lock:
+            self._results[frame_id] = result
+            self._results.move_to_end(frame_id)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+
+    def result(self, frame_id: str) -> Optional[Dict[str, Any]]:
+        """Resultado de la referencia, o None si aún no terminó (otro lote) o falló."""
+        with self._lock:
+            return self._results.get(frame_id)
@@ -0,0 +1,76 @@
+import os
+import re
+import hashlib
+import logging
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import torch
+
+logger = logging.getLogger("WildIndex.SpeciesEmbeddings")
+
+
+def species_list_hash(labels: List[str]) -> str:
+    """Hash estable del vocabulario (orden incluido: las filas de la matriz siguen la lista)."""
+    return hashlib.sha256("\n".join(labels).encode("utf-8")).hexdigest()[:16]
+
+
+def cache_path(cache_dir: str, model_id: str, labels: List[str]) -> Path:
+    """Ruta del archivo .npy para (modelo, lista de especies)."""
+    model_slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_id).strip("_")
+    return Path(cache_dir) / f"{model_slug}_{species_list_hash(labels)}.npy"
+
+
+def load_species_embeddings(
+    model,
+    tokenizer,
+    labels: List[str],
+    model_id: str,
+    cache_dir: str,
+    device: str = "cpu",
+    chunk_size: int = 256
+) -> np.ndarray:
+    """
+    Retorna la matriz [N, D] (float32, normalizada) de embeddings de texto del vocabulario.
+
+    La matriz se calcula una sola vez por (modelo, hash de la lista), por bloques de
+    `chunk_size` etiquetas para acotar la memoria, y se guarda como .npy. Los arranques
+    siguientes la mapean en memoria (copy-on-write): varios procesos worker comparten
+    las mismas páginas del page cache en lugar de tener una copia cada uno.
+    """
+    if not labels:
+        raise ValueError("La lista de especies está vacía: no hay vocabulario que clasificar")
+
+    path = cache_path(cache_dir, model_id, labels)
+    if path.exists():
+        matrix = np.load(path, mmap_mode="c")
+        if matrix.shape[0] == len(labels):
+            logger.info(f"🧬 Embeddings de especies mapeados desde caché: {path.name} ({matrix.shape[0]} taxones)")
+            return matrix
+        logger.warning(f"⚠️ Caché {path.name} inconsistente ({matrix.shape[0]} filas). Recalculando...")
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Nombre temporal por proceso: si varios workers calculan a la vez, os.replace es atómico
+    tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npy")
+    logger.info(f"🧬 Calculando embeddings de {len(labels)} especies (bloques de {chunk_size})...")
+
+    matrix = None
+    with torch.no_grad():
+        for start in range(0, len(labels), chunk_size):
+            tokens = tokenizer(labels[start:start + chunk_size]).to(device)
+            features = model.encode_text(tokens)
+            features /= features.norm(dim=-1, keepdim=True)
+            block = features.cpu().float().numpy()
+
+            if matrix is None:
+                matrix = np.lib.format.open_memmap(
+                    tmp_path, mode="w+", dtype=np.float32, shape=(len(labels), block.shape[1])
+                )
+            matrix[start:start + len(block)] = block
+
+    matrix.flush()
+    del matrix
+    os.replace(tmp_path, path)
+    logger.info(f"💾 Embeddings de especies guardados en {path}")
+    return np.load(path, mmap_mode="c")
@@ -95,3 +95,23 @@ SPECIES_LIST = [
     "Human (Persona)",
     "Vehicle (Vehículo)"
 ]
+
+
+def load_species_list(path: str = None) -> list:
+    """
+    Carga la lista de especies desde un archivo de texto (un taxón por línea, mismo
+    formato "Nombre Científico (Nombre Común)"; líneas vacías y '#' se ignoran).
+    Sin archivo, retorna SPECIES_LIST. Permite usar checklists regionales de 10k+ taxones.
+    """
+    if not path:
+        return list(SPECIES_LIST)
+
+    labels = []
+    seen = set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            label = line.strip()
+            if label and not label.startswith("#") and label not in seen:
+                seen.add(label)
+                labels.append(label)
+    return labels
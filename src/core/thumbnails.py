@@ -0,0 +1,138 @@
+import os
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger("WildIndex.Thumbnails")
+
+# Lado mayor de la vista previa en memoria (de ella salen miniatura, recortes y firma)
+PREVIEW_SIZE = 1280
+
+
+class Preview:
+    """
+    Copia reducida de una imagen que acompaña al archivo por el pipeline. `scale` convierte
+    coordenadas del original (bbox de MegaDetector) a coordenadas de la vista previa.
+    """
+
+    def __init__(self, image: Image.Image, scale: float):
+        self.image = image
+        self.scale = scale
+
+    @classmethod
+    def from_image(cls, image: Image.Image, max_side: int = PREVIEW_SIZE) -> "Preview":
+        """Desde píxeles ya decodificados (orientación EXIF ya aplicada)."""
+        width, height = image.size
+        scale = min(1.0, max_side / max(width, height))
+        if scale == 1.0:
+            return cls(image.copy(), 1.0)
+        # resize() sin copia previa; reducing_gap reduce primero por bloques (barato en 24 MP)
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        return cls(image.resize(size, Image.BILINEAR, reducing_gap=2.0), scale)
+
+    @classmethod
+    def open(cls, path: str, max_side: int = PREVIEW_SIZE) -> "Preview":
+        """
+        Desde el archivo sin decodificarlo completo: en JPEG, draft() decodifica a escala
+        1/2..1/8 directamente desde la DCT.
+        """
+        with Image.open(path) as img:
+            source_side = max(img.size)
+            img.draft("RGB", (max_side, max_side))
+            oriented = ImageOps.exif_transpose(img)
+            rgb = oriented if oriented.mode == "RGB" else oriented.convert("RGB")
+            rgb.thumbnail((max_side, max_side), Image.BILINEAR, reducing_gap=2.0)
+            rgb.load()
+        return cls(rgb, max(rgb.size) / source_side)
+
+    def close(self):
+        self.image.close()
+
+
+class ThumbnailCache:
+    """
+    Caché local de miniaturas WebP por file_hash (más recortes de los animales detectados),
+    generadas al ingerir. El dashboard sirve solo estos archivos y no toca los originales
+    del NAS salvo que el usuario lo pida.
+
+    Estructura: <cache_dir>/<hash[:2]>/<hash>.webp y <hash>_crop<i>.webp.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        size: int = 384,
+        crop_size: int = 192,
+        quality: int = 80,
+        max_crops: int = 4
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.size = size
+        self.crop_size = crop_size
+        self.quality = quality
+        self.max_crops = max_crops
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def thumbnail_path(self, file_hash: str) -> Path:
+        return self.cache_dir / file_hash[:2] / f"{file_hash}.webp"
+
+    def crop_path(self, file_hash: str, det_index: int) -> Path:
+        return self.cache_dir / file_hash[:2] / f"{file_hash}_crop{det_index}.webp"
+
+    def write(
+        self,
+        file_hash: str,
+        preview: Preview,
+        detections: Optional[List[Dict[str, Any]]] = None
+    ) -> Tuple[str, Dict[int, str]]:
+        """
+        Escribe la miniatura y los recortes de animal. Retorna (ruta de la miniatura,
+        {det_index: ruta del recorte}).
+        """
+        thumb = preview.image.copy()
+        thumb.thumbnail((self.size, self.size), Image.BILINEAR, reducing_gap=2.0)
+        thumbnail_path = self.thumbnail_path(file_hash)
+        self._save(thumb, thumbnail_path)
+
+        crops = {}
+        for det_index, det in enumerate(detections or []):
+            if len(crops) >= self.max_crops:
+                break
+            if det.get("category") != "animal" or not det.get("bbox"):
+                continue
+            crop = self._crop(preview, det["bbox"])
+            if crop is None:
+                continue
+            crop.thumbnail((self.crop_size, self.crop_size), Image.BILINEAR)
+            path = self.crop_path(file_hash, det_index)
+            self._save(crop, path)
+            crops[det_index] = str(path)
+        return str(thumbnail_path), crops
+
+    @staticmethod
+    def _crop(preview: Preview, bbox: List[float]) -> Optional[Image.Image]:
+        """Recorte del bbox (píxeles del original) con 10% de margen para dar contexto."""
+        if len(bbox) != 4:
+            return None
+        xmin, ymin, xmax, ymax = (coord * preview.scale for coord in bbox)
+        padding = 0.1 * max(xmax - xmin, ymax - ymin)
+        width, height = preview.image.size
+        box = (
+            max(0, int(xmin - padding)),
+            max(0, int(ymin - padding)),
+            min(width, int(xmax + padding) + 1),
+            min(height, int(ymax + padding) + 1),
+        )
+        if box[0] >= box[2] or box[1] >= box[3]:
+            return None
+        return preview.image.crop(box)
+
+    def _save(self, image: Image.Image, path: Path):
+        # Temporal + rename: el dashboard nunca lee una miniatura a medio escribir
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        image.save(tmp_path, format="WEBP", quality=self.quality, method=4)
+        os.replace(tmp_path, path)
@@ -0,0 +1,234 @@
+import os
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+from src.database.db_manager import DatabaseManager
+
+logger = logging.getLogger("WildIndex.VectorIndex")
+
+# Vectores por página al reinsertar / reconstruir desde la DB
+REPLAY_PAGE_SIZE = 5000
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Filas float32 de norma 1 (producto interno = similitud coseno)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+
+
+class VectorIndex:
+    """
+    Índice vectorial persistente (FAISS) de embeddings BioCLIP, indexado por file_hash.
+
+    - Índice HNSW con producto interno (embeddings normalizados -> similitud coseno).
+      No requiere entrenamiento, por lo que admite altas incrementales desde el primer
+      vector y mantiene búsquedas de milisegundos con millones de imágenes.
+    - El mapeo vector_id (int64) -> file_hash vive en SQLite (tabla `embeddings`), junto
+      con el propio vector: SQLite es la fuente de verdad y el .faiss una caché derivada.
+    - El archivo .faiss se reescribe de forma atómica cada `save_every` altas o
+      `save_interval` segundos (y en close()), no en cada imagen. Los vectores añadidos
+      después del último guardado (indexed=0) se reinsertan desde la DB al arrancar, así
+      que un crash no los pierde. scripts/rebuild_vector_index.py reconstruye el índice.
+    """
+
+    def __init__(
+        self,
+        index_path: str,
+        db_manager: DatabaseManager,
+        kind: str = "hnsw",
+        hnsw_m: int = 32,
+        ef_search: int = 64,
+        save_every: int = 1000,
+        save_interval: float = 300.0
+    ):
+        import faiss
+
+        self._faiss = faiss
+        self.index_path = Path(index_path)
+        self.db = db_manager
+        self.kind = kind
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self.save_every = save_every
+        self.save_interval = save_interval
+
+        self._lock = threading.Lock()
+        self._index = None
+        self._unsaved_ids: List[int] = []
+        self._last_save = time.monotonic()
+
+        if self.index_path.exists():
+            self._index = faiss.read_index(str(self.index_path))
+            self._configure_search()
+            logger.info(f"🧭 Índice vectorial cargado: {self._index.ntotal} vectores ({self.index_path})")
+        self._replay_unindexed()
+
+    @property
+    def size(self) -> int:
+        return self._index.ntotal if self._index is not None else 0
+
+    def _create_index(self, dim: int):
+        faiss = self._faiss
+        if self.kind == "flat":
+            base = faiss.IndexFlatIP(dim)
+        else:
+            base = faiss.IndexHNSWFlat(dim, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        self._index = faiss.IndexIDMap2(base)
+        self._configure_search()
+        logger.info(f"🧭 Nuevo índice vectorial {self.kind} (dim={dim})")
+
+    def _configure_search(self):
+        base = self._faiss.downcast_index(self._index.index) if hasattr(self._index, "index") else self._index
+        if hasattr(base, "hnsw"):
+            base.hnsw.efSearch = self.ef_search
+
+    # ------------------------------------------------------------------
+    # Altas
+    # ------------------------------------------------------------------
+    def add(self, file_hash: str, vector: np.ndarray):
+        """Añade (o ignora si ya está indexado) el embedding de una imagen."""
+        self.add_many([(file_hash, vector)])
+
+    def add_many(self, items: List[Tuple[str, np.ndarray]]):
+        """Añade varios embeddings en una sola llamada a FAISS."""
+        if not items:
+            return
+
+        with self._lock:
+            assigned = self.db.assign_vector_ids([file_hash for file_hash, _ in items])
+            pending = set(self._unsaved_ids)
+            to_add = []
+            for file_hash, vector in items:
+                vector_id, indexed = assigned[file_hash]
+                # Ya persistido o ya añadido en esta sesión (aún sin guardar): no duplicar
+                if indexed or vector_id in pending:
+                    continue
+                pending.add(vector_id)
+                to_add.append((vector_id, vector))
+            if not to_add:
+                return
+
+            vectors = normalize(np.stack([np.asarray(v, dtype=np.float32).reshape(-1) for _, v in to_add]))
+            vector_ids = np.array([vid for vid, _ in to_add], dtype=np.int64)
+            # Primero a la DB: si el proceso muere antes del próximo save(), se reinsertan al arrancar
+            self.db.store_vectors([(int(vid), vector.tobytes()) for vid, vector in zip(vector_ids, vectors)])
+            self._add_vectors(vector_ids, vectors)
+
+    def _add_vectors(self, vector_ids: np.ndarray, vectors: np.ndarray):
+        if self._index is None:
+            self._create_index(vectors.shape[1])
+        self._index.add_with_ids(vectors, vector_ids)
+        self._unsaved_ids.extend(vector_ids.tolist())
+
+    def _replay_unindexed(self):
+        """Reinserta los vectores guardados en la DB que no llegaron al .faiss (crash antes de save())."""
+        # Un crash entre write_index y mark_vectors_indexed deja vectores ya presentes: no duplicarlos
+        present = set()
+        if self._index is not None and self._index.ntotal:
+            present = set(self._faiss.vector_to_array(self._index.id_map).tolist())
+
+        replayed = 0
+        after_id = 0
+        with self._lock:
+            while True:
+                rows = self.db.get_vectors(after_id, REPLAY_PAGE_SIZE, unindexed_only=True)
+                if not rows:
+                    break
+                after_id = rows[-1][0]
+                already = [vid for vid, _ in rows if vid in present]
+                self._unsaved_ids.extend(already)
+                rows = [(vid, blob) for vid, blob in rows if vid not in present]
+                if rows:
+                    vector_ids = np.array([vid for vid, _ in rows], dtype=np.int64)
+                    vectors = np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+                    self._add_vectors(vector_ids, vectors)
+                    replayed += len(rows)
+        if replayed:
+            logger.info(f"♻️  {replayed} vectores sin guardar recuperados de la DB.")
+        self.save()
+
+        lost = self.db.count_unrecoverable_vectors()
+        if lost:
+            logger.warning(
+                f"⚠️ {lost} embeddings sin vector guardado ni en el índice: "
+                f"python scripts/rebuild_vector_index.py --reembed"
+            )
+
+    def rebuild(self):
+        """Reconstruye el índice completo desde los vectores guardados en la DB y lo guarda."""
+        with self._lock:
+            self._index = None
+            self._unsaved_ids = []
+            after_id = 0
+            while True:
+                rows = self.db.get_vectors(after_id, REPLAY_PAGE_SIZE)
+                if not rows:
+                    break
+                after_id = rows[-1][0]
+                vector_ids = np.array([vid for vid, _ in rows], dtype=np.int64)
+                vectors = np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+                self._add_vectors(vector_ids, vectors)
+        self.save()
+
+    # ------------------------------------------------------------------
+    # Persistencia
+    # ------------------------------------------------------------------
+    def maybe_save(self):
+        """Persiste si se superó el umbral de altas o de tiempo desde el último guardado."""
+        with self._lock:
+            due = (
+                len(self._unsaved_ids) >= self.save_every
+                or (self._unsaved_ids and time.monotonic() - self._last_save >= self.save_interval)
+            )
+        if due:
+            self.save()
+
+    def save(self):
+        """Escribe el índice a disco de forma atómica y marca sus vectores como persistidos."""
+        with self._lock:
+            if self._index is None or not self._unsaved_ids:
+                return
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.index_path.with_suffix(self.index_path.suffix + ".tmp")
+            self._faiss.write_index(self._index, str(tmp_path))
+            os.replace(tmp_path, self.index_path)
+
+            saved, self._unsaved_ids = self._unsaved_ids, []
+            self._last_save = time.monotonic()
+            self.db.mark_vectors_indexed(saved)
+            logger.info(f"💾 Índice vectorial guardado: {self._index.ntotal} vectores (+{len(saved)})")
+
+    def close(self):
+        self.save()
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    def search(self, vector: np.ndarray, k: int = 10) -> List[Tuple[str, float]]:
+        """Retorna los k file_hash más similares al vector dado: [(file_hash, similitud)]."""
+        with self._lock:
+            if self._index is None or self._index.ntotal == 0:
+                return []
+            query = np.array(vector, dtype=np.float32).reshape(1, -1)
+            query /= np.linalg.norm(query) + 1e-12
+            scores, ids = self._index.search(query, k)
+
+        hits = [(int(vid), float(score)) for vid, score in zip(ids[0], scores[0]) if vid != -1]
+        hashes = self.db.get_hashes_by_vector_ids([vid for vid, _ in hits])
+        return [(hashes[vid], score) for vid, score in hits if vid in hashes]
+
+    def search_text(self, ai_engine, text: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Búsqueda texto -> imagen usando el codificador de texto de BioCLIP."""
+        return self.search(ai_engine.embed_text(text), k)
+
+    def search_image(self, ai_engine, image_path: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Búsqueda imagen -> imagen (mismo recorte que se indexa: el animal principal)."""
+        vector = ai_engine.embed_image(image_path)
+        if vector is None:
+            return []
+        return self.search(vector, k)
@@ -0,0 +1,126 @@
+import logging
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+import cv2
+from PIL import Image
+
+from src.core.detectors.megadetector import MegaDetector
+
+logger = logging.getLogger("WildIndex.Video")
+
+# Prioridad de categorías al elegir el "mejor" frame de un clip
+CATEGORY_PRIORITY = {"animal": 3, "person": 2, "vehicle": 1}
+
+
+class VideoAnalyzer:
+    """
+    Análisis de videos de cámara trampa con muestreo de frames y salida temprana.
+
+    Se muestrean frames a `sample_fps` (saltando con seek cuando el hueco es grande, para
+    que el decodificador arranque desde el keyframe más cercano en lugar de decodificar
+    todo el clip), se pasan por MegaDetector en lotes y se detiene en cuanto aparece un
+    animal con confianza >= `early_exit_confidence`.
+    """
+
+    def __init__(
+        self,
+        megadetector: MegaDetector,
+        sample_fps: float = 1.0,
+        max_frames: int = 120,
+        batch_size: int = 8,
+        early_exit_confidence: float = 0.8,
+        seek_min_gap: int = 30
+    ):
+        self.megadetector = megadetector
+        self.sample_fps = sample_fps
+        self.max_frames = max_frames
+        self.batch_size = batch_size
+        self.early_exit_confidence = early_exit_confidence
+        # A partir de este hueco (en frames) se usa seek en vez de grab() secuencial
+        self.seek_min_gap = seek_min_gap
+
+    def sample_frames(self, video_path: str) -> Iterator[Tuple[int, float, Image.Image]]:
+        """Genera (frame_index, segundos, imagen RGB) a la tasa de muestreo configurada."""
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise IOError(f"No se pudo abrir el video: {video_path}")
+
+        try:
+            fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+            if fps <= 0:
+                fps = 30.0 # Contenedores sin FPS fiable (algunos AVI)
+            total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+            step = max(1, int(round(fps / self.sample_fps)))
+
+            position = 0 # Próximo frame que devolverá read()
+            target = 0
+            emitted = 0
+            while emitted < self.max_frames and (total <= 0 or target < total):
+                gap = target - position
+                if gap >= self.seek_min_gap:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                else:
+                    # Hueco corto: grab() avanza sin convertir el frame
+                    for _ in range(gap):
+                        if not cap.grab():
+                            return
+                ok, frame = cap.read()
+                if not ok:
+                    return
+                position = target + 1
+
+                rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                yield target, target / fps, Image.fromarray(rgb)
+                emitted += 1
+                target += step
+        finally:
+            cap.release()
+
+    def find_best_frame(self, video_path: str) -> Dict[str, Any]:
+        """
+        Detecta sobre frames muestreados y retorna el mejor:
+        {md_result, frame (PIL), frame_index, frame_time, frames_analyzed}.
+        """
+        best: Optional[Tuple[Tuple[int, float], Dict[str, Any], Image.Image, int, float]] = None
+        frames_analyzed = 0
+        batch: List[Tuple[int, float, Image.Image]] = []
+
+        def flush() -> bool:
+            """Procesa el lote pendiente. Retorna True si hay que salir antes de tiempo."""
+            nonlocal best, frames_analyzed
+            results = self.megadetector.detect_batch([img for _, _, img in batch])
+            frames_analyzed += len(batch)
+            for (frame_index, frame_time, img), md_result in zip(batch, results):
+                if 'error' in md_result:
+                    continue
+                score = (CATEGORY_PRIORITY.get(md_result['md_category'], 0), md_result['md_confidence'])
+                if best is None or score > best[0]:
+                    best = (score, md_result, img, frame_index, frame_time)
+            batch.clear()
+            return (
+                best is not None
+                and best[1]['md_category'] == 'animal'
+                and best[1]['md_confidence'] >= self.early_exit_confidence
+            )
+
+        for frame in self.sample_frames(video_path):
+            batch.append(frame)
+            if len(batch) >= self.batch_size and flush():
+                logger.info(f"🎬 Salida temprana en {video_path} tras {frames_analyzed} frames.")
+                break
+        else:
+            if batch:
+                flush()
+
+        if best is None:
+            reason = "Sin frames decodificables" if frames_analyzed == 0 else "Falló la detección en todos los frames"
+            return {"md_result": {"error": f"{reason}: {video_path}"}, "frames_analyzed": frames_analyzed}
+
+        _, md_result, img, frame_index, frame_time = best
+        return {
+            "md_result": md_result,
+            "frame": img,
+            "frame_index": frame_index,
+            "frame_time": frame_time,
+            "frames_analyzed": frames_analyzed
+        }
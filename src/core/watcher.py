@@ -0,0 +1,324 @@
+import os
+import ctypes
+import ctypes.util
+import errno
+import logging
+import queue
+import select
+import struct
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger("WildIndex.Watcher")
+
+# Sistemas de archivos de red donde inotify no ve cambios hechos por otros clientes
+NETWORK_FILESYSTEMS = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "fuse.sshfs", "fuse.rclone", "afs"}
+
+# Constantes de inotify (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def get_filesystem_type(path: str) -> Optional[str]:
+    """Retorna el tipo de sistema de archivos del punto de montaje que contiene `path` (Linux)."""
+    try:
+        real = os.path.realpath(path)
+        best_mount, best_type = "", None
+        with open("/proc/mounts") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 3:
+                    continue
+                mount_point = parts[1].replace("\\040", " ")
+                if (real == mount_point or real.startswith(mount_point.rstrip("/") + "/")) and len(mount_point) > len(best_mount):
+                    best_mount, best_type = mount_point, parts[2]
+        return best_type
+    except OSError:
+        return None
+
+
+class _Inotify:
+    """Envoltorio mínimo de inotify vía ctypes (sin dependencias externas)."""
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library("c")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path: str, mask: int) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_add_watch({path}): {os.strerror(err)}")
+        return wd
+
+    def read_events(self, timeout: float) -> List[Tuple[int, int, str]]:
+        """Lee los eventos disponibles (espera hasta `timeout`). Retorna [(wd, mask, name)]."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class FileWatcher:
+    """
+    Detecta archivos nuevos en el directorio de entrada y los encola de inmediato.
+
+    - Montajes locales: inotify (IN_CLOSE_WRITE / IN_MOVED_TO), sin recorrer el árbol.
+    - NFS/SMB (inotify no ve escrituras de otros clientes) o si inotify falla: diff de
+      snapshots de directorios. Solo se vuelven a listar los directorios cuyo mtime
+      cambió, y un archivo se emite cuando su tamaño/mtime se mantiene estable entre dos
+      sondeos (evita encolar copias a medio escribir).
+
+    La reconciliación completa (os.walk) queda a cargo del orquestador, con baja frecuencia.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        extensions: Iterable[str],
+        poll_interval: float = 10.0,
+        mode: str = "auto"
+    ):
+        """mode: 'auto' (inotify salvo en FS de red), 'inotify' o 'poll'."""
+        self.root = Path(root)
+        self.extensions = {e.lower() for e in extensions}
+        self.poll_interval = poll_interval
+        self.mode = mode
+        self.queue: "queue.Queue[Path]" = queue.Queue()
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.backend: Optional[str] = None
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+    def start(self):
+        """Arranca el hilo de vigilancia con el backend adecuado para el montaje."""
+        self.backend = self._choose_backend()
+        target = self._run_inotify if self.backend == "inotify" else self._run_polling
+        self._thread = threading.Thread(target=target, name=f"watcher-{self.backend}", daemon=True)
+        self._thread.start()
+        logger.info(f"👀 Vigilando {self.root} (backend: {self.backend})")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _choose_backend(self) -> str:
+        if self.mode in ("inotify", "poll"):
+            return self.mode
+        fs_type = get_filesystem_type(str(self.root))
+        if fs_type in NETWORK_FILESYSTEMS or (fs_type or "").startswith("fuse."):
+            logger.info(f"ℹ️  {self.root} está en '{fs_type}': inotify no es fiable, usando sondeo.")
+            return "poll"
+        return "inotify"
+
+    def drain(self, max_items: int, timeout: Optional[float] = None) -> List[Path]:
+        """
+        Retorna hasta `max_items` archivos nuevos. Bloquea hasta `timeout` segundos
+        esperando el primero; el resto se recoge sin esperar.
+        """
+        items: List[Path] = []
+        try:
+            items.append(self.queue.get(timeout=timeout))
+        except queue.Empty:
+            return items
+        while len(items) < max_items:
+            try:
+                items.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _is_candidate(self, path: Path) -> bool:
+        return path.suffix.lower() in self.extensions
+
+    def _emit(self, path: Path):
+        if self._is_candidate(path):
+            self.queue.put(path)
+
+    # ------------------------------------------------------------------
+    # Backend inotify
+    # ------------------------------------------------------------------
+    def _run_inotify(self):
+        try:
+            inotify = _Inotify()
+        except OSError as e:
+            logger.warning(f"⚠️ inotify no disponible ({e}). Usando sondeo.")
+            self.backend = "poll"
+            self._run_polling()
+            return
+
+        watches: Dict[int, Path] = {}
+        try:
+            self._add_tree(inotify, self.root, watches, emit_existing=False)
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                logger.warning("⚠️ Límite de watches inotify alcanzado (fs.inotify.max_user_watches). Usando sondeo.")
+            else:
+                logger.warning(f"⚠️ Error registrando watches inotify ({e}). Usando sondeo.")
+            inotify.close()
+            self.backend = "poll"
+            self._run_polling()
+            return
+
+        try:
+            while not self._stop.is_set():
+                for wd, mask, name in inotify.read_events(timeout=1.0):
+                    if mask & IN_Q_OVERFLOW:
+                        logger.warning("⚠️ Cola de inotify desbordada: la próxima reconciliación recuperará los eventos.")
+                        continue
+                    if mask & IN_IGNORED:
+                        watches.pop(wd, None)
+                        continue
+
+                    directory = watches.get(wd)
+                    if directory is None or not name:
+                        continue
+                    path = directory / name
+
+                    if mask & IN_ISDIR:
+                        if mask & (IN_CREATE | IN_MOVED_TO):
+                            # Carpeta nueva (ej. volcado de tarjeta): vigilarla y encolar lo que ya tenga
+                            try:
+                                self._add_tree(inotify, path, watches, emit_existing=True)
+                            except OSError as e:
+                                logger.warning(f"⚠️ No se pudo vigilar {path}: {e}")
+                    elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                        self._emit(path)
+        finally:
+            inotify.close()
+
+    def _add_tree(self, inotify: _Inotify, top: Path, watches: Dict[int, Path], emit_existing: bool):
+        for root, _, filenames in os.walk(top):
+            wd = inotify.add_watch(root, WATCH_MASK)
+            watches[wd] = Path(root)
+            if emit_existing:
+                for filename in filenames:
+                    self._emit(Path(root) / filename)
+
+    # ------------------------------------------------------------------
+    # Backend de sondeo (NFS)
+    # ------------------------------------------------------------------
+    def _run_polling(self):
+        dir_mtimes: Dict[Path, int] = {}
+        # Última lista de cada directorio: (subdirectorios, nombres de archivos candidatos)
+        children: Dict[Path, Tuple[List[Path], Set[str]]] = {}
+        # Archivos vistos pero aún no estables: path -> (size, mtime_ns)
+        unstable: Dict[Path, Tuple[int, int]] = {}
+
+        # Línea base: lo existente lo cubre la reconciliación inicial
+        self._snapshot_dirs(self.root, dir_mtimes, children, collect=False)
+
+        while not self._stop.wait(self.poll_interval):
+            try:
+                changed = self._snapshot_dirs(self.root, dir_mtimes, children, collect=True)
+            except OSError as e:
+                logger.warning(f"⚠️ Error sondeando {self.root}: {e}")
+                continue
+
+            for path in changed:
+                unstable.setdefault(path, (-1, -1))
+
+            for path, previous in list(unstable.items()):
+                try:
+                    st = path.stat()
+                except OSError:
+                    unstable.pop(path, None)
+                    continue
+                current = (st.st_size, st.st_mtime_ns)
+                if current == previous:
+                    unstable.pop(path)
+                    self._emit(path)
+                else:
+                    unstable[path] = current
+
+    def _snapshot_dirs(
+        self,
+        top: Path,
+        dir_mtimes: Dict[Path, int],
+        children: Dict[Path, Tuple[List[Path], Set[str]]],
+        collect: bool
+    ) -> List[Path]:
+        """
+        Recorre solo directorios (stat por directorio) y relista los que cambiaron de mtime.
+        Retorna los archivos candidatos nuevos: los que no estaban en la lista anterior del
+        directorio. La lista se reemplaza en cada relistado, así que los archivos borrados
+        salen del estado y la memoria queda acotada por el árbol actual.
+        """
+        new_files: List[Path] = []
+        stack = [top]
+        seen_dirs: Set[Path] = set()
+        while stack:
+            directory = stack.pop()
+            seen_dirs.add(directory)
+            try:
+                mtime = directory.stat().st_mtime_ns
+            except OSError:
+                continue
+
+            relist = dir_mtimes.get(directory) != mtime
+            dir_mtimes[directory] = mtime
+
+            if relist:
+                try:
+                    entries = list(os.scandir(directory))
+                except OSError:
+                    continue
+                subdirs = []
+                names = set()
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(Path(entry.path))
+                    elif self._is_candidate(Path(entry.path)):
+                        names.add(entry.name)
+                if collect:
+                    previous = children.get(directory, ([], set()))[1]
+                    new_files.extend(directory / name for name in sorted(names - previous))
+                children[directory] = (subdirs, names)
+
+            # Sin cambios en este directorio: descender solo a los subdirectorios ya conocidos
+            stack.extend(children.get(directory, ([], set()))[0])
+
+        for gone in set(dir_mtimes) - seen_dirs:
+            dir_mtimes.pop(gone, None)
+            children.pop(gone, None)
+        return new_files
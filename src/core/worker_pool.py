@@ -0,0 +1,302 @@
+import os
+import time
+import queue
+import logging
+import threading
+import multiprocessing as mp
+from concurrent.futures import Future
+from itertools import count
+from typing import Dict, Any, List, Set
+
+from src.core.metrics import ERRORS_TOTAL, REGISTRY
+from src.core.profiling import PROFILER, span
+
+logger = logging.getLogger("WildIndex.WorkerPool")
+
+# Tipos de mensaje worker -> proceso principal
+_READY = "ready"
+_DONE = "done"
+_FAILED = "failed"
+
+
+def _worker_main(
+    worker_id: int,
+    config: Dict[str, Any],
+    num_threads: int,
+    tasks: mp.Queue,
+    results: mp.Queue,
+    current_job
+):
+    """
+    Proceso de inferencia: fija sus hilos, carga AIEngine una sola vez y atiende trabajos
+    de la cola compartida hasta recibir None.
+    """
+    # Antes de cargar los modelos: OpenMP/MKL leen estas variables al inicializarse
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(num_threads)
+
+    import torch
+    torch.set_num_threads(num_threads)
+    torch.set_num_interop_threads(1)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    log = logging.getLogger(f"WildIndex.Worker-{worker_id}")
+
+    from src.core.ai_engine import AIEngine
+    config = dict(config, onnx_threads=config.get("onnx_threads") or num_threads)
+    ai = AIEngine(config=config)
+    log.info(f"👷 Worker {worker_id} listo (pid {os.getpid()}, {num_threads} hilos).")
+    PROFILER.process_name = f"inference-worker-{worker_id}"
+    # Cada mensaje lleva los incrementos de métricas del worker (aquí, la carga de modelos)
+    # y, si el trabajo se perfiló, sus spans
+    results.put((_READY, None, worker_id, None, 0.0, REGISTRY.collect_deltas(), None))
+
+    while True:
+        job = tasks.get()
+        if job is None:
+            return
+        job_id, kind, payload, trace = job
+        # Memoria compartida (no la cola): el padre la ve aunque este proceso muera sin avisar
+        current_job.value = job_id
+        # El padre decide si hay captura activa; el worker solo la sigue trabajo a trabajo
+        PROFILER.active = trace
+        start = time.perf_counter()
+        try:
+            with span(f"worker_{kind}", job=job_id):
+                if kind == "video":
+                    output = ai.analyze_video(payload)
+                else:
+                    output = ai.analyze_batch(payload)
+            elapsed = time.perf_counter() - start
+            message = (_DONE, job_id, worker_id, output, elapsed)
+        except Exception as e:
+            log.error(f"❌ Error en worker {worker_id}: {e}")
+            elapsed = time.perf_counter() - start
+            message = (_FAILED, job_id, worker_id, str(e), elapsed)
+        PROFILER.active = False
+        events = PROFILER.drain_events() if trace else None
+        results.put(message + (REGISTRY.collect_deltas(), events))
+        current_job.value = -1
+
+
+class InferenceWorkerPool:
+    """
+    Pool de N procesos de inferencia, cada uno con su propio AIEngine y `threads_per_worker`
+    hilos de PyTorch/ONNX Runtime.
+
+    Con lotes pequeños en CPU, un solo proceso con muchos hilos intra-op deja núcleos
+    ociosos; N procesos con pocos hilos cada uno escalan mejor. Los trabajos (rutas de
+    archivos, no píxeles) van por una cola compartida y cada worker decodifica sus
+    imágenes. Los resultados vuelven al proceso principal, que sigue siendo el único
+    que escribe en la DB, el NAS y el índice vectorial.
+
+    Expone analyze_batch / analyze_video como AIEngine, así que BatchProcessor lo usa
+    sin cambios en su pipeline.
+    """
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        workers: int = 2,
+        threads_per_worker: int = 0,
+        report_interval: float = 60.0,
+        start_timeout: float = 600.0
+    ):
+        self.config = config
+        self.workers = max(1, workers)
+        # 0 = repartir los núcleos disponibles entre los workers
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // self.workers)
+        self.report_interval = report_interval
+
+        # spawn: CUDA/OpenMP no sobreviven a fork y cada worker debe cargar sus propios modelos
+        self._ctx = mp.get_context("spawn")
+        self._tasks = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        self._processes: Dict[int, mp.Process] = {}
+
+        self._lock = threading.Lock()
+        self._job_ids = count()
+        self._futures: Dict[int, Future] = {}
+        self._current_jobs: Dict[int, Any] = {} # worker_id -> mp.Value con el job en curso (-1 = libre)
+        self._ready = threading.Semaphore(0)
+        self._ready_workers: Set[int] = set()
+        self._last_check = time.monotonic()
+        self._stats: Dict[int, Dict[str, float]] = {}
+        self._last_report = time.monotonic()
+        self._closed = threading.Event()
+
+        for worker_id in range(self.workers):
+            self._spawn(worker_id)
+
+        self._dispatcher = threading.Thread(target=self._dispatch, name="worker-pool-results", daemon=True)
+        self._dispatcher.start()
+
+        logger.info(f"⏳ Esperando {self.workers} workers ({self.threads_per_worker} hilos c/u)...")
+        try:
+            self._wait_ready(start_timeout)
+        except Exception:
+            self.close()
+            raise
+        logger.info(f"✅ Pool de inferencia listo: {self.workers} procesos x {self.threads_per_worker} hilos.")
+
+    def _wait_ready(self, timeout: float):
+        """Espera a que todos los workers carguen sus modelos; falla pronto si alguno muere al arrancar."""
+        deadline = time.monotonic() + timeout
+        ready = 0
+        while ready < self.workers:
+            if self._ready.acquire(timeout=1.0):
+                ready += 1
+                continue
+            if len(self._processes) < self.workers:
+                raise RuntimeError("Un worker de inferencia falló al arrancar (ver log)")
+            if time.monotonic() >= deadline:
+                raise RuntimeError("Los workers de inferencia no arrancaron a tiempo")
+
+    # ------------------------------------------------------------------
+    # Interfaz compatible con AIEngine
+    # ------------------------------------------------------------------
+    def analyze_batch(self, images: List[str], release: bool = False) -> List[Dict[str, Any]]:
+        """Analiza un lote de rutas en el siguiente worker libre. `release` se ignora (no hay píxeles compartidos)."""
+        return self._submit("batch", [str(path) for path in images]).result()
+
+    def analyze_image(self, image: str, release: bool = False) -> Dict[str, Any]:
+        return self.analyze_batch([image])[0]
+
+    def analyze_video(self, video_path: str) -> Dict[str, Any]:
+        return self._submit("video", str(video_path)).result()
+
+    # ------------------------------------------------------------------
+    # Estadísticas
+    # ------------------------------------------------------------------
+    def stats(self) -> Dict[int, Dict[str, float]]:
+        """Por worker: trabajos, archivos, segundos ocupados y archivos/s mientras estuvo ocupado."""
+        with self._lock:
+            report = {}
+            for worker_id, stats in sorted(self._stats.items()):
+                busy = stats["busy_seconds"]
+                report[worker_id] = {**stats, "items_per_second": stats["items"] / busy if busy > 0 else 0.0}
+            return report
+
+    def busy_seconds(self) -> float:
+        """Segundos de cómputo acumulados entre todos los workers (sin la espera en la cola)."""
+        with self._lock:
+            return sum(stats["busy_seconds"] for stats in self._stats.values())
+
+    def log_stats(self):
+        for worker_id, stats in self.stats().items():
+            logger.info(
+                f"📈 Worker {worker_id}: {int(stats['items'])} archivos en {int(stats['jobs'])} lotes, "
+                f"{stats['items_per_second']:.2f} archivos/s ({stats['busy_seconds']:.1f}s ocupado)"
+            )
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+    def close(self, timeout: float = 30.0):
+        """Detiene los workers (terminan su trabajo en curso) y reporta el rendimiento final."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes.values():
+            process.join(timeout=timeout)
+            if process.is_alive():
+                process.terminate()
+        self._dispatcher.join(timeout=5)
+        self.log_stats()
+        with self._lock:
+            for future in self._futures.values():
+                future.set_exception(RuntimeError("Pool de inferencia cerrado"))
+            self._futures.clear()
+
+    def __enter__(self) -> "InferenceWorkerPool":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _spawn(self, worker_id: int):
+        current_job = self._ctx.Value("q", -1, lock=False)
+        self._current_jobs[worker_id] = current_job
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self.config, self.threads_per_worker, self._tasks, self._results, current_job),
+            name=f"wildindex-worker-{worker_id}",
+            daemon=True
+        )
+        process.start()
+        self._processes[worker_id] = process
+
+    def _submit(self, kind: str, payload: Any) -> Future:
+        if self._closed.is_set():
+            raise RuntimeError("Pool de inferencia cerrado")
+        future: Future = Future()
+        with self._lock:
+            job_id = next(self._job_ids)
+            self._futures[job_id] = future
+        self._tasks.put((job_id, kind, payload, PROFILER.active))
+        return future
+
+    def _dispatch(self):
+        """Hilo que recibe resultados de los workers y vigila que sigan vivos."""
+        while not self._closed.is_set() or any(p.is_alive() for p in self._processes.values()):
+            if time.monotonic() - self._last_check >= 2.0:
+                self._last_check = time.monotonic()
+                self._check_workers()
+            try:
+                kind, job_id, worker_id, payload, elapsed, deltas, events = self._results.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            REGISTRY.merge(deltas)
+            PROFILER.add_events(events)
+
+            if kind == _READY:
+                if worker_id not in self._ready_workers:
+                    self._ready_workers.add(worker_id)
+                    self._ready.release()
+                continue
+
+            with self._lock:
+                future = self._futures.pop(job_id, None)
+                self._record(worker_id, payload if kind == _DONE else None, elapsed)
+
+            if future is None:
+                continue
+            if kind == _DONE:
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(payload))
+
+            if time.monotonic() - self._last_report >= self.report_interval:
+                self._last_report = time.monotonic()
+                self.log_stats()
+
+    def _record(self, worker_id: int, output: Any, elapsed: float):
+        # Lote -> una entrada por archivo; video -> un archivo; fallo -> ninguno
+        items = len(output) if isinstance(output, list) else int(output is not None)
+        stats = self._stats.setdefault(worker_id, {"jobs": 0, "items": 0, "busy_seconds": 0.0})
+        stats["jobs"] += 1
+        stats["items"] += items
+        stats["busy_seconds"] += elapsed
+
+    def _check_workers(self):
+        """Si un worker murió (ej. OOM), falla su trabajo en curso y lo reemplaza."""
+        if self._closed.is_set():
+            return
+        for worker_id, process in list(self._processes.items()):
+            if process.is_alive():
+                continue
+            if worker_id not in self._ready_workers:
+                # Falló al cargar los modelos: reiniciarlo solo repetiría el error
+                logger.error(f"❌ Worker {worker_id} terminó antes de estar listo (código {process.exitcode}).")
+                self._processes.pop(worker_id)
+                continue
+            logger.error(f"💥 Worker {worker_id} terminó inesperadamente (código {process.exitcode}). Reiniciando...")
+            ERRORS_TOTAL.labels("worker_crash").inc()
+            job_id = self._current_jobs[worker_id].value
+            with self._lock:
+                future = self._futures.pop(job_id, None)
+            if future is not None:
+                future.set_exception(RuntimeError(f"El worker {worker_id} terminó durante el trabajo"))
+            self._spawn(worker_id)
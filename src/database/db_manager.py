@@ -1,24 +1,122 @@
 import sqlite3
+import json
 import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Tuple
+
+from src.core.metrics import ERRORS_TOTAL, OPERATION_SECONDS
 
 logger = logging.getLogger("WildIndex.DB")
 
+# Límite conservador de parámetros por sentencia (SQLite < 3.32 solo admite 999)
+SQL_CHUNK_SIZE = 500
+
+
+def _chunks(items: List[Any], size: int = SQL_CHUNK_SIZE) -> Iterable[List[Any]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+@lru_cache(maxsize=64)
+def _upsert_sql(keys: Tuple[str, ...]) -> str:
+    """SQL de upsert para un conjunto de columnas (texto estable -> sentencia cacheada por sqlite3)."""
+    placeholders = ",".join(["?"] * len(keys))
+    updates = ",".join([f"{k}=excluded.{k}" for k in keys])
+    return f"""
+        INSERT INTO processed_images ({",".join(keys)}) 
+        VALUES ({placeholders}) 
+        ON CONFLICT(id) DO UPDATE SET {updates}, updated_at=CURRENT_TIMESTAMP;
+        """
+
+
 class DatabaseManager:
-    def __init__(self, db_path: str):
+    def __init__(
+        self,
+        db_path: str,
+        persistent: bool = True,
+        flush_size: int = 200,
+        flush_interval: float = 2.0,
+        pool_size: int = 8
+    ):
+        """
+        persistent: reutiliza conexiones de un pool (PRAGMAs una sola vez, sentencias cacheadas).
+        flush_size / flush_interval: umbrales del buffer de queue_upsert (registros / segundos).
+        pool_size: máximo de conexiones abiertas a la vez; con todas prestadas, se espera turno.
+        """
         self.db_path = db_path
+        self.persistent = persistent
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.pool_size = max(1, pool_size)
+
+        # Pool acotado en vez de una conexión por hilo: los hilos del pipeline, el heartbeat
+        # de leases y los del endpoint de métricas son efímeros y dejarían su conexión abierta
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+
+        self._buffer: List[Tuple[Dict[str, Any], Optional[List[Dict[str, Any]]]]] = []
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
         self._init_db()
 
-    def _get_connection(self):
+    def _connect(self) -> sqlite3.Connection:
         """Crea una conexión a la base de datos con WAL mode habilitado."""
-        conn = sqlite3.connect(self.db_path)
+        # check_same_thread=False: las conexiones del pool pasan de un hilo a otro (nunca dos a la vez)
+        conn = sqlite3.connect(self.db_path, cached_statements=256, check_same_thread=not self.persistent)
         conn.row_factory = sqlite3.Row
         # Habilitar Write-Ahead Logging para mejor concurrencia y velocidad
         conn.execute("PRAGMA journal_mode=WAL;")
         conn.execute("PRAGMA synchronous=NORMAL;")
         return conn
 
+    @contextmanager
+    def _get_connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Presta una conexión del pool durante el bloque `with` (o una nueva, cerrada al salir,
+        si el modo persistente está desactivado). Commit al salir, rollback si hubo excepción.
+        """
+        if not self.persistent:
+            conn = self._connect()
+            try:
+                with conn:
+                    yield conn
+            finally:
+                conn.close()
+            return
+
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+                with self._connections_lock:
+                    self._connections.append(conn)
+            try:
+                with conn:
+                    yield conn
+            finally:
+                self._idle.put(conn)
+
+    def close(self):
+        """Vacía el buffer pendiente y cierra todas las conexiones del pool."""
+        self.flush()
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+            self._idle = queue.LifoQueue()
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception as e:
+                logger.debug(f"Error cerrando conexión: {e}")
+
     def _init_db(self):
         """Inicializa el esquema de la base de datos si no existe."""
         Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
@@ -58,32 +156,237 @@ class DatabaseManager:
         CREATE INDEX IF NOT EXISTS idx_file_hash ON processed_images(file_hash);
         CREATE INDEX IF NOT EXISTS idx_status ON processed_images(status);
         CREATE INDEX IF NOT EXISTS idx_md_category ON processed_images(md_category);
+
+        -- Galería del dashboard (src/ui/queries.py): un índice por combinación de filtros,
+        -- en el orden de la paginación por cursor y con md_confidence para filtrar sin
+        -- leer la tabla. Parciales: la galería solo muestra filas PROCESSED
+        CREATE INDEX IF NOT EXISTS idx_gallery
+            ON processed_images(capture_timestamp, id, md_confidence) WHERE status = 'PROCESSED';
+        CREATE INDEX IF NOT EXISTS idx_gallery_category
+            ON processed_images(md_category, capture_timestamp, id, md_confidence) WHERE status = 'PROCESSED';
+        CREATE INDEX IF NOT EXISTS idx_gallery_species
+            ON processed_images(species_common, capture_timestamp, id, md_confidence) WHERE status = 'PROCESSED';
+        -- MAX(updated_at) en O(log n): versión de los datos para invalidar la caché del dashboard
+        CREATE INDEX IF NOT EXISTS idx_updated_at ON processed_images(updated_at);
+
+        -- Índice de archivos por ruta: permite saltar archivos sin cambios sin leerlos
+        CREATE TABLE IF NOT EXISTS file_index (
+            path TEXT PRIMARY KEY,
+            file_size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            inode INTEGER NOT NULL,
+            file_hash TEXT NOT NULL,
+            indexed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_file_index_hash ON file_index(file_hash);
+
+        -- Detecciones individuales por imagen (manadas, varias especies en un frame)
+        CREATE TABLE IF NOT EXISTS detections (
+            file_hash TEXT NOT NULL,
+            det_index INTEGER NOT NULL, -- 0 = mayor confianza
+            category TEXT,
+            confidence REAL,
+            bbox TEXT, -- JSON [xmin, ymin, xmax, ymax] en píxeles
+            species_common TEXT,
+            species_scientific TEXT,
+            species_confidence REAL,
+            PRIMARY KEY (file_hash, det_index)
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_detections_species ON detections(species_common);
+
+        -- Mapeo vector_id (FAISS) -> file_hash; indexed=1 cuando el vector está en el .faiss guardado
+        CREATE TABLE IF NOT EXISTS embeddings (
+            vector_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_hash TEXT UNIQUE NOT NULL,
+            indexed INTEGER DEFAULT 0,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
         """
         
         try:
             with self._get_connection() as conn:
                 conn.executescript(schema)
+                self._migrate(conn)
             logger.info(f"✅ Base de datos inicializada en: {self.db_path}")
         except Exception as e:
             logger.error(f"❌ Error inicializando DB: {e}")
             raise
 
+    # Columnas añadidas después del esquema original: se agregan a DBs existentes al arrancar
+    MIGRATIONS = {
+        "processed_images": {
+            "detection_count": "INTEGER",
+            # Cola de trabajo (filas PENDING): quién tiene el lease y hasta cuándo (epoch)
+            "lease_owner": "TEXT",
+            "lease_expires_at": "REAL",
+            "attempts": "INTEGER DEFAULT 0",
+            "priority": "INTEGER DEFAULT 0",
+            # Copia materializada en la carpeta de salida (NAS o fallback local)
+            "output_path": "TEXT",
+            # Frame de ráfaga cuyo resultado se reutilizó (file_hash de la referencia)
+            "sequence_ref": "TEXT",
+            # Miniatura WebP en la caché local (dashboard)
+            "thumbnail_path": "TEXT",
+            # Captura (EXIF en bloque; mtime si no hay fecha EXIF). capture_epoch es la hora
+            # de pared de la cámara codificada como UTC, para rangos por fecha y estación
+            "capture_epoch": "REAL",
+            "capture_date": "TEXT",
+            "camera_serial": "TEXT",
+            "station_id": "TEXT",
+            "capture_source": "TEXT", # 'exif' | 'mtime' | 'missing' (backfill sin archivo)
+        },
+        "detections": {
+            # Recorte WebP del animal en la caché de miniaturas
+            "crop_path": "TEXT",
+        },
+        "file_index": {
+            # Identidad rápida (tamaño + cabecera/cola) para reutilizar hashes sin releer
+            "quick_id": "TEXT",
+        },
+        "embeddings": {
+            # Embedding float32 normalizado: el .faiss se reconstruye desde aquí tras un crash
+            "vector": "BLOB",
+        },
+    }
+
+    # Índices sobre columnas migradas (se crean después de los ALTER TABLE)
+    MIGRATION_INDEXES = [
+        # Índice parcial: solo las filas en cola, ordenadas como las reclama claim_batch
+        "CREATE INDEX IF NOT EXISTS idx_file_index_quick ON file_index(file_size, quick_id)",
+        "CREATE INDEX IF NOT EXISTS idx_queue ON processed_images(status, priority DESC, created_at) WHERE status = 'PENDING'",
+        "CREATE INDEX IF NOT EXISTS idx_sequence_ref ON processed_images(sequence_ref) WHERE sequence_ref IS NOT NULL",
+        # Rangos de tiempo: global, por estación, por cámara y por día
+        "CREATE INDEX IF NOT EXISTS idx_capture_epoch ON processed_images(capture_epoch)",
+        "CREATE INDEX IF NOT EXISTS idx_station_time ON processed_images(station_id, capture_epoch)",
+        "CREATE INDEX IF NOT EXISTS idx_camera_time ON processed_images(camera_serial, capture_epoch) WHERE camera_serial IS NOT NULL",
+        "CREATE INDEX IF NOT EXISTS idx_capture_date ON processed_images(capture_date, station_id)",
+        # Backfill reanudable: solo las filas procesadas que aún no tienen datos de captura
+        "CREATE INDEX IF NOT EXISTS idx_capture_backfill ON processed_images(id) WHERE status = 'PROCESSED' AND capture_source IS NULL",
+        # Vectores aún no guardados en el .faiss (se reinsertan al arrancar)
+        "CREATE INDEX IF NOT EXISTS idx_embeddings_unindexed ON embeddings(vector_id) WHERE indexed = 0",
+    ]
+
+    def _migrate(self, conn: sqlite3.Connection):
+        """Añade columnas nuevas a tablas existentes (ALTER TABLE idempotente)."""
+        for table, columns in self.MIGRATIONS.items():
+            existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+            for column, column_type in columns.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+                    logger.info(f"🛠️  Migración: {table}.{column} añadida")
+        for statement in self.MIGRATION_INDEXES:
+            conn.execute(statement)
+
     def upsert_image(self, image_data: Dict[str, Any]):
         """Inserta o actualiza un registro de imagen."""
-        keys = list(image_data.keys())
+        keys = tuple(image_data.keys())
         values = list(image_data.values())
-        placeholders = ",".join(["?"] * len(keys))
-        updates = ",".join([f"{k}=excluded.{k}" for k in keys])
         
-        sql = f"""
-        INSERT INTO processed_images ({",".join(keys)}) 
-        VALUES ({placeholders}) 
-        ON CONFLICT(id) DO UPDATE SET {updates}, updated_at=CURRENT_TIMESTAMP;
+        with self._get_connection() as conn:
+            conn.execute(_upsert_sql(keys), values)
+
+    def upsert_images(
+        self,
+        records: List[Dict[str, Any]],
+        detections: Optional[Dict[str, List[Dict[str, Any]]]] = None
+    ):
         """
-        
+        Inserta o actualiza muchos registros en una sola transacción.
+        Los registros se agrupan por conjunto de columnas y se escriben con executemany.
+        detections: {file_hash: [detección]} reemplaza las detecciones de esas imágenes.
+        """
+        if not records and not detections:
+            return
+
+        groups: Dict[Tuple[str, ...], List[List[Any]]] = {}
+        for record in records:
+            groups.setdefault(tuple(record.keys()), []).append(list(record.values()))
+
         with self._get_connection() as conn:
-            conn.execute(sql, values)
-            conn.commit()
+            for keys, rows in groups.items():
+                conn.executemany(_upsert_sql(keys), rows)
+            if detections:
+                self._write_detections(conn, detections)
+
+    @staticmethod
+    def _write_detections(conn: sqlite3.Connection, detections: Dict[str, List[Dict[str, Any]]]):
+        hashes = list(detections.keys())
+        for chunk in _chunks(hashes):
+            placeholders = ",".join(["?"] * len(chunk))
+            conn.execute(f"DELETE FROM detections WHERE file_hash IN ({placeholders})", chunk)
+
+        rows = [
+            (
+                file_hash,
+                det_index,
+                det.get("category"),
+                det.get("confidence"),
+                json.dumps(det.get("bbox")) if det.get("bbox") else None,
+                det.get("species_common"),
+                det.get("species_scientific"),
+                det.get("species_confidence"),
+                det.get("crop_path"),
+            )
+            for file_hash, dets in detections.items()
+            for det_index, det in enumerate(dets)
+        ]
+        conn.executemany(
+            """
+            INSERT INTO detections (file_hash, det_index, category, confidence, bbox,
+                                    species_common, species_scientific, species_confidence, crop_path)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            rows
+        )
+
+    def get_detections(self, file_hash: str) -> List[Dict[str, Any]]:
+        """Detecciones individuales de una imagen, ordenadas por confianza."""
+        with self._get_connection() as conn:
+            cursor = conn.execute(
+                "SELECT * FROM detections WHERE file_hash = ? ORDER BY det_index", (file_hash,)
+            )
+            return [dict(row) for row in cursor.fetchall()]
+
+    def queue_upsert(self, image_data: Dict[str, Any], detections: Optional[List[Dict[str, Any]]] = None):
+        """
+        Encola un upsert en el buffer de escritura. Se vuelca en bloque (una transacción)
+        al alcanzar `flush_size` registros o `flush_interval` segundos desde el último volcado.
+        Si se pasan `detections`, reemplazan las detecciones guardadas de esa imagen.
+        Llamar a flush() al terminar un lote para que el checkpoint vea el estado final.
+        """
+        with self._buffer_lock:
+            self._buffer.append((image_data, detections))
+            due = (
+                len(self._buffer) >= self.flush_size
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Escribe en la DB todos los registros encolados."""
+        with self._flush_lock:
+            with self._buffer_lock:
+                records, self._buffer = self._buffer, []
+                self._last_flush = time.monotonic()
+            if not records:
+                return
+            try:
+                with OPERATION_SECONDS.labels("db_flush").time():
+                    self.upsert_images(
+                        [record for record, _ in records],
+                        {record["file_hash"]: dets for record, dets in records if dets is not None}
+                    )
+                logger.debug(f"💾 {len(records)} registros volcados a la DB.")
+            except Exception as e:
+                logger.error(f"❌ Error volcando {len(records)} registros a la DB: {e}")
+                ERRORS_TOTAL.labels("db_flush").inc()
+                # Devolver al buffer para no perderlos; se reintentará en el próximo volcado
+                with self._buffer_lock:
+                    self._buffer[:0] = records
+                raise
 
     def get_image_by_hash(self, file_hash: str) -> Optional[Dict[str, Any]]:
         """Busca una imagen por su hash para evitar reprocesamiento."""
@@ -93,7 +396,372 @@ class DatabaseManager:
             return dict(row) if row else None
 
     def get_pending_images(self, limit: int = 100) -> List[Dict[str, Any]]:
-        """Obtiene un lote de imágenes pendientes (si implementamos cola en DB)."""
+        """Obtiene un lote de imágenes pendientes (solo lectura; para procesarlas usar claim_batch)."""
         with self._get_connection() as conn:
             cursor = conn.execute("SELECT * FROM processed_images WHERE status = 'PENDING' LIMIT ?", (limit,))
             return [dict(row) for row in cursor.fetchall()]
+
+    # ------------------------------------------------------------------
+    # Cola de trabajo (filas PENDING con lease)
+    # ------------------------------------------------------------------
+    def enqueue(self, items: List[Tuple[str, str]], priority: int = 0) -> int:
+        """
+        Encola archivos como filas PENDING: items = [(original_path, file_hash)].
+        Los PROCESSED y los ya encolados no se tocan; los ERROR vuelven a la cola.
+        Retorna cuántas filas se encolaron.
+        """
+        if not items:
+            return 0
+        sql = """
+        INSERT INTO processed_images (id, file_hash, original_path, file_name, status, priority, attempts)
+        VALUES (?, ?, ?, ?, 'PENDING', ?, 0)
+        ON CONFLICT(id) DO UPDATE SET
+            status='PENDING',
+            original_path=excluded.original_path,
+            file_name=excluded.file_name,
+            priority=excluded.priority,
+            attempts=0,
+            lease_owner=NULL,
+            lease_expires_at=NULL,
+            error_message=NULL,
+            updated_at=CURRENT_TIMESTAMP
+        WHERE processed_images.status = 'ERROR';
+        """
+        rows = [(file_hash, file_hash, path, Path(path).name, priority) for path, file_hash in items]
+        with self._get_connection() as conn:
+            before = conn.total_changes
+            conn.executemany(sql, rows)
+            return conn.total_changes - before
+
+    def claim_batch(
+        self,
+        owner: str,
+        limit: int,
+        lease_seconds: float = 900.0,
+        max_attempts: int = 3
+    ) -> List[Dict[str, Any]]:
+        """
+        Reclama de forma atómica hasta `limit` filas PENDING libres (sin lease o con el
+        lease vencido) para `owner`. Retorna [{id, file_hash, original_path, attempts}].
+
+        Un lease vencido significa que su dueño murió a mitad del trabajo: la fila vuelve
+        a estar disponible. Tras `max_attempts` leases vencidos pasa a ERROR para no
+        bloquear la cola con un archivo que tumba al worker.
+        """
+        start = time.perf_counter()
+        now = time.time()
+        with self._get_connection() as conn:
+            conn.execute(
+                """
+                UPDATE processed_images
+                SET status='ERROR', error_message='Lease vencido demasiadas veces', lease_owner=NULL,
+                    lease_expires_at=NULL, updated_at=CURRENT_TIMESTAMP
+                WHERE status = 'PENDING' AND attempts >= ? AND lease_expires_at < ?
+                """,
+                (max_attempts, now)
+            )
+
+            params = (owner, now + lease_seconds, now, limit)
+            if sqlite3.sqlite_version_info >= (3, 35, 0):
+                cursor = conn.execute(
+                    """
+                    UPDATE processed_images
+                    SET lease_owner=?, lease_expires_at=?, attempts=attempts+1
+                    WHERE id IN (
+                        SELECT id FROM processed_images
+                        WHERE status = 'PENDING' AND (lease_expires_at IS NULL OR lease_expires_at < ?)
+                        ORDER BY priority DESC, created_at
+                        LIMIT ?
+                    )
+                    RETURNING id, file_hash, original_path, attempts
+                    """,
+                    params
+                )
+                claimed = [dict(row) for row in cursor.fetchall()]
+            else:
+                claimed = self._claim_batch_legacy(conn, *params)
+        OPERATION_SECONDS.labels("db_claim").observe(time.perf_counter() - start)
+        return claimed
+
+    @staticmethod
+    def _claim_batch_legacy(conn: sqlite3.Connection, owner: str, expires_at: float, now: float, limit: int):
+        """SQLite < 3.35 (sin RETURNING): SELECT + UPDATE bajo el mismo lock de escritura."""
+        rows = conn.execute(
+            """
+            SELECT id FROM processed_images
+            WHERE status = 'PENDING' AND (lease_expires_at IS NULL OR lease_expires_at < ?)
+            ORDER BY priority DESC, created_at
+            LIMIT ?
+            """,
+            (now, limit)
+        ).fetchall()
+        ids = [row["id"] for row in rows]
+        if not ids:
+            return []
+        placeholders = ",".join(["?"] * len(ids))
+        conn.execute(
+            f"UPDATE processed_images SET lease_owner=?, lease_expires_at=?, attempts=attempts+1 WHERE id IN ({placeholders})",
+            [owner, expires_at, *ids]
+        )
+        cursor = conn.execute(
+            f"SELECT id, file_hash, original_path, attempts FROM processed_images WHERE id IN ({placeholders})",
+            ids
+        )
+        return [dict(row) for row in cursor.fetchall()]
+
+    def extend_leases(self, owner: str, ids: List[str], lease_seconds: float = 900.0) -> int:
+        """Renueva los leases de `owner` que siguen en curso (heartbeat de lotes largos)."""
+        if not ids:
+            return 0
+        expires_at = time.time() + lease_seconds
+        renewed = 0
+        with self._get_connection() as conn:
+            for chunk in _chunks(ids):
+                placeholders = ",".join(["?"] * len(chunk))
+                cursor = conn.execute(
+                    f"""
+                    UPDATE processed_images SET lease_expires_at=?
+                    WHERE lease_owner=? AND status='PENDING' AND id IN ({placeholders})
+                    """,
+                    [expires_at, owner, *chunk]
+                )
+                renewed += cursor.rowcount
+        return renewed
+
+    def release_leases(self, owner: str) -> int:
+        """Devuelve a la cola las filas PENDING de `owner` (apagado limpio)."""
+        with self._get_connection() as conn:
+            cursor = conn.execute(
+                """
+                UPDATE processed_images
+                SET lease_owner=NULL, lease_expires_at=NULL, attempts=MAX(attempts - 1, 0)
+                WHERE lease_owner=? AND status='PENDING'
+                """,
+                (owner,)
+            )
+            return cursor.rowcount
+
+    def queue_depth(self) -> Dict[str, int]:
+        """Profundidad de la cola: {'ready': disponibles, 'leased': en curso, 'total': PENDING}."""
+        with self._get_connection() as conn:
+            row = conn.execute(
+                """
+                SELECT COUNT(*) AS total,
+                       COALESCE(SUM(lease_expires_at >= ?), 0) AS leased
+                FROM processed_images WHERE status = 'PENDING'
+                """,
+                (time.time(),)
+            ).fetchone()
+        return {"ready": row["total"] - row["leased"], "leased": row["leased"], "total": row["total"]}
+
+    # Columnas de captura que escribe update_capture_info (ver capture_info.capture_info)
+    CAPTURE_COLUMNS = (
+        "capture_timestamp", "capture_epoch", "capture_date", "camera_serial", "station_id", "capture_source"
+    )
+
+    def get_missing_capture(self, after_id: str = "", limit: int = 500) -> List[Dict[str, Any]]:
+        """
+        Filas PROCESSED sin datos de captura, por id ascendente a partir de `after_id`
+        (paginación por cursor sobre idx_capture_backfill, para el backfill reanudable).
+        """
+        with self._get_connection() as conn:
+            cursor = conn.execute(
+                """
+                SELECT id, original_path, output_path FROM processed_images
+                INDEXED BY idx_capture_backfill -- sin ANALYZE el planner elige idx_status + ordenación
+                WHERE status = 'PROCESSED' AND capture_source IS NULL AND id > ?
+                ORDER BY id LIMIT ?
+                """,
+                (after_id, limit)
+            )
+            return [dict(row) for row in cursor.fetchall()]
+
+    def update_capture_info(self, updates: Dict[str, Dict[str, Any]]):
+        """
+        Escribe en una transacción las columnas de captura: {id: {columna: valor}}.
+        Las columnas ausentes o None conservan su valor actual.
+        """
+        if not updates:
+            return
+        assignments = ", ".join(f"{column}=COALESCE(?, {column})" for column in self.CAPTURE_COLUMNS)
+        rows = [
+            [info.get(column) for column in self.CAPTURE_COLUMNS] + [image_id]
+            for image_id, info in updates.items()
+        ]
+        with self._get_connection() as conn:
+            conn.executemany(
+                f"UPDATE processed_images SET {assignments}, updated_at=CURRENT_TIMESTAMP WHERE id=?",
+                rows
+            )
+
+    def get_images_by_hashes(self, file_hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Busca en bloque varias imágenes por hash. Retorna {file_hash: {id, file_hash, status}}."""
+        found = {}
+        if not file_hashes:
+            return found
+        with self._get_connection() as conn:
+            for chunk in _chunks(list(set(file_hashes))):
+                placeholders = ",".join(["?"] * len(chunk))
+                cursor = conn.execute(
+                    f"SELECT id, file_hash, status FROM processed_images WHERE file_hash IN ({placeholders})",
+                    chunk
+                )
+                for row in cursor.fetchall():
+                    found[row["file_hash"]] = dict(row)
+        return found
+
+    def get_index_entries(self, paths: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Obtiene en bloque las entradas del índice de archivos para las rutas dadas,
+        junto con el estado de procesamiento del hash asociado (None si no hay registro).
+        """
+        found = {}
+        if not paths:
+            return found
+        with self._get_connection() as conn:
+            for chunk in _chunks(paths):
+                placeholders = ",".join(["?"] * len(chunk))
+                cursor = conn.execute(
+                    f"""
+                    SELECT f.path, f.file_size, f.mtime_ns, f.inode, f.file_hash, f.quick_id, p.status
+                    FROM file_index f
+                    LEFT JOIN processed_images p ON p.file_hash = f.file_hash
+                    WHERE f.path IN ({placeholders})
+                    """,
+                    chunk
+                )
+                for row in cursor.fetchall():
+                    found[row["path"]] = dict(row)
+        return found
+
+    def get_hashes_by_quick_ids(self, identities: List[Tuple[int, str]]) -> Dict[Tuple[int, str], List[Dict[str, Any]]]:
+        """
+        Busca en el índice entradas con las mismas identidades rápidas (file_size, quick_id),
+        aunque estén en otra ruta (candidatas a archivo movido o renombrado).
+        Retorna {(size, quick_id): [{path, mtime_ns, inode, file_hash}]}.
+        """
+        found: Dict[Tuple[int, str], List[Dict[str, Any]]] = {}
+        identities = list(set(identities))
+        if not identities:
+            return found
+        with self._get_connection() as conn:
+            # 2 parámetros por identidad
+            for chunk in _chunks(identities, SQL_CHUNK_SIZE // 2):
+                conditions = " OR ".join(["(file_size = ? AND quick_id = ?)"] * len(chunk))
+                cursor = conn.execute(
+                    f"SELECT file_size, quick_id, path, mtime_ns, inode, file_hash FROM file_index WHERE {conditions}",
+                    [value for identity in chunk for value in identity]
+                )
+                for row in cursor.fetchall():
+                    found.setdefault((row["file_size"], row["quick_id"]), []).append(
+                        {"path": row["path"], "mtime_ns": row["mtime_ns"], "inode": row["inode"], "file_hash": row["file_hash"]}
+                    )
+        return found
+
+    def upsert_index_entries(self, entries: List[Dict[str, Any]]):
+        """Inserta o actualiza entradas del índice de archivos (path, file_size, mtime_ns, inode, file_hash, quick_id)."""
+        if not entries:
+            return
+        sql = """
+        INSERT INTO file_index (path, file_size, mtime_ns, inode, file_hash, quick_id)
+        VALUES (:path, :file_size, :mtime_ns, :inode, :file_hash, :quick_id)
+        ON CONFLICT(path) DO UPDATE SET
+            file_size=excluded.file_size,
+            mtime_ns=excluded.mtime_ns,
+            inode=excluded.inode,
+            file_hash=excluded.file_hash,
+            quick_id=excluded.quick_id,
+            indexed_at=CURRENT_TIMESTAMP;
+        """
+        with self._get_connection() as conn:
+            conn.executemany(sql, entries)
+
+    def assign_vector_ids(self, file_hashes: List[str]) -> Dict[str, Tuple[int, bool]]:
+        """
+        Asigna (o recupera) el vector_id de FAISS para cada hash.
+        Retorna {file_hash: (vector_id, ya_persistido_en_el_indice)}.
+        """
+        if not file_hashes:
+            return {}
+        with self._get_connection() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (file_hash) VALUES (?)",
+                [(h,) for h in set(file_hashes)]
+            )
+            assigned = {}
+            for chunk in _chunks(list(set(file_hashes))):
+                placeholders = ",".join(["?"] * len(chunk))
+                cursor = conn.execute(
+                    f"SELECT vector_id, file_hash, indexed FROM embeddings WHERE file_hash IN ({placeholders})",
+                    chunk
+                )
+                for row in cursor.fetchall():
+                    assigned[row["file_hash"]] = (row["vector_id"], bool(row["indexed"]))
+        return assigned
+
+    def mark_vectors_indexed(self, vector_ids: List[int]):
+        """Marca vectores como persistidos en el archivo del índice FAISS."""
+        if not vector_ids:
+            return
+        with self._get_connection() as conn:
+            conn.executemany("UPDATE embeddings SET indexed = 1 WHERE vector_id = ?", [(v,) for v in vector_ids])
+
+    def store_vectors(self, vectors: List[Tuple[int, bytes]]):
+        """Guarda el embedding (float32 normalizado, en bytes) de cada vector_id."""
+        if not vectors:
+            return
+        with self._get_connection() as conn:
+            conn.executemany("UPDATE embeddings SET vector = ? WHERE vector_id = ?", [(blob, v) for v, blob in vectors])
+
+    def get_vectors(self, after_id: int = 0, limit: int = 5000, unindexed_only: bool = False) -> List[Tuple[int, bytes]]:
+        """
+        Embeddings guardados [(vector_id, bytes)] por vector_id ascendente a partir de
+        `after_id` (paginación por cursor). unindexed_only: solo los que aún no están en el .faiss.
+        """
+        condition = "AND indexed = 0" if unindexed_only else ""
+        with self._get_connection() as conn:
+            cursor = conn.execute(
+                f"""
+                SELECT vector_id, vector FROM embeddings
+                WHERE vector IS NOT NULL AND vector_id > ? {condition}
+                ORDER BY vector_id LIMIT ?
+                """,
+                (after_id, limit)
+            )
+            return [(row["vector_id"], row["vector"]) for row in cursor.fetchall()]
+
+    def get_embeddings_without_vector(self, after_id: int = 0, limit: int = 500) -> List[Dict[str, Any]]:
+        """Embeddings sin vector guardado (anteriores a la columna o perdidos), con las rutas de su imagen."""
+        with self._get_connection() as conn:
+            cursor = conn.execute(
+                """
+                SELECT e.vector_id, e.file_hash, e.indexed, p.original_path, p.output_path
+                FROM embeddings e LEFT JOIN processed_images p ON p.file_hash = e.file_hash
+                WHERE e.vector IS NULL AND e.vector_id > ?
+                ORDER BY e.vector_id LIMIT ?
+                """,
+                (after_id, limit)
+            )
+            return [dict(row) for row in cursor.fetchall()]
+
+    def count_unrecoverable_vectors(self) -> int:
+        """Vectores que no están en el .faiss y tampoco tienen embedding guardado (requieren re-embed)."""
+        with self._get_connection() as conn:
+            row = conn.execute("SELECT COUNT(*) FROM embeddings WHERE indexed = 0 AND vector IS NULL").fetchone()
+            return row[0]
+
+    def get_hashes_by_vector_ids(self, vector_ids: List[int]) -> Dict[int, str]:
+        """Resuelve vector_id -> file_hash para resultados de búsqueda."""
+        found = {}
+        if not vector_ids:
+            return found
+        with self._get_connection() as conn:
+            for chunk in _chunks(vector_ids):
+                placeholders = ",".join(["?"] * len(chunk))
+                cursor = conn.execute(
+                    f"SELECT vector_id, file_hash FROM embeddings WHERE vector_id IN ({placeholders})",
+                    chunk
+                )
+                for row in cursor.fetchall():
+                    found[row["vector_id"]] = row["file_hash"]
+        return found
@@ -2,13 +2,25 @@ import os
 import time
 import logging
 import sys
+import socket
 from pathlib import Path
+from typing import Dict
 
 from src.database.db_manager import DatabaseManager
 from src.core.checkpoint_manager import CheckpointManager
+from src.core.fingerprint import Fingerprinter
 from src.core.ai_engine import AIEngine
 from src.core.batch_processor import BatchProcessor
 from src.core.metadata_injector import MetadataInjector
+from src.core.metrics import QUEUE_DEPTH, start_http_server
+from src.core.output_writer import OutputWriter
+from src.core.profiling import PROFILER
+from src.core.scheduler import BatchScheduler
+from src.core.sequence_grouper import SequenceGrouper
+from src.core.thumbnails import ThumbnailCache
+from src.core.watcher import FileWatcher
+from src.core.vector_index import VectorIndex
+from src.core.worker_pool import InferenceWorkerPool
 
 # Configuración básica de logging
 logging.basicConfig(
@@ -22,6 +34,17 @@ logging.basicConfig(
 
 logger = logging.getLogger("WildIndex")
 
+# Segundos mínimos entre actualizaciones de wildindex_queue_depth desde el bucle principal
+QUEUE_DEPTH_INTERVAL = 5.0
+
+
+def update_queue_depth(db_manager: DatabaseManager) -> Dict[str, int]:
+    """Consulta la profundidad de la cola y la publica en la métrica QUEUE_DEPTH."""
+    depth = db_manager.queue_depth()
+    QUEUE_DEPTH.labels("ready").set(depth["ready"])
+    QUEUE_DEPTH.labels("leased").set(depth["leased"])
+    return depth
+
 def main():
     logger.info("🚀 Iniciando WildIndex Agent...")
     
@@ -29,6 +52,46 @@ def main():
     input_dir = os.getenv("NAS_INPUT_PATH", "/app/data/input")
     output_dir = os.getenv("NAS_PROCESSED_PATH", "/app/data/processed")
     db_path = os.getenv("DB_PATH", "/app/data/db/wildindex.db")
+
+    # Concurrencia del pipeline (lectura -> inferencia -> escritura)
+    reader_workers = int(os.getenv("READER_WORKERS", "2"))
+    inference_batch_size = int(os.getenv("INFERENCE_BATCH_SIZE", "8"))
+    writer_workers = int(os.getenv("WRITER_WORKERS", "4"))
+    queue_size = int(os.getenv("PIPELINE_QUEUE_SIZE", "16"))
+    # Pool multiproceso de inferencia: 0 = AIEngine en este proceso
+    inference_processes = int(os.getenv("INFERENCE_PROCESSES", "0"))
+    threads_per_worker = int(os.getenv("THREADS_PER_WORKER", "0")) # 0 = núcleos / procesos
+
+    # Ingesta por eventos (inotify / sondeo en NFS) y reconciliación lenta
+    batch_size = int(os.getenv("BATCH_SIZE", "10"))
+    watch_mode = os.getenv("WATCH_MODE", "auto") # auto | inotify | poll
+    watch_poll_interval = float(os.getenv("WATCH_POLL_INTERVAL", "10"))
+    reconcile_interval = float(os.getenv("RECONCILE_INTERVAL", "3600"))
+    lease_seconds = float(os.getenv("QUEUE_LEASE_SECONDS", "900"))
+    # Tamaño de lote adaptativo (BATCH_SIZE es el inicial) y backoff sin trabajo
+    batch_adaptive = os.getenv("BATCH_ADAPTIVE", "true").lower() == "true"
+    batch_size_min = int(os.getenv("BATCH_SIZE_MIN", "1"))
+    batch_size_max = int(os.getenv("BATCH_SIZE_MAX", "1000"))
+    batch_target_seconds = float(os.getenv("BATCH_TARGET_SECONDS", "60"))
+    batch_max_overhead = float(os.getenv("BATCH_MAX_OVERHEAD", "0.1"))
+    batch_min_free_mb = float(os.getenv("BATCH_MIN_FREE_MB", "1024"))
+    idle_wait_min = float(os.getenv("IDLE_WAIT_MIN", "1"))
+    idle_wait_max = float(os.getenv("IDLE_WAIT_MAX", "30"))
+
+    # Endpoint de métricas Prometheus (0 = desactivado)
+    metrics_port = int(os.getenv("METRICS_PORT", "9108"))
+    metrics_address = os.getenv("METRICS_ADDRESS", "127.0.0.1")
+
+    # Perfilado bajo demanda: al arrancar o con `kill -USR1 <pid>`
+    PROFILER.configure(
+        os.getenv("PROFILE_DIR", "/app/logs/profiles"),
+        batches=int(os.getenv("PROFILE_BATCHES", "5")),
+        cprofile=os.getenv("PROFILE_CPROFILE", "false").lower() == "true",
+        torch_profiler=os.getenv("PROFILE_TORCH", "false").lower() == "true"
+    )
+    PROFILER.install_signal_handler()
+    if os.getenv("PROFILE_ENABLED", "false").lower() == "true":
+        PROFILER.request()
     
     logger.info(f"📂 Input: {input_dir}")
     logger.info(f"📂 Output: {output_dir}")
@@ -36,10 +99,78 @@ def main():
 
     # 2. Inicializar Componentes
     try:
-        db_manager = DatabaseManager(db_path)
-        checkpoint_manager = CheckpointManager(db_manager)
-        ai_engine = AIEngine(config={"use_gpu": True}) # Configuración placeholder
-        metadata_injector = MetadataInjector()
+        db_manager = DatabaseManager(
+            db_path,
+            flush_size=int(os.getenv("DB_FLUSH_SIZE", "200")),
+            flush_interval=float(os.getenv("DB_FLUSH_INTERVAL", "2.0")),
+            pool_size=int(os.getenv("DB_POOL_SIZE", "8"))
+        )
+        hash_workers = int(os.getenv("HASH_WORKERS", str(reader_workers)))
+        checkpoint_manager = CheckpointManager(
+            db_manager,
+            hash_workers=hash_workers,
+            fingerprinter=Fingerprinter(
+                workers=hash_workers,
+                use_mmap=os.getenv("HASH_USE_MMAP", "false").lower() == "true"
+            ),
+            reuse_quick_identity=os.getenv("HASH_QUICK_REUSE", "true").lower() == "true"
+        )
+        ai_config = {
+            "use_gpu": True,
+            "video_sample_fps": float(os.getenv("VIDEO_SAMPLE_FPS", "1.0")),
+            "video_max_frames": int(os.getenv("VIDEO_MAX_FRAMES", "120")),
+            "video_early_exit_confidence": float(os.getenv("VIDEO_EARLY_EXIT_CONFIDENCE", "0.8")),
+            "species_list_path": os.getenv("SPECIES_LIST_PATH"),
+            "species_cache_dir": os.getenv("SPECIES_CACHE_DIR", "models/species_cache"),
+            "megadetector_backend": os.getenv("MD_BACKEND", "torch"),
+            "bioclip_backend": os.getenv("BIOCLIP_BACKEND", "torch"),
+            "onnx_dir": os.getenv("ONNX_DIR", "models/onnx"),
+            "onnx_threads": int(os.getenv("ONNX_THREADS", "0"))
+        }
+        if inference_processes > 0:
+            # N procesos con su propio AIEngine; este proceso solo lee, escribe y coordina
+            ai_engine = InferenceWorkerPool(
+                ai_config,
+                workers=inference_processes,
+                threads_per_worker=threads_per_worker
+            )
+            # Dos lotes en vuelo por worker: uno en curso y otro esperando en la cola
+            inference_workers = 2 * inference_processes
+        else:
+            ai_engine = AIEngine(config=ai_config)
+            inference_workers = 1
+        # Una sesión ExifTool por hilo escritor: las escrituras no se serializan entre ellos
+        metadata_injector = MetadataInjector(sessions=writer_workers)
+        # Fecha de captura / serie en bloque: sesión ExifTool propia para no competir con las escrituras
+        exif_reader = MetadataInjector() if os.getenv("EXIF_CAPTURE", "true").lower() == "true" else None
+
+        # Índice vectorial (búsqueda semántica); opcional si faiss no está instalado
+        vector_index = None
+        if os.getenv("VECTOR_INDEX_ENABLED", "true").lower() == "true":
+            try:
+                vector_index = VectorIndex(
+                    os.getenv("VECTOR_INDEX_PATH", str(Path(db_path).with_suffix(".faiss"))),
+                    db_manager
+                )
+            except ImportError:
+                logger.warning("⚠️ faiss no disponible. Continuando sin índice vectorial.")
+        
+        # Ráfagas: frames casi idénticos de la misma carpeta reutilizan el resultado
+        sequence_grouper = None
+        if os.getenv("SEQUENCE_GROUPING", "true").lower() == "true":
+            sequence_grouper = SequenceGrouper(
+                max_gap_seconds=float(os.getenv("SEQUENCE_MAX_GAP", "10")),
+                change_threshold=float(os.getenv("SEQUENCE_CHANGE_THRESHOLD", "0.001"))
+            )
+
+        # Miniaturas WebP para el dashboard (caché local por hash, fuera del NAS)
+        thumbnail_cache = None
+        if os.getenv("THUMBNAILS_ENABLED", "true").lower() == "true":
+            thumbnail_cache = ThumbnailCache(
+                os.getenv("THUMBNAIL_DIR", "/app/data/thumbnails"),
+                size=int(os.getenv("THUMBNAIL_SIZE", "384")),
+                quality=int(os.getenv("THUMBNAIL_QUALITY", "80"))
+            )
         
         processor = BatchProcessor(
             input_dir=input_dir,
@@ -47,7 +178,22 @@ def main():
             db_manager=db_manager,
             checkpoint_manager=checkpoint_manager,
             ai_engine=ai_engine,
-            metadata_injector=metadata_injector
+            metadata_injector=metadata_injector,
+            reader_workers=reader_workers,
+            inference_workers=inference_workers,
+            inference_batch_size=inference_batch_size,
+            writer_workers=writer_workers,
+            queue_size=queue_size,
+            vector_index=vector_index,
+            output_writer=OutputWriter(
+                max_in_flight=int(os.getenv("COPY_MAX_IN_FLIGHT", "4")),
+                verify=os.getenv("COPY_VERIFY", "size"),
+                allow_hardlink=os.getenv("COPY_ALLOW_HARDLINK", "false").lower() == "true"
+            ),
+            sequence_grouper=sequence_grouper,
+            thumbnail_cache=thumbnail_cache,
+            exif_reader=exif_reader,
+            exif_batch_size=int(os.getenv("EXIF_BATCH_SIZE", "32"))
         )
         logger.info("✅ Componentes inicializados correctamente.")
         
@@ -55,17 +201,75 @@ def main():
         logger.critical(f"❌ Error fatal inicializando componentes: {e}")
         sys.exit(1)
 
-    # 3. Bucle Principal (Watchdog)
+    metrics_server = None
+    if metrics_port:
+        try:
+            metrics_server = start_http_server(metrics_port, metrics_address)
+        except OSError as e:
+            logger.warning(f"⚠️ No se pudo abrir el endpoint de métricas en {metrics_address}:{metrics_port}: {e}")
+
+    # 3. Bucle Principal (eventos + reconciliación periódica)
     logger.info("🏁 Iniciando bucle de procesamiento...")
+
+    watcher = FileWatcher(
+        input_dir,
+        processor.supported_extensions,
+        poll_interval=watch_poll_interval,
+        mode=watch_mode
+    )
+    watcher.start()
+
+    # Cola en la DB: el descubrimiento encola filas PENDING y el procesamiento las reclama
+    # con lease, así que varios agentes en el mismo host pueden compartir el backlog
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    next_reconcile = 0.0 # Reconciliar al arrancar para cubrir lo llegado con el agente parado
+    # Profundidad de la cola para las métricas: la actualiza el bucle (no cada scrape)
+    next_depth_update = 0.0
+    scheduler = BatchScheduler(
+        processor.stage_workers,
+        busy_seconds=processor.stage_busy_seconds,
+        batch_size=batch_size,
+        min_batch_size=batch_size_min,
+        max_batch_size=batch_size_max,
+        target_batch_seconds=batch_target_seconds,
+        max_overhead=batch_max_overhead,
+        min_free_mb=batch_min_free_mb,
+        idle_min=idle_wait_min,
+        idle_max=idle_wait_max,
+        adaptive=batch_adaptive
+    )
     
     while True:
         try:
-            # Procesar un lote
-            processor.process_batch(batch_size=10)
-            
-            # Esperar antes del siguiente ciclo para no saturar
-            # En producción, esto podría ser más sofisticado (eventos)
-            time.sleep(5) 
+            if time.monotonic() >= next_reconcile:
+                logger.info("🔁 Reconciliación completa del directorio de entrada...")
+                processor.enqueue(processor.scan_files())
+                next_reconcile = time.monotonic() + reconcile_interval
+                depth = update_queue_depth(db_manager)
+                next_depth_update = time.monotonic() + QUEUE_DEPTH_INTERVAL
+                logger.info(f"📋 Cola: {depth['ready']} disponibles, {depth['leased']} en curso.")
+
+            # Archivos nuevos: prioridad sobre el backlog de la reconciliación
+            new_files = watcher.drain(scheduler.batch_size, timeout=0)
+            if new_files:
+                processor.enqueue(new_files, priority=1)
+
+            # Con backlog, un lote tras otro sin pausa
+            scheduler.batch_started()
+            claimed = processor.process_claimed(owner, scheduler.batch_size, lease_seconds)
+            if claimed:
+                scheduler.batch_finished(claimed)
+            else:
+                # Cola vacía: esperar eventos del watcher con backoff (sin pasar de la reconciliación)
+                wait = min(scheduler.next_idle_wait(), max(0.0, next_reconcile - time.monotonic()))
+                new_files = watcher.drain(scheduler.batch_size, timeout=wait)
+                if new_files:
+                    processor.enqueue(new_files, priority=1)
+                    scheduler.reset_idle()
+
+            if time.monotonic() >= next_depth_update:
+                update_queue_depth(db_manager)
+                next_depth_update = time.monotonic() + QUEUE_DEPTH_INTERVAL
             
         except KeyboardInterrupt:
             logger.info("🛑 Deteniendo agente por solicitud de usuario...")
@@ -74,5 +278,22 @@ def main():
             logger.error(f"❌ Error en bucle principal: {e}")
             time.sleep(10) # Esperar antes de reintentar tras error
 
+    watcher.stop()
+
+    # 4. Apagado limpio
+    if metrics_server is not None:
+        metrics_server.shutdown()
+    released = db_manager.release_leases(owner)
+    if released:
+        logger.info(f"↩️  {released} archivos devueltos a la cola.")
+    if isinstance(ai_engine, InferenceWorkerPool):
+        ai_engine.close()
+    metadata_injector.close()
+    if exif_reader is not None:
+        exif_reader.close()
+    if vector_index is not None:
+        vector_index.close()
+    db_manager.close()
+
 if __name__ == "__main__":
     main()
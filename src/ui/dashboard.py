@@ -1,9 +1,9 @@
 import streamlit as st
-import sqlite3
-import pandas as pd
 import os
 from PIL import Image
 
+from src.ui.queries import data_version, load_crops, load_page, load_species
+
 # Configuración de la página
 st.set_page_config(
     page_title="WildIndex Dashboard",
@@ -15,48 +15,23 @@ st.set_page_config(
 DB_PATH = "/app/data/db/wildindex.db"
 IMAGE_ROOT = "/app/data/processed"
 
-def get_connection():
-    """Conecta a la base de datos SQLite."""
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row # Access columns by name
-        return conn
-    except Exception as e:
-        st.error(f"Error conectando a la DB: {e}")
-        return None
-
-def load_data(limit=100, category=None, min_conf=0.0, species=None):
-    """Carga datos de la base de datos con filtros."""
-    conn = get_connection()
-    if not conn:
-        return pd.DataFrame()
-
-    query = "SELECT * FROM processed_images WHERE 1=1"
-    params = []
-
-    if category and category != "Todos":
-        query += " AND md_category = ?"
-        params.append(category)
-    
-    if min_conf > 0:
-        query += " AND md_confidence >= ?"
-        params.append(min_conf)
-
-    if species and species != "Todos":
-        query += " AND species_common = ?"
-        params.append(species)
-
-    query += " ORDER BY capture_timestamp DESC LIMIT ?"
-    params.append(limit)
-
-    try:
-        df = pd.read_sql_query(query, conn, params=params)
-    except Exception as e:
-        st.error(f"Error ejecutando query: {e}")
-        df = pd.DataFrame()
-        
-    conn.close()
-    return df
+def find_original(row):
+    """Ruta del original procesado (solo cuando el usuario lo pide: lectura del NAS)."""
+    if row.get('output_path') and os.path.exists(row['output_path']):
+        return row['output_path']
+    # Registros anteriores a output_path: buscar en NAS y Fallback
+    for root in [IMAGE_ROOT, "/app/data/processed_local"]:
+        candidate = os.path.join(root, row['md_category'], row['file_name'])
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+# Versión de los datos: las consultas cacheadas se invalidan cuando el agente escribe
+try:
+    version = data_version(DB_PATH)
+except Exception as e:
+    st.error(f"Error conectando a la DB: {e}")
+    st.stop()
 
 # --- Sidebar ---
 st.sidebar.title("🦁 WildIndex")
@@ -71,11 +46,7 @@ category_filter = st.sidebar.selectbox(
 # Filtro de Especie (Dinámico)
 species_list = ["Todos"]
 try:
-    conn = get_connection()
-    if conn:
-        cursor = conn.execute("SELECT DISTINCT species_common FROM processed_images WHERE species_common IS NOT NULL ORDER BY species_common")
-        species_list += [row[0] for row in cursor.fetchall()]
-        conn.close()
+    species_list += load_species(DB_PATH, version)
 except Exception as e:
     st.sidebar.warning(f"No se pudieron cargar especies: {e}")
 
@@ -90,75 +61,99 @@ conf_filter = st.sidebar.slider(
     step=0.05
 )
 
-# Límite de imágenes
-limit_filter = st.sidebar.number_input("Límite de imágenes", min_value=10, max_value=1000, value=50)
+# Tamaño de página (paginación por cursor)
+page_size = st.sidebar.number_input("Imágenes por página", min_value=10, max_value=200, value=50)
 
 if st.sidebar.button("🔄 Actualizar"):
     st.rerun()
 
+# Paginación: pila de cursores de las páginas visitadas; se reinicia al cambiar filtros
+filters = (category_filter, species_filter, conf_filter, page_size)
+if st.session_state.get("filters") != filters:
+    st.session_state["filters"] = filters
+    st.session_state["cursors"] = [None]
+cursors = st.session_state["cursors"]
+
 # --- Main Content ---
 st.title("📸 Galería de Imágenes")
 
 # Cargar datos
-df = load_data(limit=limit_filter, category=category_filter, min_conf=conf_filter, species=species_filter)
+try:
+    df, next_cursor = load_page(
+        DB_PATH,
+        version,
+        category=None if category_filter == "Todos" else category_filter,
+        species=None if species_filter == "Todos" else species_filter,
+        min_conf=conf_filter,
+        cursor=cursors[-1],
+        page_size=int(page_size)
+    )
+except Exception as e:
+    st.error(f"Error ejecutando query: {e}")
+    st.stop()
 
 if df.empty:
     st.info("No se encontraron imágenes con los filtros seleccionados.")
 else:
-    st.write(f"Mostrando las últimas **{len(df)}** imágenes procesadas.")
+    st.write(f"Página **{len(cursors)}**: **{len(df)}** imágenes, de la captura más reciente a la más antigua.")
+
+    # Recortes de animales de las imágenes mostradas (una sola consulta)
+    crops = load_crops(DB_PATH, version, tuple(df['id'].tolist()))
 
-    # Grid de imágenes
+    # Grid de imágenes: solo miniaturas de la caché local; el original se lee bajo demanda
     cols = st.columns(3)
     for idx, row in df.iterrows():
         col = cols[idx % 3]
-        
-        # Construir ruta de la imagen
-        # Intentar deducir la ruta buscando en NAS y Fallback
-        image_path = None
-        found = False
-        
-        # Rutas posibles donde buscar
-        possible_roots = [
-            "/app/data/processed",       # NAS
-            "/app/data/processed_local"  # Fallback Local
-        ]
-        
-        for root in possible_roots:
-            # Intentar ruta: root/category/filename
-            candidate = os.path.join(root, row['md_category'], row['file_name'])
-            if os.path.exists(candidate):
-                image_path = candidate
-                found = True
-                break
-        
+
         with col:
             try:
-                if found and image_path:
-                    img = Image.open(image_path)
-                    st.image(img, use_container_width=True)
-                    
-                    # Metadata
-                    st.caption(f"**{row['file_name']}**")
-                    st.markdown(f"**Categoría:** `{row['md_category']}` ({row['md_confidence']:.2f})")
-                    
-                    # BioCLIP Species
-                    if row.get('species_common'):
-                        conf_str = f"({row['species_confidence']:.2f})" if row.get('species_confidence') else ""
-                        st.markdown(f"🧬 **{row['species_common']}**")
-                        st.caption(f"*{row['species_scientific']}* {conf_str}")
-                    elif row.get('species_prediction'):
-                         st.markdown(f"🧬 **Especie:** {row['species_prediction']}")
-
-                    # LLaVA Caption
-                    if row['llava_caption']:
-                        with st.expander("📝 Descripción LLaVA"):
-                            st.write(row['llava_caption'])
-                        
+                thumbnail_path = row.get('thumbnail_path')
+                if thumbnail_path:
+                    st.image(thumbnail_path, use_container_width=True)
                 else:
-                    st.warning(f"Imagen no encontrada: {row['file_name']}")
+                    st.caption("🖼️ Sin miniatura")
+
+                if st.button("🔍 Ver original", key=f"original_{row['id']}"):
+                    image_path = find_original(row)
+                    if image_path:
+                        st.image(Image.open(image_path), use_container_width=True)
+                    else:
+                        st.warning(f"Imagen no encontrada: {row['file_name']}")
+
+                if crops.get(row['id']):
+                    st.image(crops[row['id']], width=96)
+
+                # Metadata
+                st.caption(f"**{row['file_name']}**")
+                st.markdown(f"**Categoría:** `{row['md_category']}` ({row['md_confidence']:.2f})")
+
+                # BioCLIP Species
+                if row.get('species_common'):
+                    conf_str = f"({row['species_confidence']:.2f})" if row.get('species_confidence') else ""
+                    st.markdown(f"🧬 **{row['species_common']}**")
+                    st.caption(f"*{row['species_scientific']}* {conf_str}")
+                elif row.get('species_prediction'):
+                     st.markdown(f"🧬 **Especie:** {row['species_prediction']}")
+
+                # LLaVA Caption
+                if row['llava_caption']:
+                    with st.expander("📝 Descripción LLaVA"):
+                        st.write(row['llava_caption'])
+
             except Exception as e:
                 st.error(f"Error cargando imagen: {e}")
 
+    # Navegación entre páginas
+    prev_col, _, next_col = st.columns([1, 4, 1])
+    with prev_col:
+        if len(cursors) > 1 and st.button("⬅️ Anterior"):
+            cursors.pop()
+            st.rerun()
+    with next_col:
+        if next_cursor is not None and st.button("Siguiente ➡️"):
+            cursors.append(next_cursor)
+            st.rerun()
+
     # Tabla de datos raw (opcional)
     with st.expander("📊 Ver datos crudos"):
         st.dataframe(df)
@@ -0,0 +1,139 @@
+"""
+Capa de consultas del dashboard.
+
+- Una conexión SQLite por proceso de Streamlit (st.cache_resource), no una por rerun.
+- Solo las columnas que pinta la galería; nunca SELECT *.
+- Paginación por cursor (capture_timestamp, id) sobre los índices idx_gallery*: cada
+  página cuesta lo mismo sea la primera o la número mil, a diferencia de LIMIT/OFFSET.
+- Resultados en st.cache_data con la versión de los datos (MAX(updated_at)) como parte
+  de la clave: en cuanto el agente escribe algo, la siguiente consulta va a la DB.
+"""
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+import streamlit as st
+
+# Columnas que usa la galería
+GALLERY_COLUMNS = [
+    "id", "file_name", "capture_timestamp", "md_category", "md_confidence",
+    "species_common", "species_scientific", "species_confidence", "species_prediction",
+    "llava_caption", "thumbnail_path", "output_path",
+]
+
+# Red de seguridad: updated_at tiene resolución de segundos, así que escrituras en el
+# mismo segundo que una lectura cacheada podrían no cambiar la versión
+CACHE_TTL_SECONDS = 300
+
+Cursor = Optional[Tuple[str, str]]
+
+
+class GalleryDB:
+    """Conexión compartida entre las sesiones del dashboard (serializada con un lock)."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+
+    def fetchall(self, query: str, params: List[Any]) -> List[tuple]:
+        with self.lock:
+            return self.conn.execute(query, params).fetchall()
+
+
+@st.cache_resource
+def get_db(db_path: str) -> GalleryDB:
+    return GalleryDB(db_path)
+
+
+def data_version(db_path: str) -> Optional[str]:
+    """Última modificación de processed_images (búsqueda en idx_updated_at, sin recorrer la tabla)."""
+    rows = get_db(db_path).fetchall("SELECT MAX(updated_at) FROM processed_images", [])
+    return rows[0][0] if rows else None
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, max_entries=256, show_spinner=False)
+def load_page(
+    db_path: str,
+    version: Optional[str],
+    category: Optional[str] = None,
+    species: Optional[str] = None,
+    min_conf: float = 0.0,
+    cursor: Cursor = None,
+    page_size: int = 50
+) -> Tuple[pd.DataFrame, Cursor]:
+    """
+    Una página de la galería, de la captura más reciente a la más antigua.
+    `cursor` es (capture_timestamp, id) de la última fila de la página anterior.
+    Retorna (filas, cursor de la página siguiente o None si no hay más).
+    """
+    query = f"SELECT {', '.join(GALLERY_COLUMNS)} FROM processed_images WHERE status = 'PROCESSED'"
+    params: List[Any] = []
+
+    if category:
+        query += " AND md_category = ?"
+        params.append(category)
+    if species:
+        query += " AND species_common = ?"
+        params.append(species)
+    if min_conf > 0:
+        query += " AND md_confidence >= ?"
+        params.append(min_conf)
+    if cursor is not None:
+        query += " AND (capture_timestamp, id) < (?, ?)"
+        params.extend(cursor)
+
+    # Una fila extra para saber si hay página siguiente
+    query += " ORDER BY capture_timestamp DESC, id DESC LIMIT ?"
+    params.append(page_size + 1)
+
+    rows = get_db(db_path).fetchall(query, params)
+    df = pd.DataFrame(rows[:page_size], columns=GALLERY_COLUMNS)
+    next_cursor = None
+    if len(rows) > page_size:
+        last = rows[page_size - 1]
+        next_cursor = (last[GALLERY_COLUMNS.index("capture_timestamp")], last[0])
+    return df, next_cursor
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def load_species(db_path: str, version: Optional[str]) -> List[str]:
+    """
+    Especies distintas sin recorrer la tabla: CTE recursivo que salta de una especie a la
+    siguiente con búsquedas en idx_gallery_species (una por especie, no una por fila).
+    """
+    rows = get_db(db_path).fetchall(
+        """
+        WITH RECURSIVE species(name) AS (
+            SELECT MIN(species_common) FROM processed_images
+            WHERE status = 'PROCESSED' AND species_common IS NOT NULL
+            UNION ALL
+            SELECT (
+                SELECT MIN(species_common) FROM processed_images
+                WHERE status = 'PROCESSED' AND species_common > species.name
+            )
+            FROM species WHERE species.name IS NOT NULL
+        )
+        SELECT name FROM species WHERE name IS NOT NULL
+        """,
+        []
+    )
+    return [row[0] for row in rows]
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, max_entries=256, show_spinner=False)
+def load_crops(db_path: str, version: Optional[str], ids: Tuple[str, ...]) -> Dict[str, List[str]]:
+    """Recortes WebP de animales por imagen: {id: [rutas]} (una consulta por página)."""
+    if not ids:
+        return {}
+    placeholders = ",".join(["?"] * len(ids))
+    rows = get_db(db_path).fetchall(
+        f"SELECT file_hash, crop_path FROM detections "
+        f"WHERE file_hash IN ({placeholders}) AND crop_path IS NOT NULL ORDER BY file_hash, det_index",
+        list(ids)
+    )
+    crops: Dict[str, List[str]] = {}
+    for file_hash, crop_path in rows:
+        crops.setdefault(file_hash, []).append(crop_path)
+    return crops
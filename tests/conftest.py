@@ -0,0 +1,12 @@
+"""
+Configuración común de pytest: el código se importa como `src.*` desde la raíz del repo
+(igual que scripts/ y benchmarks/), sin instalar el paquete.
+
+    python -m pytest tests
+"""
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
@@ -0,0 +1,75 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("transformers")
+
+from src.core.batch_processor import BatchProcessor, FileTask
+from src.core.sequence_grouper import SequenceGrouper
+
+ANIMAL = {"md_category": "animal", "md_confidence": 0.9, "species_common": "Puma"}
+# Lo que AIEngine._build_result retorna cuando falla la detección
+FAILED = {"md_category": "error", "md_confidence": 0.0, "md_bbox": [], "detections": []}
+
+
+class RecordingAI:
+    def __init__(self, results):
+        self.results = results
+        self.analyzed = []
+
+    def analyze_batch(self, images, release=False):
+        self.analyzed.extend(Path(image).name for image in images)
+        return [self.results[Path(image).name] for image in images]
+
+
+def make_processor(tmp_path, ai):
+    return BatchProcessor(
+        input_dir=str(tmp_path / "in"),
+        output_dir=str(tmp_path / "out"),
+        db_manager=None,
+        checkpoint_manager=None,
+        ai_engine=ai,
+        metadata_injector=None,
+        sequence_grouper=SequenceGrouper()
+    )
+
+
+def burst(tmp_path, names):
+    """Frames idénticos de la misma carpeta, un segundo entre cada uno."""
+    signature = np.full((96, 128), 100, dtype=np.uint8)
+    tasks = []
+    for i, name in enumerate(names):
+        task = FileTask(tmp_path / "in" / "cam1" / name, f"hash-{name}")
+        task.signature = signature
+        task.capture_time = 1000.0 + i
+        tasks.append(task)
+    return tasks
+
+
+def test_duplicates_reuse_successful_reference(tmp_path):
+    ai = RecordingAI({"f1.jpg": ANIMAL})
+    processor = make_processor(tmp_path, ai)
+    tasks = burst(tmp_path, ["f1.jpg", "f2.jpg", "f3.jpg"])
+
+    processor._infer_stage(tasks)
+
+    assert ai.analyzed == ["f1.jpg"]
+    assert [task.ai_result["sequence_ref"] for task in tasks[1:]] == ["hash-f1.jpg", "hash-f1.jpg"]
+    assert all(task.ai_result["species_common"] == "Puma" for task in tasks)
+
+
+def test_failed_reference_is_not_copied_to_duplicates(tmp_path):
+    ai = RecordingAI({"f1.jpg": FAILED, "f2.jpg": ANIMAL, "f3.jpg": ANIMAL})
+    processor = make_processor(tmp_path, ai)
+    tasks = burst(tmp_path, ["f1.jpg", "f2.jpg", "f3.jpg"])
+
+    processor._infer_stage(tasks)
+
+    assert ai.analyzed == ["f1.jpg", "f2.jpg", "f3.jpg"]
+    assert tasks[0].ai_result["md_category"] == "error"
+    for task in tasks[1:]:
+        assert task.ai_result["md_category"] == "animal"
+        assert "sequence_ref" not in task.ai_result and task.sequence_ref is None
+    # Tampoco queda en la caché del grouper para lotes siguientes
+    assert processor.sequences.result("hash-f1.jpg") is None
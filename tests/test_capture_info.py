@@ -0,0 +1,65 @@
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from src.core.capture_info import capture_info, parse_exif_datetime, station_for
+
+
+@pytest.mark.parametrize("value, subsec, expected", [
+    ("2023:05:01 06:30:15", None, datetime(2023, 5, 1, 6, 30, 15)),
+    ("2023:05:01 06:30:15", "05", datetime(2023, 5, 1, 6, 30, 15, 50000)),
+    ("2023:05:01 06:30:15", 123, datetime(2023, 5, 1, 6, 30, 15, 123000)),
+    ("2023:05:01 06:30:15", "1234567", datetime(2023, 5, 1, 6, 30, 15, 123456)),
+    ("2023:05:01 06:30:15.25", None, datetime(2023, 5, 1, 6, 30, 15, 250000)),
+    # SubSecTimeOriginal manda sobre la fracción incluida en la fecha
+    ("2023:05:01 06:30:15.25", "7", datetime(2023, 5, 1, 6, 30, 15, 700000)),
+    # Zona horaria: se conserva la hora de pared de la cámara
+    ("2023:05:01 06:30:15+02:00", None, datetime(2023, 5, 1, 6, 30, 15)),
+    ("2023:05:01 06:30:15.5-05:00", None, datetime(2023, 5, 1, 6, 30, 15, 500000)),
+    ("2023:05:01 06:30:15Z", None, datetime(2023, 5, 1, 6, 30, 15)),
+    (" 2023:05:01 06:30:15 ", "", datetime(2023, 5, 1, 6, 30, 15)),
+])
+def test_parse_exif_datetime(value, subsec, expected):
+    assert parse_exif_datetime(value, subsec) == expected
+
+
+@pytest.mark.parametrize("value", [None, "", "0000:00:00 00:00:00", "    :  :     :  :  ", "2023-05-01", 1682922615])
+def test_parse_exif_datetime_rejects_invalid(value):
+    assert parse_exif_datetime(value) is None
+
+
+def test_capture_info_from_exif_with_subsec_and_serial():
+    tags = {
+        "DateTimeOriginal": "2023:05:01 23:59:59",
+        "SubSecTimeOriginal": "50",
+        "SerialNumber": "",
+        "InternalSerialNumber": " CAM-0042 ",
+    }
+    info = capture_info(Path("/in/station-7/DCIM/IMG_0001.JPG"), tags, input_root=Path("/in"))
+    assert info == {
+        "capture_timestamp": "2023-05-01T23:59:59.500000",
+        "capture_epoch": 1682985599.5,
+        "capture_date": "2023-05-01",
+        "camera_serial": "CAM-0042",
+        "station_id": "station-7",
+        "capture_source": "exif",
+    }
+
+
+def test_capture_info_falls_back_to_create_date_then_mtime():
+    info = capture_info(Path("/in/a.jpg"), {"DateTimeOriginal": "0000:00:00 00:00:00", "CreateDate": "2022:01:02 03:04:05"})
+    assert (info["capture_timestamp"], info["capture_source"]) == ("2022-01-02T03:04:05", "exif")
+
+    mtime = datetime(2021, 6, 7, 8, 9, 10).timestamp()
+    info = capture_info(Path("/in/a.jpg"), {}, mtime=mtime)
+    assert (info["capture_timestamp"], info["capture_source"]) == ("2021-06-07T08:09:10", "mtime")
+    assert info["camera_serial"] is None
+
+
+def test_station_for():
+    root = Path("/in")
+    assert station_for(Path("/in/cam1/a.jpg"), root) == "cam1"
+    assert station_for(Path("/in/a.jpg"), root) is None
+    assert station_for(Path("/elsewhere/cam1/a.jpg"), root) is None
+    assert station_for(Path("/in/cam1/a.jpg"), None) is None
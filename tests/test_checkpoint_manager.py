@@ -0,0 +1,95 @@
+import hashlib
+import os
+
+import pytest
+
+from src.core.checkpoint_manager import CheckpointManager
+from src.core.fingerprint import Fingerprinter
+from src.database.db_manager import DatabaseManager
+
+SAMPLE = 64 * 1024
+
+
+class CountingFingerprinter(Fingerprinter):
+    def __init__(self):
+        super().__init__(workers=1)
+        self.hashed = []
+
+    def hash_many(self, paths):
+        self.hashed.extend(os.path.basename(path) for path in paths)
+        return super().hash_many(paths)
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    db = DatabaseManager(str(tmp_path / "wildindex.db"))
+    checkpoint = CheckpointManager(db, fingerprinter=CountingFingerprinter())
+    yield checkpoint
+    checkpoint.fingerprinter.close()
+    db.close()
+
+
+def photo(path, middle=b"a"):
+    """Misma cabecera y cola de 64 KB; solo cambia el medio (como dos JPEG de la misma cámara)."""
+    path.write_bytes(b"H" * SAMPLE + middle * 1000 + b"T" * SAMPLE)
+    return path
+
+
+def mark_processed(checkpoint, pending):
+    for file_path, file_hash in pending:
+        checkpoint.db.upsert_image({"id": file_hash, "file_hash": file_hash, "original_path": str(file_path),
+                                    "file_name": file_path.name, "status": "PROCESSED"})
+
+
+def bump_mtime(path):
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_unchanged_files_are_not_reread(checkpoint, tmp_path):
+    a = photo(tmp_path / "a.jpg")
+    mark_processed(checkpoint, checkpoint.filter_pending([a]))
+    checkpoint.fingerprinter.hashed.clear()
+
+    assert checkpoint.filter_pending([a]) == []
+    assert checkpoint.fingerprinter.hashed == []
+
+
+def test_in_place_edit_with_same_head_and_tail_is_rehashed(checkpoint, tmp_path):
+    a = photo(tmp_path / "a.jpg")
+    mark_processed(checkpoint, checkpoint.filter_pending([a]))
+
+    # EXIF reescrito / JPEG guardado de nuevo: mismo tamaño, cabecera y cola, otro mtime
+    photo(a, middle=b"b")
+    bump_mtime(a)
+    expected = hashlib.sha256(a.read_bytes()).hexdigest()
+    assert checkpoint.filter_pending([a]) == [(a, expected)]
+
+
+def test_touched_file_is_rehashed_but_stays_processed(checkpoint, tmp_path):
+    a = photo(tmp_path / "a.jpg")
+    mark_processed(checkpoint, checkpoint.filter_pending([a]))
+    checkpoint.fingerprinter.hashed.clear()
+
+    bump_mtime(a)
+    assert checkpoint.filter_pending([a]) == []
+    assert checkpoint.fingerprinter.hashed == ["a.jpg"]
+
+
+def test_renamed_file_reuses_stored_hash(checkpoint, tmp_path):
+    a = photo(tmp_path / "a.jpg")
+    mark_processed(checkpoint, checkpoint.filter_pending([a]))
+    checkpoint.fingerprinter.hashed.clear()
+
+    renamed = tmp_path / "renamed.jpg"
+    a.rename(renamed)
+    assert checkpoint.filter_pending([renamed]) == []
+    assert checkpoint.fingerprinter.hashed == []
+
+
+def test_other_file_with_same_quick_identity_is_hashed(checkpoint, tmp_path):
+    a = photo(tmp_path / "a.jpg")
+    mark_processed(checkpoint, checkpoint.filter_pending([a]))
+
+    b = photo(tmp_path / "b.jpg", middle=b"b")
+    assert checkpoint.filter_pending([b]) == [(b, hashlib.sha256(b.read_bytes()).hexdigest())]
@@ -0,0 +1,87 @@
+import sqlite3
+import threading
+
+import pytest
+
+from src.database.db_manager import DatabaseManager
+
+
+def record(file_hash, **fields):
+    return {"id": file_hash, "file_hash": file_hash, "original_path": f"/in/{file_hash}.jpg",
+            "file_name": f"{file_hash}.jpg", "status": "PROCESSED", **fields}
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "wildindex.db"), flush_size=3, flush_interval=3600, pool_size=2)
+    yield db
+    db.close()
+
+
+def test_queue_upsert_flushes_at_flush_size(db):
+    db.queue_upsert(record("a"))
+    db.queue_upsert(record("b"), detections=[{"category": "animal", "confidence": 0.9, "bbox": [0, 0, 1, 1]}])
+    assert db.get_image_by_hash("a") is None
+
+    db.queue_upsert(record("c"))
+    assert db._buffer == []
+    assert all(db.get_image_by_hash(h) for h in "abc")
+    assert [det["category"] for det in db.get_detections("b")] == ["animal"]
+
+
+def test_detections_are_replaced_not_appended(db):
+    db.upsert_images([record("a")], {"a": [{"category": "animal"}, {"category": "person"}]})
+    db.upsert_images([record("a", md_category="animal")], {"a": [{"category": "animal"}]})
+    assert len(db.get_detections("a")) == 1
+
+
+def test_failed_flush_rolls_back_and_rebuffers(db):
+    db.queue_upsert(record("a"))
+    db.queue_upsert(record("b", no_such_column=1))
+
+    with pytest.raises(sqlite3.OperationalError):
+        db.flush()
+    # Transacción completa revertida y los registros siguen en el buffer, en orden
+    assert db.get_image_by_hash("a") is None
+    assert [rec["id"] for rec, _ in db._buffer] == ["a", "b"]
+
+    # Registros encolados después del fallo van detrás de los devueltos
+    db._buffer[1][0].pop("no_such_column")
+    db._buffer.append((record("c"), None))
+    db.flush()
+    assert db._buffer == []
+    assert all(db.get_image_by_hash(h) for h in "abc")
+
+
+def test_connection_returns_to_pool_after_error(db):
+    with pytest.raises(sqlite3.OperationalError):
+        with db._get_connection() as conn:
+            conn.execute("SELECT * FROM no_such_table")
+    db.upsert_image(record("a"))
+    assert len(db._connections) == 1
+
+
+def test_pool_is_bounded_across_threads(db):
+    barrier = threading.Barrier(8)
+
+    def work(i):
+        barrier.wait()
+        db.upsert_image(record(f"h{i}"))
+        db.get_image_by_hash(f"h{i}")
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(db._connections) <= db.pool_size
+    assert all(db.get_image_by_hash(f"h{i}") for i in range(8))
+
+
+def test_non_persistent_mode_closes_connections(tmp_path):
+    db = DatabaseManager(str(tmp_path / "wildindex.db"), persistent=False)
+    db.upsert_image(record("a"))
+    assert db.get_image_by_hash("a")["status"] == "PROCESSED"
+    assert db._connections == []
+    db.close()
@@ -0,0 +1,83 @@
+import time
+
+import pytest
+
+from src.database.db_manager import DatabaseManager
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "wildindex.db"))
+    yield db
+    db.close()
+
+
+def status(db, file_hash):
+    return db.get_image_by_hash(file_hash)["status"]
+
+
+def expire_leases(db):
+    with db._get_connection() as conn:
+        conn.execute("UPDATE processed_images SET lease_expires_at = ? WHERE lease_owner IS NOT NULL", (time.time() - 1,))
+
+
+def test_enqueue_skips_queued_and_processed_and_requeues_errors(db):
+    assert db.enqueue([("/in/a.jpg", "a"), ("/in/b.jpg", "b"), ("/in/c.jpg", "c")]) == 3
+    db.upsert_image({"id": "b", "file_hash": "b", "original_path": "/in/b.jpg", "file_name": "b.jpg", "status": "PROCESSED"})
+    db.upsert_image({"id": "c", "file_hash": "c", "original_path": "/in/c.jpg", "file_name": "c.jpg",
+                     "status": "ERROR", "error_message": "boom"})
+
+    assert db.enqueue([("/in/a.jpg", "a"), ("/in/b.jpg", "b"), ("/in/moved/c.jpg", "c")]) == 1
+    assert [status(db, h) for h in "abc"] == ["PENDING", "PROCESSED", "PENDING"]
+    requeued = db.get_image_by_hash("c")
+    assert requeued["original_path"] == "/in/moved/c.jpg"
+    assert requeued["error_message"] is None
+    assert db.enqueue([]) == 0
+
+
+def test_claim_batch_orders_by_priority_and_never_double_claims(db):
+    db.enqueue([("/in/low.jpg", "low")])
+    db.enqueue([("/in/high.jpg", "high")], priority=10)
+
+    first = db.claim_batch("worker-1", limit=1)
+    assert [(row["id"], row["attempts"]) for row in first] == [("high", 1)]
+    assert [row["id"] for row in db.claim_batch("worker-2", limit=5)] == ["low"]
+    assert db.claim_batch("worker-3", limit=5) == []
+    assert db.queue_depth() == {"ready": 0, "leased": 2, "total": 2}
+
+
+def test_expired_lease_is_reclaimed_until_max_attempts(db):
+    db.enqueue([("/in/a.jpg", "a")])
+    for attempt in (1, 2, 3):
+        claimed = db.claim_batch(f"worker-{attempt}", limit=1, max_attempts=3)
+        assert [(row["id"], row["attempts"]) for row in claimed] == [("a", attempt)]
+        expire_leases(db)
+
+    # Tercer lease vencido: el archivo tumba al worker, pasa a ERROR
+    assert db.claim_batch("worker-4", limit=1, max_attempts=3) == []
+    row = db.get_image_by_hash("a")
+    assert row["status"] == "ERROR"
+    assert row["lease_owner"] is None
+
+
+def test_extend_leases_only_renews_own_pending_rows(db):
+    db.enqueue([("/in/a.jpg", "a"), ("/in/b.jpg", "b")])
+    db.claim_batch("worker-1", limit=1)
+    db.claim_batch("worker-2", limit=1)
+    expire_leases(db)
+
+    assert db.extend_leases("worker-1", ["a", "b"], lease_seconds=60) == 1
+    assert db.extend_leases("worker-1", []) == 0
+    # Solo "b" (de worker-2, sin renovar) queda libre
+    assert [row["id"] for row in db.claim_batch("worker-3", limit=5)] == ["b"]
+
+
+def test_release_leases_returns_rows_without_counting_an_attempt(db):
+    db.enqueue([("/in/a.jpg", "a"), ("/in/b.jpg", "b")])
+    db.claim_batch("worker-1", limit=5)
+    db.upsert_image({"id": "b", "file_hash": "b", "original_path": "/in/b.jpg", "file_name": "b.jpg", "status": "PROCESSED"})
+
+    assert db.release_leases("worker-1") == 1
+    assert db.release_leases("worker-1") == 0
+    assert db.queue_depth() == {"ready": 1, "leased": 0, "total": 1}
+    assert [(row["id"], row["attempts"]) for row in db.claim_batch("worker-2", limit=5)] == [("a", 1)]
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from src.core.detectors.megadetector import MegaDetector
+
+pytest.importorskip("cv2")
+from test_yolo_onnx import NAMES, constant_yolo_model  # noqa: E402
+
+
+class TorchStub:
+    """Sustituto del modelo YOLOv5 de torch.hub (no hay pesos en los tests)."""
+    stride = 32
+    names = NAMES
+
+
+@pytest.fixture
+def torch_loads(monkeypatch):
+    loads = []
+
+    def fake_load(self):
+        loads.append(self.backend)
+        self.model = TorchStub()
+
+    monkeypatch.setattr(MegaDetector, "_load_model", fake_load)
+    return loads
+
+
+def make_detector(tmp_path, backend):
+    return MegaDetector(
+        str(tmp_path / "md_v5a.0.0.pt"), confidence_threshold=0.25, device="cpu",
+        image_size=64, backend=backend, onnx_dir=str(tmp_path / "onnx")
+    )
+
+
+def test_onnx_backend_uses_exported_model(tmp_path, torch_loads):
+    pytest.importorskip("onnxruntime")
+    (tmp_path / "onnx").mkdir()
+    constant_yolo_model(tmp_path / "onnx" / "md_v5a.0.0_64.onnx")
+
+    detector = make_detector(tmp_path, "onnx")
+    assert (detector.backend, detector.model, torch_loads) == ("onnx", None, [])
+
+    # Lote con una imagen horizontal y otra vertical: letterbox común de 64x64
+    result, _ = detector.detect_batch([np.zeros((100, 200, 3), dtype=np.uint8), np.zeros((200, 100, 3), dtype=np.uint8)])
+    assert result["md_category"] == "animal"
+    assert result["md_confidence"] == pytest.approx(0.81)
+    assert result["md_bbox"] == pytest.approx([50, 25, 150, 75], abs=1e-3)
+    assert [det["category"] for det in result["detections"]] == ["animal", "person"]
+
+
+def test_failed_export_falls_back_to_torch(tmp_path, torch_loads, monkeypatch):
+    def broken_export(hub_model, output_path, image_size):
+        raise RuntimeError("onnx export no soportado")
+
+    monkeypatch.setattr("src.core.backends.yolo_onnx.export_yolov5", broken_export)
+    detector = make_detector(tmp_path, "onnx")
+
+    assert detector.backend == "torch"
+    assert detector.runtime is None
+    # El modelo cargado para exportar se reutiliza: una sola carga
+    assert isinstance(detector.model, TorchStub) and torch_loads == ["onnx"]
+
+
+def test_missing_onnxruntime_falls_back_to_torch(tmp_path, torch_loads, monkeypatch):
+    def no_runtime(*args, **kwargs):
+        raise ImportError("No module named 'onnxruntime'")
+
+    (tmp_path / "onnx").mkdir()
+    (tmp_path / "onnx" / "md_v5a.0.0_64.onnx").write_bytes(b"")
+    monkeypatch.setattr("src.core.backends.yolo_onnx.create_session", no_runtime)
+    detector = make_detector(tmp_path, "onnx")
+
+    assert (detector.backend, detector.runtime) == ("torch", None)
+    assert isinstance(detector.model, TorchStub) and torch_loads == ["torch"]
+
+
+def test_unknown_backend_is_rejected(tmp_path, torch_loads):
+    with pytest.raises(ValueError):
+        make_detector(tmp_path, "tensorrt")
+
+
+def test_empty_prediction_from_onnx_runtime(tmp_path, torch_loads):
+    detector = make_detector(tmp_path, "torch")
+    result = detector._parse_prediction(np.zeros((0, 6), dtype=np.float32), NAMES)
+    assert result == {"md_category": "empty", "md_confidence": 0.0, "md_bbox": [], "detections": []}
@@ -0,0 +1,84 @@
+import threading
+import time
+
+from src.core.metadata_injector import ExifToolExecuteError, MetadataInjector
+
+
+class FakeSession:
+    """Sesión stay_open simulada: un comando a la vez, como el proceso real."""
+
+    def __init__(self, log, delay=0.05):
+        self.running = True
+        self.log = log
+        self.delay = delay
+        self.busy = threading.Lock()
+
+    def execute(self, *args):
+        assert self.busy.acquire(blocking=False), "dos comandos a la vez en la misma sesión"
+        try:
+            self.log.append(self)
+            if "bad.jpg" in args:
+                raise ExifToolExecuteError(1, "", "Error: bad.jpg", list(args))
+            if "crash.jpg" in args:
+                self.running = False
+                raise BrokenPipeError("exiftool murió")
+            time.sleep(self.delay)
+            return "1 image files updated"
+        finally:
+            self.busy.release()
+
+    def terminate(self):
+        self.running = False
+
+
+class FakeInjector(MetadataInjector):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.started = []
+        self.log = []
+
+    def _start_session(self):
+        session = FakeSession(self.log)
+        self.started.append(session)
+        return session
+
+
+def test_sessions_run_in_parallel_up_to_pool_size():
+    injector = FakeInjector(sessions=4)
+    threads = [threading.Thread(target=injector._execute, args=(["-all=", f"{i}.jpg"],)) for i in range(8)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(injector.log) == 8
+    assert len(injector.started) == 4
+    # 8 comandos de 50 ms en 4 sesiones: dos rondas, no ocho
+    assert time.perf_counter() - start < 0.3
+    injector.close()
+    assert not any(session.running for session in injector.started)
+
+
+def test_sessions_are_reused_sequentially():
+    injector = FakeInjector(sessions=4)
+    for i in range(3):
+        assert injector._execute([f"{i}.jpg"]) == (True, "1 image files updated")
+    assert len(injector.started) == 1
+
+
+def test_execute_error_keeps_session():
+    injector = FakeInjector()
+    ok, output = injector._execute(["bad.jpg"])
+    assert not ok and output == "Error: bad.jpg"
+    assert injector._execute(["ok.jpg"])[0]
+    assert len(injector.started) == 1
+
+
+def test_broken_session_is_restarted():
+    injector = FakeInjector()
+    injector._execute(["ok.jpg"])
+    assert injector._execute(["crash.jpg"]) == (False, "La sesión ExifTool falló dos veces seguidas")
+    assert injector._execute(["ok.jpg"])[0]
+    # La sesión rota y la del reintento se descartan; la tercera queda sana
+    assert [session.running for session in injector.started] == [False, False, True]
@@ -0,0 +1,142 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+from src.core.metrics import Registry, start_http_server
+
+
+def sample_lines(registry: Registry):
+    return [line for line in registry.render().splitlines() if not line.startswith("#")]
+
+
+def test_counter_and_gauge_render_with_labels():
+    registry = Registry()
+    files = registry.counter("t_files_total", "Archivos.", ["status"])
+    depth = registry.gauge("t_depth", "Cola.", ["state"])
+    files.labels("processed").inc()
+    files.labels("processed").inc(2)
+    files.labels(status="error").inc()
+    depth.labels("ready").set(7.5)
+
+    text = registry.render()
+    assert "# HELP t_files_total Archivos.\n# TYPE t_files_total counter" in text
+    assert "# TYPE t_depth gauge" in text
+    assert sample_lines(registry) == [
+        't_files_total{status="error"} 1',
+        't_files_total{status="processed"} 3',
+        't_depth{state="ready"} 7.5',
+    ]
+
+
+def test_unlabeled_metric_and_label_escaping():
+    registry = Registry()
+    registry.gauge("t_size", "Lote.").labels().set(12)
+    registry.counter("t_errors_total", "Errores.", ["stage"]).labels('a"b\\c\nd').inc()
+
+    assert sample_lines(registry) == [
+        "t_size 12",
+        't_errors_total{stage="a\\"b\\\\c\\nd"} 1',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    seconds = registry.histogram("t_seconds", "Latencia.", ["op"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        seconds.labels("copy").observe(value)
+
+    assert sample_lines(registry) == [
+        't_seconds_bucket{op="copy",le="0.1"} 2',
+        't_seconds_bucket{op="copy",le="1"} 3',
+        't_seconds_bucket{op="copy",le="+Inf"} 4',
+        't_seconds_sum{op="copy"} 3.65',
+        't_seconds_count{op="copy"} 4',
+    ]
+
+
+def test_gauge_function_failure_omits_sample():
+    registry = Registry()
+    gauge = registry.gauge("t_live", "Calculada.", ["state"])
+    gauge.labels("ok").set_function(lambda: 3)
+    gauge.labels("broken").set_function(lambda: 1 / 0)
+
+    assert sample_lines(registry) == ['t_live{state="ok"} 3']
+
+
+def test_render_parses_as_prometheus_text():
+    parser = pytest.importorskip("prometheus_client.parser")
+    registry = Registry()
+    registry.counter("t_files_total", "Archivos.", ["status"]).labels("processed").inc(5)
+    registry.histogram("t_seconds", "Latencia.", buckets=(1.0,)).labels().observe(0.5)
+
+    families = {family.name: family for family in parser.text_string_to_metric_families(registry.render())}
+    assert families["t_files"].samples[0].value == 5
+    assert {s.name: s.value for s in families["t_seconds"].samples}["t_seconds_count"] == 1
+
+
+def make_registry():
+    """Mismas métricas en dos registros, como el proceso principal y un worker del pool."""
+    registry = Registry()
+    files = registry.counter("t_files_total", "Archivos.", ["status"])
+    load = registry.gauge("t_load_seconds", "Carga.", ["model"])
+    seconds = registry.histogram("t_seconds", "Latencia.", ["op"], buckets=(0.1, 1.0))
+    return registry, files, load, seconds
+
+
+def test_deltas_merge_round_trip():
+    parent, parent_files, parent_load, parent_seconds = make_registry()
+    worker, files, load, seconds = make_registry()
+    parent_files.labels("processed").inc(10)
+
+    files.labels("processed").inc(2)
+    load.labels("megadetector").set(4.2)
+    seconds.labels("bioclip").observe(0.5)
+    parent.merge(worker.collect_deltas())
+
+    assert parent_files.labels("processed").value == 12
+    assert parent_load.labels("megadetector").value == 4.2
+    assert parent_seconds.labels("bioclip").counts == [0, 1, 0]
+    assert parent_seconds.labels("bioclip").sum == 0.5
+
+
+def test_deltas_only_include_changes_since_last_collect():
+    parent, parent_files, _, parent_seconds = make_registry()
+    worker, files, _, seconds = make_registry()
+    files.labels("processed").inc(3)
+    parent.merge(worker.collect_deltas())
+    assert worker.collect_deltas() == {}
+
+    files.labels("processed").inc()
+    seconds.labels("bioclip").observe(2.0)
+    parent.merge(worker.collect_deltas())
+
+    assert parent_files.labels("processed").value == 4
+    assert parent_seconds.labels("bioclip").counts == [0, 0, 1]
+
+
+def test_merge_ignores_unknown_metrics():
+    parent = Registry()
+    worker, files, _, _ = make_registry()
+    files.labels("processed").inc()
+
+    parent.merge(worker.collect_deltas())
+    assert parent.render() == "\n"
+
+
+def test_http_endpoint_serves_global_registry():
+    from src.core.metrics import FILES_TOTAL
+
+    FILES_TOTAL.labels("processed").inc(0)
+    server = start_http_server(0)
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            body = response.read().decode()
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+        assert 'wildindex_files_total{status="processed"}' in body
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/other", timeout=5)
+    finally:
+        server.shutdown()
+        server.server_close()
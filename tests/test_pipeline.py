@@ -0,0 +1,120 @@
+import threading
+import time
+
+import pytest
+
+from src.core.pipeline import Pipeline, Stage
+
+
+def run(pipeline, items, timeout=5.0):
+    """Ejecuta el pipeline en otro hilo: un bloqueo falla el test en vez de colgarlo."""
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(outputs=pipeline.run(items)), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "el pipeline no terminó"
+    return result["outputs"]
+
+
+def test_items_flow_through_all_stages():
+    pipeline = Pipeline([
+        Stage("double", lambda x: x * 2, workers=3),
+        Stage("inc", lambda x: x + 1, workers=2),
+    ], queue_size=2)
+    assert sorted(run(pipeline, range(50))) == [x * 2 + 1 for x in range(50)]
+
+
+def test_batch_stage_receives_lists_up_to_batch_size():
+    sizes = []
+
+    def batch_fn(batch):
+        sizes.append(len(batch))
+        return [x * 10 for x in batch]
+
+    pipeline = Pipeline([
+        Stage("read", lambda x: x),
+        Stage("infer", batch_fn, batch_size=4, batch_timeout=0.5),
+    ])
+    assert sorted(run(pipeline, range(10))) == [x * 10 for x in range(10)]
+    assert max(sizes) <= 4 and sum(sizes) == 10
+
+
+def test_errors_are_reported_and_other_items_continue():
+    errors = []
+
+    def fn(x):
+        if x % 3 == 0:
+            raise ValueError(f"bad {x}")
+        return x
+
+    pipeline = Pipeline([Stage("check", fn, workers=2)], on_error=lambda stage, item, e: errors.append((stage, item)))
+    assert sorted(run(pipeline, range(9))) == [1, 2, 4, 5, 7, 8]
+    assert sorted(errors) == [("check", 0), ("check", 3), ("check", 6)]
+
+
+def test_batch_error_reports_every_item():
+    errors = []
+
+    def fail(batch):
+        raise RuntimeError("modelo caído")
+
+    pipeline = Pipeline([Stage("infer", fail, batch_size=8, batch_timeout=0.5)],
+                        on_error=lambda stage, item, e: errors.append(item))
+    assert run(pipeline, range(5)) == []
+    assert sorted(errors) == list(range(5))
+
+
+def test_failing_on_error_does_not_hang_the_pipeline():
+    def on_error(stage, item, error):
+        raise RuntimeError("DB bloqueada")
+
+    def fn(x):
+        if x < 20:
+            raise ValueError(x)
+        return x
+
+    # Con un solo worker y cola de 1: si el worker muriera, run() quedaría bloqueado en put()
+    pipeline = Pipeline([Stage("read", lambda x: x), Stage("write", fn)], queue_size=1, on_error=on_error)
+    assert sorted(run(pipeline, range(25))) == [20, 21, 22, 23, 24]
+
+
+def test_unexpected_worker_failure_keeps_draining():
+    def infer(batch):
+        # Contrato roto (None en vez de lista): falla fuera de fn, dentro del worker
+        return None if 0 in batch else batch
+
+    pipeline = Pipeline([
+        Stage("read", lambda x: x),
+        Stage("infer", infer, batch_size=2, batch_timeout=0.5),
+    ], queue_size=1)
+    outputs = run(pipeline, range(10))
+    assert 0 not in outputs and len(outputs) >= 8
+
+
+def test_bounded_queues_apply_backpressure():
+    fed = []
+    release = threading.Event()
+
+    def produce():
+        for x in range(100):
+            fed.append(x)
+            yield x
+
+    def slow(x):
+        release.wait()
+        return x
+
+    pipeline = Pipeline([Stage("slow", slow)], queue_size=2)
+    thread = threading.Thread(target=pipeline.run, args=(produce(),), daemon=True)
+    thread.start()
+    time.sleep(0.2)
+    # Un elemento en el worker, dos en la cola y uno esperando en put()
+    assert len(fed) <= 4
+    release.set()
+    thread.join(5)
+    assert len(fed) == 100
+
+
+def test_pipeline_requires_stages():
+    with pytest.raises(ValueError):
+        Pipeline([])
@@ -0,0 +1,102 @@
+import pytest
+
+from src.core import scheduler as scheduler_module
+from src.core.metrics import STAGE_SECONDS
+from src.core.scheduler import BatchScheduler
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(scheduler_module.time, "perf_counter", clock)
+    monkeypatch.setattr(scheduler_module, "available_memory_mb", lambda: None)
+    return clock
+
+
+def run_batch(scheduler, clock, files, elapsed, busy):
+    """Simula un lote: `busy` son los segundos que suma cada etapa en el histograma."""
+    scheduler.batch_started()
+    for stage, seconds in busy.items():
+        STAGE_SECONDS.labels(stage).observe(seconds)
+    clock.now += elapsed
+    scheduler.batch_finished(files)
+
+
+def test_file_seconds_split_across_stage_workers(clock):
+    scheduler = BatchScheduler({"t1_read": 2, "t1_infer": 1}, batch_size=10)
+    run_batch(scheduler, clock, files=10, elapsed=12.0, busy={"t1_read": 4.0, "t1_infer": 10.0})
+
+    assert scheduler.file_seconds == {"t1_read": pytest.approx(0.2), "t1_infer": pytest.approx(1.0)}
+    # Coste fijo = 12 s - 10 archivos x 1 s del cuello de botella
+    assert scheduler.overhead_seconds == pytest.approx(2.0)
+
+
+def test_ewma_smooths_estimates(clock):
+    scheduler = BatchScheduler({"t2_infer": 1}, batch_size=10, smoothing=0.5)
+    run_batch(scheduler, clock, files=10, elapsed=10.0, busy={"t2_infer": 10.0})
+    run_batch(scheduler, clock, files=10, elapsed=20.0, busy={"t2_infer": 20.0})
+
+    assert scheduler.file_seconds["t2_infer"] == pytest.approx(1.5)
+
+
+def test_batch_grows_to_amortize_overhead(clock):
+    scheduler = BatchScheduler(
+        {"t3_infer": 1}, batch_size=10, max_batch_size=1000, max_overhead=0.1, target_batch_seconds=1000
+    )
+    # 0.1 s/archivo y 5 s de coste fijo: el lote ideal es 5 * 0.9 / (0.1 * 0.1) = 450
+    run_batch(scheduler, clock, files=10, elapsed=6.0, busy={"t3_infer": 1.0})
+    assert scheduler.batch_size == 20  # como mucho x2 por lote
+    for _ in range(10):
+        files = scheduler.batch_size
+        run_batch(scheduler, clock, files=files, elapsed=5.0 + 0.1 * files, busy={"t3_infer": 0.1 * files})
+    assert scheduler.batch_size == 450
+
+
+def test_batch_capped_by_target_duration(clock):
+    scheduler = BatchScheduler({"t4_infer": 1}, batch_size=50, target_batch_seconds=30, max_overhead=0.01)
+    run_batch(scheduler, clock, files=50, elapsed=60.0, busy={"t4_infer": 50.0})
+    assert scheduler.batch_size == 30
+
+
+def test_low_memory_halves_batch(clock, monkeypatch):
+    monkeypatch.setattr(scheduler_module, "available_memory_mb", lambda: 100.0)
+    scheduler = BatchScheduler({"t5_infer": 1}, batch_size=40, min_free_mb=1024)
+    run_batch(scheduler, clock, files=40, elapsed=4.0, busy={"t5_infer": 4.0})
+    assert scheduler.batch_size == 20
+
+
+def test_fixed_batch_when_not_adaptive(clock):
+    scheduler = BatchScheduler({"t6_infer": 1}, batch_size=25, adaptive=False)
+    run_batch(scheduler, clock, files=25, elapsed=100.0, busy={"t6_infer": 1.0})
+    assert scheduler.batch_size == 25
+    assert scheduler.file_seconds == {}
+
+
+def test_busy_seconds_override_stage_histogram(clock):
+    # Pool de 2 procesos: 4 hilos esperando resultados suman el doble del cómputo real
+    pool_busy = [0.0]
+    scheduler = BatchScheduler({"t7_infer": 2}, busy_seconds={"t7_infer": lambda: pool_busy[0]}, batch_size=10)
+    scheduler.batch_started()
+    STAGE_SECONDS.labels("t7_infer").observe(40.0)
+    pool_busy[0] += 20.0
+    clock.now += 10.0
+    scheduler.batch_finished(10)
+
+    assert scheduler.file_seconds["t7_infer"] == pytest.approx(1.0)
+
+
+def test_idle_backoff_and_reset(clock):
+    scheduler = BatchScheduler({"t8_infer": 1}, idle_min=1.0, idle_max=5.0)
+    assert [scheduler.next_idle_wait() for _ in range(5)] == [1.0, 2.0, 4.0, 5.0, 5.0]
+    scheduler.reset_idle()
+    assert scheduler.next_idle_wait() == 1.0
+    run_batch(scheduler, clock, files=1, elapsed=1.0, busy={"t8_infer": 1.0})
+    assert scheduler.idle_wait == 0.0
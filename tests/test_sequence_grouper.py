@@ -0,0 +1,73 @@
+import numpy as np
+from PIL import Image
+
+from src.core.sequence_grouper import SIGNATURE_SIZE, SequenceGrouper, image_signature, signature_difference
+
+
+def scene(seed=0, brightness=0):
+    """Fondo de cámara trampa sintético (textura fija) con un desplazamiento de exposición."""
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(60, 180, size=(SIGNATURE_SIZE[1], SIGNATURE_SIZE[0]), dtype=np.int16) + brightness
+    return np.clip(pixels, 0, 255).astype(np.uint8)
+
+
+def with_animal(signature, x=40, y=30, size=8):
+    frame = signature.copy()
+    frame[y:y + size, x:x + size] = 255
+    return frame
+
+
+def test_image_signature_is_small_grayscale():
+    image = Image.new("RGB", (2048, 1536), (120, 80, 40))
+    signature = image_signature(image)
+    assert signature.shape == (SIGNATURE_SIZE[1], SIGNATURE_SIZE[0])
+    assert signature.dtype == np.uint8
+
+
+def test_difference_ignores_exposure_but_sees_animals():
+    background = scene()
+    assert signature_difference(background, scene(brightness=25)) == 0.0
+    # Un bloque de 8x8 celdas (~0.5% de la firma) supera el umbral por defecto del grouper
+    assert signature_difference(background, with_animal(background)) > SequenceGrouper().change_threshold
+    assert signature_difference(background, background[:10]) == 1.0
+
+
+def test_near_duplicates_reuse_reference_within_gap():
+    grouper = SequenceGrouper(max_gap_seconds=10)
+    background = scene()
+    assert grouper.match("f1", "cam1", 100.0, background) is None
+    assert grouper.match("f2", "cam1", 105.0, scene(brightness=10)) == "f1"
+    # El hueco se mide desde el último frame de la ráfaga, no desde la referencia
+    assert grouper.match("f3", "cam1", 114.0, background) == "f1"
+    assert grouper.match("f4", "cam1", 130.0, background) is None
+    assert grouper.match("f5", "cam1", 131.0, background) == "f4"
+
+
+def test_changed_frame_becomes_new_reference():
+    grouper = SequenceGrouper()
+    background = scene()
+    animal = with_animal(background)
+    assert grouper.match("f1", "cam1", 0.0, background) is None
+    assert grouper.match("f2", "cam1", 1.0, animal) is None
+    assert grouper.match("f3", "cam1", 2.0, animal) == "f2"
+
+
+def test_folders_are_independent():
+    grouper = SequenceGrouper()
+    background = scene()
+    assert grouper.match("a1", "cam1", 0.0, background) is None
+    assert grouper.match("b1", "cam2", 0.5, background) is None
+    assert grouper.match("a2", "cam1", 1.0, background) == "a1"
+    assert grouper.match("b2", "cam2", 1.5, background) == "b1"
+
+
+def test_results_are_bounded_lru():
+    grouper = SequenceGrouper(max_results=2)
+    grouper.set_result("f1", {"md_category": "animal"})
+    grouper.set_result("f2", {"md_category": "empty"})
+    grouper.set_result("f1", {"md_category": "animal", "species_common": "Puma"})
+    grouper.set_result("f3", {"md_category": "empty"})
+
+    assert grouper.result("f2") is None
+    assert grouper.result("f1") == {"md_category": "animal", "species_common": "Puma"}
+    assert grouper.result("f3") == {"md_category": "empty"}
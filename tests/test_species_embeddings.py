@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+import torch
+
+from src.core.species_embeddings import cache_path, load_species_embeddings
+
+
+class FakeClip:
+    """encode_text determinista: un vector por etiqueta a partir de su longitud."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode_text(self, tokens):
+        self.calls += 1
+        return torch.stack([torch.tensor([float(n), 1.0, 2.0]) for n in tokens.tolist()])
+
+
+def tokenizer(labels):
+    return torch.tensor([len(label) for label in labels])
+
+
+def test_embeddings_are_computed_in_chunks_and_cached(tmp_path):
+    labels = ["Puma concolor", "Lynx", "Canis lupus familiaris", "Vulpes vulpes", "Ursus"]
+    model = FakeClip()
+
+    matrix = load_species_embeddings(model, tokenizer, labels, "hf-hub:test/clip", str(tmp_path), chunk_size=2)
+    assert matrix.shape == (5, 3) and matrix.dtype == np.float32
+    assert model.calls == 3
+    np.testing.assert_allclose(np.linalg.norm(matrix, axis=1), 1.0, rtol=1e-6)
+    assert cache_path(str(tmp_path), "hf-hub:test/clip", labels).exists()
+
+    cached = load_species_embeddings(model, tokenizer, labels, "hf-hub:test/clip", str(tmp_path), chunk_size=2)
+    assert model.calls == 3
+    assert isinstance(cached, np.memmap)
+    np.testing.assert_array_equal(cached, matrix)
+
+
+def test_changed_vocabulary_uses_another_cache(tmp_path):
+    model = FakeClip()
+    load_species_embeddings(model, tokenizer, ["Lynx", "Puma"], "m", str(tmp_path))
+    load_species_embeddings(model, tokenizer, ["Puma", "Lynx"], "m", str(tmp_path))
+    assert model.calls == 2
+    assert len(list(tmp_path.glob("*.npy"))) == 2
+
+
+def test_empty_vocabulary_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="vacía"):
+        load_species_embeddings(FakeClip(), tokenizer, [], "m", str(tmp_path))
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,75 @@
+import os
+import time
+
+from src.core.watcher import FileWatcher
+
+
+def touch(path, data=b"x"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+
+def bump_mtime(directory):
+    """Fuerza un mtime distinto aunque el FS tenga poca resolución."""
+    st = directory.stat()
+    os.utime(directory, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def snapshot(watcher, state, collect=True):
+    dir_mtimes, children = state
+    return watcher._snapshot_dirs(watcher.root, dir_mtimes, children, collect=collect)
+
+
+def test_snapshot_diff_reports_only_new_files(tmp_path):
+    touch(tmp_path / "a.jpg")
+    touch(tmp_path / "notes.txt")
+    watcher = FileWatcher(str(tmp_path), [".jpg"], mode="poll")
+    state = ({}, {})
+    assert snapshot(watcher, state, collect=False) == []
+
+    touch(tmp_path / "b.JPG")
+    touch(tmp_path / "cam1" / "c.jpg")
+    bump_mtime(tmp_path)
+    assert snapshot(watcher, state) == [tmp_path / "b.JPG", tmp_path / "cam1" / "c.jpg"]
+    assert snapshot(watcher, state) == []
+
+
+def test_deleted_files_leave_the_snapshot(tmp_path):
+    touch(tmp_path / "a.jpg")
+    watcher = FileWatcher(str(tmp_path), [".jpg"], mode="poll")
+    state = ({}, {})
+    snapshot(watcher, state, collect=False)
+
+    (tmp_path / "a.jpg").unlink()
+    bump_mtime(tmp_path)
+    assert snapshot(watcher, state) == []
+    assert state[1][tmp_path] == ([], set())
+
+    # Mismo nombre de nuevo (ej. tarjeta reformateada): vuelve a ser nuevo
+    touch(tmp_path / "a.jpg")
+    bump_mtime(tmp_path)
+    assert snapshot(watcher, state) == [tmp_path / "a.jpg"]
+
+
+def test_removed_directories_are_forgotten(tmp_path):
+    touch(tmp_path / "cam1" / "a.jpg")
+    watcher = FileWatcher(str(tmp_path), [".jpg"], mode="poll")
+    state = ({}, {})
+    snapshot(watcher, state, collect=False)
+
+    (tmp_path / "cam1" / "a.jpg").unlink()
+    (tmp_path / "cam1").rmdir()
+    bump_mtime(tmp_path)
+    snapshot(watcher, state)
+    assert set(state[0]) == set(state[1]) == {tmp_path}
+
+
+def test_polling_emits_stable_files(tmp_path):
+    watcher = FileWatcher(str(tmp_path), [".jpg"], poll_interval=0.05, mode="poll")
+    watcher.start()
+    try:
+        time.sleep(0.1)
+        touch(tmp_path / "cam1" / "a.jpg")
+        assert watcher.drain(10, timeout=5) == [tmp_path / "cam1" / "a.jpg"]
+    finally:
+        watcher.stop()
@@ -0,0 +1,135 @@
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+
+from src.core.backends.yolo_onnx import PAD_COLOR, OnnxYoloDetector, _greedy_nms
+
+# Filas de salida de YOLOv5: cx, cy, w, h, objectness, score por clase (animal, person, vehicle)
+PREDICTION = np.array([
+    [32, 32, 32, 16, 0.9, 0.9, 0.05, 0.05],  # animal, conf 0.81
+    [33, 32, 32, 16, 0.8, 0.9, 0.05, 0.05],  # casi la misma caja y clase: suprimida
+    [32, 32, 32, 16, 0.9, 0.1, 0.8, 0.1],    # misma caja, otra clase: se conserva
+    [10, 10, 8, 8, 0.1, 0.9, 0.05, 0.05],    # objectness bajo el umbral
+    [50, 50, 8, 8, 0.3, 0.5, 0.25, 0.25],    # supera objectness pero no obj * clase
+], dtype=np.float32)
+NAMES = {0: "animal", 1: "person", 2: "vehicle"}
+
+
+def bare_detector(conf=0.25, image_size=64, stride=32):
+    """Detector sin sesión para probar el pre y postproceso."""
+    detector = OnnxYoloDetector.__new__(OnnxYoloDetector)
+    detector.conf, detector.image_size, detector.stride = conf, image_size, stride
+    return detector
+
+
+def test_letterbox_keeps_aspect_and_pads_evenly():
+    array = np.full((100, 200, 3), 10, dtype=np.uint8)
+    boxed = OnnxYoloDetector._letterbox(array, (64, 64))
+    assert boxed.shape == (64, 64, 3)
+    assert (boxed[:16] == PAD_COLOR).all() and (boxed[48:] == PAD_COLOR).all()
+    assert (boxed[16:48] == 10).all()
+
+
+def test_letterbox_odd_padding_goes_to_bottom_right():
+    boxed = OnnxYoloDetector._letterbox(np.zeros((59, 64, 3), dtype=np.uint8), (64, 64))
+    assert boxed.shape == (64, 64, 3)
+    assert (boxed[:2] == PAD_COLOR).all() and (boxed[2:61] == 0).all() and (boxed[61:] == PAD_COLOR).all()
+
+
+def test_letterbox_batch_uses_common_stride_multiple_shape():
+    detector = bare_detector(image_size=64, stride=32)
+    batch, shape = detector._letterbox_batch([
+        np.zeros((100, 200, 3), dtype=np.uint8),
+        np.zeros((90, 60, 3), dtype=np.uint8),
+    ])
+    # 100x200 -> 32x64 y 90x60 -> 64x42: forma común 64x64 (múltiplos de 32)
+    assert shape == (64, 64)
+    assert batch.shape == (2, 3, 64, 64) and batch.dtype == np.float32
+    assert batch.flags["C_CONTIGUOUS"]
+    assert batch.max() == pytest.approx(PAD_COLOR / 255.0)
+
+
+def test_scale_boxes_undoes_letterbox():
+    # Caja [50, 25, 150, 75] de una imagen 100x200 en un letterbox 64x64 (gain 0.32, 16 px arriba)
+    dets = np.array([[16, 24, 48, 40, 0.9, 0], [-4, 10, 70, 60, 0.5, 1]], dtype=np.float32)
+    scaled = OnnxYoloDetector._scale_boxes(dets, (64, 64), (100, 200))
+    np.testing.assert_allclose(scaled[0, :4], [50, 25, 150, 75], atol=1e-4)
+    # Fuera de la imagen: recortada a sus bordes
+    np.testing.assert_allclose(scaled[1, :4], [0, 0, 200, 100], atol=1e-4)
+    assert OnnxYoloDetector._scale_boxes(np.zeros((0, 6), dtype=np.float32), (64, 64), (100, 200)).shape == (0, 6)
+
+
+def test_nms_filters_scores_and_suppresses_per_class():
+    dets = bare_detector(conf=0.25)._nms(PREDICTION.copy())
+    np.testing.assert_allclose(dets, [
+        [16, 24, 48, 40, 0.81, 0],
+        [16, 24, 48, 40, 0.72, 1],
+    ], atol=1e-5)
+
+
+def test_nms_without_candidates():
+    assert bare_detector(conf=0.95)._nms(PREDICTION.copy()).shape == (0, 6)
+
+
+def test_greedy_nms_orders_by_score_and_keeps_iou_at_threshold():
+    boxes = np.array([
+        [0, 0, 10, 10],
+        [0, 0, 10, 10],
+        [20, 20, 30, 30],
+        [0, 0, 10, 15],  # IoU 100/150 = 0.67 con la primera
+        [5, 0, 15, 10],  # IoU 50/150 = 0.33 con la primera
+    ], dtype=np.float32)
+    scores = np.array([0.5, 0.9, 0.7, 0.6, 0.8], dtype=np.float32)
+    assert _greedy_nms(boxes, scores, 0.45).tolist() == [1, 4, 2]
+    assert _greedy_nms(boxes, scores, 0.3).tolist() == [1, 2]
+    assert _greedy_nms(boxes[:0], scores[:0], 0.45).tolist() == []
+
+
+def constant_yolo_model(path, prediction=PREDICTION, stride=32, names=NAMES):
+    """
+    Modelo ONNX mínimo con la interfaz del export de YOLOv5: entrada `images` [N, 3, H, W]
+    y salida [N, anclas, 5 + clases] con la misma predicción para cada imagen.
+    """
+    onnx = pytest.importorskip("onnx")
+    from onnx import TensorProto, helper, numpy_helper
+
+    nodes = [
+        helper.make_node("ReduceMean", ["images"], ["mean"], axes=[1, 2, 3], keepdims=0),
+        helper.make_node("Unsqueeze", ["mean", "axes"], ["per_image"]),
+        helper.make_node("Mul", ["per_image", "zero"], ["zeros"]),
+        helper.make_node("Add", ["zeros", "prediction"], ["output"]),
+    ]
+    initializers = [
+        numpy_helper.from_array(np.array([1, 2], dtype=np.int64), "axes"),
+        numpy_helper.from_array(np.zeros((1, 1), dtype=np.float32), "zero"),
+        numpy_helper.from_array(prediction, "prediction"),
+    ]
+    graph = helper.make_graph(
+        nodes, "constant_yolo",
+        [helper.make_tensor_value_info("images", TensorProto.FLOAT, ["batch", 3, "height", "width"])],
+        [helper.make_tensor_value_info("output", TensorProto.FLOAT, ["batch", "anchors", prediction.shape[1]])],
+        initializers
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 17)])
+    model.ir_version = 8
+    for key, value in {"stride": str(stride), "names": json.dumps(names)}.items():
+        prop = model.metadata_props.add()
+        prop.key, prop.value = key, value
+    onnx.save(model, str(path))
+    return path
+
+
+def test_detector_end_to_end_on_onnx_runtime(tmp_path):
+    pytest.importorskip("onnxruntime")
+    detector = OnnxYoloDetector(constant_yolo_model(tmp_path / "md.onnx"), 0.25, image_size=64)
+    assert (detector.stride, detector.names) == (32, NAMES)
+
+    preds, names = detector([np.zeros((100, 200, 3), dtype=np.uint8), np.zeros((200, 100, 3), dtype=np.uint8)])
+    assert names == NAMES
+    np.testing.assert_allclose(preds[0][:, :4], [[50, 25, 150, 75]] * 2, atol=1e-3)
+    # Imagen vertical: el relleno es lateral (16 px a la izquierda)
+    np.testing.assert_allclose(preds[1][:, :4], [[0, 75, 100, 125]] * 2, atol=1e-3)
+    np.testing.assert_allclose(preds[1][:, 4:], [[0.81, 0], [0.72, 1]], atol=1e-5)